@@ -1,10 +1,81 @@
 import streamlit as st
 import os
+import re
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
-from engine.ingestion import load_and_process_documents
-from engine.query import user_input
-import time
+from engine.config import APP_NAMESPACE, SERVICE_URL, UPLOADS_DIR as UPLOADS_PATH, VECTOR_STORE_DIR as VECTOR_STORE_PATH
+from engine.client import QueryverseClient
+from engine.namespaces import new_session_namespace, remove_expired_sessions, uploads_dir_of
+
+STYLESHEET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "style.css")
+
+# The engine pulls in LangChain, FAISS and the Google clients, which take
+# seconds to import, so it is imported the first time a page needs it rather
+# than on every cold start. The welcome screen renders without it. Every
+# call works on the session's index namespace.
+
+def save_upload(file_name: str, data: bytes) -> str:
+    from engine import ingestion
+    return ingestion.save_upload(file_name, data, uploads_dir_of(st.session_state.namespace))
+
+def user_input(question: str, doc_ids=None):
+    from engine import query
+    return query.user_input(question, doc_ids, st.session_state.namespace)
+
+def stream_user_input(question: str, doc_ids=None):
+    from engine import query
+    return query.stream_user_input(question, doc_ids, st.session_state.namespace)
+
+def list_documents():
+    from engine import index_manager
+    return index_manager.list_documents(st.session_state.namespace)
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """
+    Returns the ingestion job queue, created once per server process and
+    shared by every session.
+    """
+    from engine import jobs
+    return jobs.get_job_queue()
+
+@st.cache_resource(show_spinner=False)
+def warm_up_engine():
+    """
+    Imports the engine and loads the index and clients in the background,
+    once per server process, so the first upload or question does not pay for
+    it while the first page has already rendered.
+    """
+    def warm_up():
+        import engine.ingestion
+        from engine.query import get_query_engine
+        if APP_NAMESPACE != "shared":
+            # Sessions start with empty namespaces of their own
+            return
+        try:
+            get_query_engine().get_chain()
+        except Exception:
+            # Nothing is indexed yet, or the index cannot be loaded; the
+            # first question reports it
+            pass
+
+    thread = threading.Thread(target=warm_up, name="engine-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_data(show_spinner=False)
+def load_styles(path: str) -> str:
+    """
+    Returns the app's stylesheet as a minified style element. It is read and
+    minified once per server process instead of being rebuilt on every rerun.
+    """
+    with open(path, encoding="utf-8") as f:
+        css = f.read()
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    return f"<style>{css.strip()}</style>"
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -21,286 +92,14 @@ if not os.getenv("GOOGLE_API_KEY"):
     st.stop()
 
 # --- SETUP DIRECTORIES ---
-UPLOADS_DIR = Path("uploads")
+UPLOADS_DIR = Path(UPLOADS_PATH)
 UPLOADS_DIR.mkdir(exist_ok=True)
 
-VECTOR_STORE_DIR = Path("vector_store")
+VECTOR_STORE_DIR = Path(VECTOR_STORE_PATH)
 VECTOR_STORE_DIR.mkdir(exist_ok=True)
 
 # --- ENHANCED MODERN STYLES ---
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Main App Styling */
-    .stApp {
-        background: linear-gradient(135deg, #0f172a 0%, #1e293b 50%, #334155 100%);
-        color: #f8fafc;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Hide Streamlit Elements */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    .stDeployButton {display: none;}
-    header {visibility: hidden;}
-    
-    /* Enhanced Sidebar */
-    .st-emotion-cache-16txtl3, .st-emotion-cache-1cypcdb {
-        background: rgba(15, 23, 42, 0.95) !important;
-        backdrop-filter: blur(20px) !important;
-        border-right: 1px solid rgba(148, 163, 184, 0.1) !important;
-        box-shadow: 4px 0 24px rgba(0, 0, 0, 0.1) !important;
-    }
-    
-    /* Custom Chat Message Styling */
-        .stChatMessage {
-            background: #fff !important;
-            color: #1e293b !important;
-            border: 2px solid #3b82f6 !important;
-            border-radius: 16px !important;
-            margin-bottom: 1rem !important;
-            box-shadow: 0 4px 12px rgba(59, 130, 246, 0.10) !important;
-            font-size: 1.08rem !important;
-            padding: 1.1rem 1.2rem !important;
-        }
-
-        .stChatMessage[data-testid="chat-message-user"] {
-            background: linear-gradient(135deg, #e0e7ff 60%, #f3f4f6 100%) !important;
-            color: #1e293b !important;
-            border-color: #6366f1 !important;
-            font-weight: 600 !important;
-        }
-
-        .stChatMessage[data-testid="chat-message-assistant"] {
-            background: linear-gradient(135deg, #f0fdf4 60%, #f3f4f6 100%) !important;
-            color: #0f172a !important;
-            border-color: #22c55e !important;
-            font-weight: 500 !important;
-        }
-    
-    /* Chat Input Enhancement */
-    .stChatInput {
-        background: rgba(15, 23, 42, 0.8) !important;
-        border: 2px solid rgba(148, 163, 184, 0.2) !important;
-        border-radius: 16px !important;
-        backdrop-filter: blur(20px) !important;
-    }
-    
-    .stChatInput:focus-within {
-        border-color: rgba(59, 130, 246, 0.5) !important;
-        box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.1) !important;
-    }
-    
-    /* Button Enhancements */
-    .stButton > button {
-        background: linear-gradient(135deg, #3b82f6, #8b5cf6) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 12px !important;
-        font-weight: 500 !important;
-        padding: 0.75rem 1.5rem !important;
-        transition: all 0.3s ease !important;
-        box-shadow: 0 4px 14px rgba(59, 130, 246, 0.25) !important;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px) !important;
-        box-shadow: 0 8px 25px rgba(59, 130, 246, 0.4) !important;
-    }
-    
-    /* File Uploader */
-    .st-emotion-cache-1erivf3 {
-        background: rgba(30, 41, 59, 0.6) !important;
-        border: 2px dashed rgba(148, 163, 184, 0.3) !important;
-        border-radius: 16px !important;
-        padding: 2rem !important;
-        text-align: center !important;
-    }
-    
-    /* Progress Bar */
-    .stProgress > div > div {
-        background: linear-gradient(135deg, #3b82f6, #8b5cf6) !important;
-        border-radius: 8px !important;
-    }
-    
-    /* Welcome Screen */
-    .welcome-container {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        justify-content: center;
-        min-height: 70vh;
-        text-align: center;
-        padding: 4rem 2rem;
-        background: rgba(15, 23, 42, 0.3);
-        border-radius: 24px;
-        border: 1px solid rgba(148, 163, 184, 0.1);
-        backdrop-filter: blur(20px);
-    }
-    
-    .welcome-logo {
-        width: 120px;
-        height: 120px;
-        background: linear-gradient(135deg, #3b82f6, #8b5cf6);
-        border-radius: 30px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        margin: 0 auto 2rem auto;
-        box-shadow: 0 25px 50px rgba(59, 130, 246, 0.4);
-        animation: float 4s ease-in-out infinite;
-    }
-    
-    .welcome-logo span {
-        color: white;
-        font-size: 4rem;
-        font-weight: 700;
-    }
-    
-    @keyframes float {
-        0%, 100% { transform: translateY(0px) rotate(0deg); }
-        25% { transform: translateY(-8px) rotate(1deg); }
-        50% { transform: translateY(-15px) rotate(0deg); }
-        75% { transform: translateY(-8px) rotate(-1deg); }
-    }
-    
-    .welcome-title {
-        font-size: 3.5rem;
-        font-weight: 800;
-        background: linear-gradient(135deg, #3b82f6, #8b5cf6);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 1rem;
-    }
-    
-    .welcome-subtitle {
-        font-size: 1.375rem;
-        color: #cbd5e1;
-        margin-bottom: 2.5rem;
-        max-width: 700px;
-        line-height: 1.6;
-    }
-    
-    /* Status Cards */
-    .status-card {
-        background: linear-gradient(135deg, rgba(34, 197, 94, 0.1), rgba(16, 185, 129, 0.1));
-        border: 1px solid rgba(34, 197, 94, 0.2);
-        border-radius: 12px;
-        padding: 1rem 1.5rem;
-        margin: 1rem 0;
-        display: flex;
-        align-items: center;
-        gap: 0.75rem;
-        backdrop-filter: blur(10px);
-    }
-    
-    .status-icon {
-        width: 32px;
-        height: 32px;
-        background: rgba(34, 197, 94, 0.2);
-        border-radius: 8px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        color: #22c55e;
-        font-weight: 600;
-    }
-    
-    /* Chat Header */
-    .chat-header {
-        background: rgba(15, 23, 42, 0.8);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(148, 163, 184, 0.1);
-        border-radius: 20px;
-        padding: 1.5rem 2rem;
-        margin-bottom: 2rem;
-        display: flex;
-        align-items: center;
-        gap: 1rem;
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.2);
-    }
-    
-    .chat-header-icon {
-        width: 48px;
-        height: 48px;
-        background: linear-gradient(135deg, #3b82f6, #8b5cf6);
-        border-radius: 14px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        color: white;
-        font-weight: 700;
-        font-size: 1.5rem;
-    }
-    
-    /* Sidebar Improvements */
-    .sidebar-header {
-        text-align: center;
-        padding: 2rem 1rem;
-        border-bottom: 1px solid rgba(148, 163, 184, 0.1);
-        margin-bottom: 2rem;
-    }
-    
-    .sidebar-logo {
-        width: 64px;
-        height: 64px;
-        background: linear-gradient(135deg, #3b82f6, #8b5cf6);
-        border-radius: 16px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        margin: 0 auto 1rem auto;
-        box-shadow: 0 8px 25px rgba(59, 130, 246, 0.3);
-    }
-    
-    .sidebar-title {
-        background: linear-gradient(135deg, #3b82f6, #8b5cf6);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        font-weight: 700;
-        font-size: 1.75rem;
-        margin: 0;
-    }
-    
-    .sidebar-version {
-        color: #94a3b8;
-        font-size: 0.875rem;
-        margin-top: 0.25rem;
-    }
-    
-    /* Example Buttons */
-    .example-btn {
-        background: rgba(30, 41, 59, 0.6) !important;
-        border: 1px solid rgba(148, 163, 184, 0.2) !important;
-        color: #e2e8f0 !important;
-        border-radius: 12px !important;
-        padding: 0.875rem 1rem !important;
-        margin-bottom: 0.5rem !important;
-        text-align: left !important;
-        font-weight: 400 !important;
-        font-size: 0.875rem !important;
-        transition: all 0.3s ease !important;
-        box-shadow: none !important;
-    }
-    
-    .example-btn:hover {
-        background: rgba(59, 130, 246, 0.1) !important;
-        border-color: rgba(59, 130, 246, 0.3) !important;
-        transform: translateX(4px) !important;
-        box-shadow: 0 4px 12px rgba(59, 130, 246, 0.15) !important;
-    }
-    
-    /* Info boxes for welcome screen */
-    .stAlert {
-        background: rgba(30, 41, 59, 0.6) !important;
-        border: 1px solid rgba(148, 163, 184, 0.2) !important;
-        border-radius: 16px !important;
-        margin: 0.75rem 0 !important;
-        backdrop-filter: blur(10px) !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(load_styles(STYLESHEET), unsafe_allow_html=True)
 
 # --- INITIALIZE SESSION STATE ---
 if 'doc_ready' not in st.session_state:
@@ -308,6 +107,26 @@ if 'doc_ready' not in st.session_state:
     st.session_state.doc_name = None
     st.session_state.messages = []
     st.session_state.processing = False
+    st.session_state.upload_id = None
+    st.session_state.doc_scope = []
+    st.session_state.ingest_job = None
+    st.session_state.ingest_notice = None
+    st.session_state.last_traces = {}
+    # Sessions either share the default index namespace or get their own,
+    # so their uploads never replace each other's documents
+    st.session_state.namespace = new_session_namespace() if APP_NAMESPACE == "session" else None
+    if st.session_state.namespace is not None and not SERVICE_URL:
+        # Sessions end without notice, so the namespaces of abandoned ones
+        # are deleted as new sessions start
+        threading.Thread(target=remove_expired_sessions, name="session-cleanup", daemon=True).start()
+
+# With a service URL configured, this script is only a client of the
+# headless service in service.py and runs no engine work itself
+service_client = QueryverseClient(SERVICE_URL, namespace=st.session_state.namespace) if SERVICE_URL else None
+if service_client is not None:
+    user_input = service_client.user_input
+    stream_user_input = service_client.stream_user_input
+    list_documents = service_client.list_documents
 
 # --- ENHANCED SIDEBAR ---
 with st.sidebar:
@@ -343,33 +162,71 @@ with st.sidebar:
         label_visibility="collapsed"
     )
 
-    if uploaded_file and not st.session_state.processing:
-        st.session_state.processing = True
-        file_path = UPLOADS_DIR / uploaded_file.name
-        
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        with st.spinner("🔄 Processing document..."):
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.02)
-                progress_bar.progress(i + 1)
-            
-            try:
-                load_and_process_documents(str(file_path))
-                st.session_state.doc_ready = True
-                st.session_state.doc_name = uploaded_file.name
-                st.session_state.messages = []
+    # The uploader keeps its file across reruns, so only ingest an upload this
+    # session has not processed yet. Re-uploads of identical bytes are caught
+    # by the ingestion manifest and return immediately.
+    if uploaded_file and uploaded_file.file_id != st.session_state.upload_id and not st.session_state.processing:
+        # Ingest in the background so the previous documents can still be
+        # queried; they are swapped for the new index once it is published
+        try:
+            if service_client is not None:
+                job = service_client.submit_ingestion(uploaded_file.name, uploaded_file.getvalue())
+                st.session_state.ingest_job = job["job_id"]
+            else:
+                file_path = save_upload(uploaded_file.name, uploaded_file.getvalue())
+                st.session_state.ingest_job = get_job_queue().submit(
+                    file_path, uploaded_file.name, st.session_state.namespace
+                ).job_id
+            st.session_state.upload_id = uploaded_file.file_id
+            st.session_state.processing = True
+        except Exception as e:
+            st.error(f"❌ **Error**: {str(e)}")
+
+    if st.session_state.processing:
+        @st.fragment(run_every=1)
+        def show_ingestion_job():
+            # Polls the job without blocking the rest of the page
+            if service_client is not None:
+                job = service_client.job(st.session_state.ingest_job)
+            else:
+                job = get_job_queue().get(st.session_state.ingest_job).to_dict()
+
+            if job["status"] == "done":
                 st.session_state.processing = False
-                st.success(f"✅ **{st.session_state.doc_name}** is ready!")
-            except Exception as e:
-                st.error(f"❌ **Error**: {str(e)}")
-                st.session_state.doc_ready = False
+                st.session_state.doc_ready = True
+                st.session_state.doc_name = job["file_name"]
+                st.session_state.ingest_notice = ("success", f"✅ **{job['file_name']}** is ready!")
+                if job["document"].get("trace"):
+                    st.session_state.last_traces["ingestion"] = job["document"]["trace"]
+                st.rerun()
+            elif job["status"] == "failed":
                 st.session_state.processing = False
+                st.session_state.ingest_notice = ("error", f"❌ **Error**: {job['error']}")
+                st.rerun()
+
+            # Report real pipeline progress instead of a fixed animation
+            progress = job["progress"]
+            if job["status"] == "queued" or progress is None:
+                st.progress(0.0)
+                st.caption(f"⏳ {job['file_name']} is waiting to be processed...")
+            else:
+                pages = f"{progress['pages_parsed']}/{progress['total_pages'] or '?'}"
+                eta = f" • ETA {progress['eta_seconds']:.0f}s" if progress["eta_seconds"] is not None else ""
+                st.progress(progress["fraction"])
+                st.caption(f"🔄 {job['file_name']} • 📄 {pages} pages parsed • 🧩 {progress['chunks_embedded']} chunks embedded{eta}")
+
+        show_ingestion_job()
+
+    if st.session_state.ingest_notice:
+        kind, notice = st.session_state.ingest_notice
+        if kind == "success":
+            st.success(notice)
+        else:
+            st.error(notice)
+        st.session_state.ingest_notice = None
 
     # Document Status
-    if st.session_state.doc_ready and not st.session_state.processing:
+    if st.session_state.doc_ready:
         st.markdown(f"""
             <div class="status-card">
                 <div class="status-icon">✓</div>
@@ -380,6 +237,20 @@ with st.sidebar:
             </div>
         """, unsafe_allow_html=True)
 
+    # Document Scope (only when several documents are indexed)
+    if st.session_state.doc_ready:
+        indexed_documents = list_documents()
+        if len(indexed_documents) > 1:
+            st.markdown("### 📚 **Search In**")
+            st.session_state.doc_scope = st.multiselect(
+                "Documents",
+                options=list(indexed_documents),
+                format_func=lambda doc_id: indexed_documents[doc_id]["source"],
+                placeholder="All documents",
+                key="doc_scope_select",
+                label_visibility="collapsed",
+            )
+
     # Example Queries (only when document is ready)
     if st.session_state.doc_ready:
         st.markdown("<div style='margin: 2rem 0 1rem 0;'></div>", unsafe_allow_html=True)
@@ -400,8 +271,10 @@ with st.sidebar:
                 else:
                     st.session_state.messages.append({"role": "user", "content": clean_query})
                     with st.spinner("🤔 Analyzing..."):
-                        response = user_input(clean_query)
+                        response = user_input(clean_query, st.session_state.doc_scope)
                         answer = response['answer']
+                        if response.get("trace"):
+                            st.session_state.last_traces["query"] = response["trace"]
                     st.session_state.messages.append({"role": "assistant", "content": answer})
                     st.rerun()
 
@@ -504,6 +377,8 @@ else:
                     if not content.endswith("*"):
                         content += f"\n\n---\n💡 *Source: {st.session_state.doc_name}*"
                     st.markdown(content)
+                    if message.get("timings"):
+                        st.caption(f"⏱️ {message['timings']}")
                 else:
                     st.markdown(message["content"])
 
@@ -515,14 +390,41 @@ else:
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("🔍 Searching through your document..."):
-                try:
-                    response = user_input(prompt)
-                    answer = response['answer']
-                    formatted_answer = f"{answer}\n\n---\n💡 *Source: {st.session_state.doc_name}*"
-                    st.markdown(formatted_answer)
-                    st.session_state.messages.append({"role": "assistant", "content": formatted_answer})
-                except Exception as e:
-                    error_msg = f"❌ **Unable to process your question**\n\n*Error: {str(e)}*\n\nPlease try rephrasing your question or check your document."
-                    st.markdown(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
\ No newline at end of file
+            try:
+                # Render the answer token by token as Gemini generates it
+                tokens, timings = stream_user_input(prompt, st.session_state.doc_scope)
+                answer = st.write_stream(tokens)
+                st.markdown(f"---\n💡 *Source: {st.session_state.doc_name}*")
+                st.caption(f"⏱️ {timings.summary()}")
+                if timings.trace:
+                    st.session_state.last_traces["query"] = timings.trace
+                formatted_answer = f"{answer}\n\n---\n💡 *Source: {st.session_state.doc_name}*"
+                st.session_state.messages.append(
+                    {"role": "assistant", "content": formatted_answer, "timings": timings.summary()}
+                )
+            except Exception as e:
+                error_msg = f"❌ **Unable to process your question**\n\n*Error: {str(e)}*\n\nPlease try rephrasing your question or check your document."
+                st.markdown(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
+
+# --- DEBUG PANEL ---
+# Rendered last so it already shows the request this run just made
+if st.session_state.last_traces:
+    with st.sidebar:
+        with st.expander("🔍 Debug: last request breakdown"):
+            for name, trace in st.session_state.last_traces.items():
+                st.markdown(f"**{name.title()}** • {trace['ms']:.0f} ms")
+                st.table([
+                    {
+                        "stage": stage["name"],
+                        "ms": round(stage["ms"], 1),
+                        "runs": stage["count"],
+                        "details": ", ".join(f"{key}={value}" for key, value in stage["attributes"].items()),
+                    }
+                    for stage in trace["stages"]
+                ])
+
+# --- ENGINE WARM-UP ---
+# Started last, once the page has been sent, so it never delays the first render
+if service_client is None:
+    warm_up_engine()
@@ -0,0 +1,49 @@
+import argparse
+import json
+import sys
+
+from engine.config import BATCH_MAX_CONCURRENCY
+from engine.query import answer_questions
+
+def read_questions(path: str) -> list:
+    """
+    Reads questions from a file: either JSONL with a "question" field per
+    line, or plain text with one question per line. Blank lines are skipped.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                questions.append(json.loads(line)["question"])
+            else:
+                questions.append(line)
+    return questions
+
+def main():
+    parser = argparse.ArgumentParser(description="Answers a file of questions against the indexed documents.")
+    parser.add_argument("questions", help="A text file with one question per line, or a JSONL file with a 'question' field.")
+    parser.add_argument("-o", "--output", help="The JSONL file to write the answers to. Standard output if omitted.")
+    parser.add_argument("--doc-id", action="append", dest="doc_ids", help="Only search this document; can be repeated.")
+    parser.add_argument("--max-concurrency", type=int, default=BATCH_MAX_CONCURRENCY)
+    parser.add_argument("--namespace", help="The index namespace to search. The default one if omitted.")
+    args = parser.parse_args()
+
+    results = answer_questions(read_questions(args.questions), args.doc_ids, args.max_concurrency, args.namespace)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for result in results:
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            output.close()
+
+    failed = sum(1 for result in results if "error" in result)
+    print(f"Answered {len(results) - failed} of {len(results)} questions.", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
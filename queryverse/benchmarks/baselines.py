@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable
+
+# The command line and baseline handling shared by every benchmark. Each
+# benchmark only adds its own options and measures its runs; baselines are
+# machine-dependent, so they are created locally with --save-baseline and
+# never committed
+
+def parse_arguments(description: str, default_baseline: str, add_arguments: Callable[[argparse.ArgumentParser], None]):
+    """
+    Parses the command line of a benchmark: its own options, added by
+    add_arguments, then the baseline and output options.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    add_arguments(parser)
+    parser.add_argument("--baseline", default=default_baseline, help="The baseline results to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change counted as a regression.")
+    parser.add_argument("-o", "--output", help="Also write the results to this JSON file.")
+    return parser.parse_args()
+
+def compare(results: dict, baseline: dict, tolerance: float, metrics: dict) -> list:
+    """
+    Compares results against a baseline, run by run (e.g. corpus size by
+    corpus size).
+
+    Args:
+        metrics (dict): The metrics to compare, and whether a higher value
+            is better.
+
+    Returns:
+        list: A (run, metric, baseline value, value, relative change,
+        regressed) tuple per metric of metrics both runs reported. A metric
+        regressed if it got worse by more than the tolerance (e.g. 0.2 for 20%).
+    """
+    rows = []
+    for name, run in results.items():
+        base = baseline.get("runs", {}).get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in metrics.items():
+            before, after = base.get(metric), run.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            rows.append((name, metric, before, after, change, worse > tolerance))
+    return rows
+
+def report_results(results: dict, settings: dict, args, metrics: dict):
+    """
+    Writes the results of a benchmark, compares them with the baseline or
+    saves them as the new one, and exits with an error if a metric regressed.
+
+    Args:
+        results (dict): The measurements of each run, keyed by run name.
+        settings (dict): The options the results depend on; a baseline
+            recorded with other settings is compared with a warning.
+        args: The parsed command line, see parse_arguments().
+        metrics (dict): The metrics to compare, and whether a higher value
+            is better.
+    """
+    report = {"settings": settings, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "runs": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != report["settings"]:
+            print("Warning: the baseline was recorded with different settings.", file=sys.stderr)
+        print(f"\nCompared with the baseline of {baseline.get('created_at')}:", file=sys.stderr)
+        width = max(len(name) for name in results)
+        for name, metric, before, after, change, regressed in compare(results, baseline, args.tolerance, metrics):
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {name:<{width}}  {metric:<20} {before:>12} -> {after:<12} {change:+.1%}{flag}", file=sys.stderr)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved the baseline to {args.baseline}.", file=sys.stderr)
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    sys.exit(1 if regressions else 0)
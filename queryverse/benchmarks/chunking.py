@@ -0,0 +1,95 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.baselines import parse_arguments, report_results
+from benchmarks.corpus import SyntheticCorpus
+
+# Run from the queryverse directory: python -m benchmarks.chunking
+# Only the splitting stage is timed, on pages of synthetic text already in
+# memory, so neither PDF parsing nor embedding is part of the numbers
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "chunking_baseline.json")
+
+# Reported metrics, and whether a higher value is better
+METRICS = {
+    "chunks": False,
+    "chunks_per_second": True,
+    "pages_per_second": True,
+}
+
+def run_chunker(chunker: str, pages: list, repeat: int) -> dict:
+    """
+    Splits some pages with a chunker at its configured size, repeat times,
+    and reports its fastest run and the chunks it made.
+    """
+    from engine.config import CHUNK_OVERLAP, CHUNK_OVERLAP_TOKENS, CHUNK_SIZE, CHUNK_TOKENS
+    from engine.context import estimate_tokens
+    from engine.ingestion import get_text_splitter
+
+    if chunker == "tokens":
+        splitter = get_text_splitter(chunker, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+    else:
+        splitter = get_text_splitter(chunker, CHUNK_SIZE, CHUNK_OVERLAP)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # One page at a time, the way ingestion streams them
+        chunks = [chunk for page in pages for chunk in splitter.split_documents([page])]
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    tokens = [estimate_tokens(chunk.page_content) for chunk in chunks]
+    return {
+        "chunks": len(chunks),
+        "seconds": round(seconds, 4),
+        "chunks_per_second": round(len(chunks) / seconds, 1),
+        "pages_per_second": round(len(pages) / seconds, 1),
+        "mean_tokens": round(statistics.mean(tokens), 1),
+        "min_tokens": min(tokens),
+        "max_tokens": max(tokens),
+    }
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--pages", default="10,100,1000", help="Comma-separated corpus sizes, in pages.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per chunker and size; the fastest is reported.")
+    parser.add_argument("--seed", type=int, default=0)
+
+def main():
+    args = parse_arguments(
+        "Benchmarks the token chunker against RecursiveCharacterTextSplitter on synthetic pages.",
+        DEFAULT_BASELINE,
+        add_arguments,
+    )
+
+    from langchain_core.documents import Document
+
+    results = {}
+    for size in (int(size) for size in args.pages.split(",")):
+        corpus = SyntheticCorpus(size, seed=args.seed)
+        pages = [
+            Document(page_content="\n".join(lines), metadata={"source": "benchmark.pdf", "page": page_number})
+            for page_number, lines in enumerate(corpus.iter_pages())
+        ]
+        print(f"Splitting {size} pages...", file=sys.stderr)
+        for chunker in ("recursive", "tokens"):
+            results[f"{chunker}/{size}"] = run = run_chunker(chunker, pages, args.repeat)
+            print(
+                f"  {chunker:<9} {run['chunks']} chunks in {run['seconds']}s ({run['chunks_per_second']} chunks/s), "
+                f"estimated tokens per chunk {run['min_tokens']}/{run['mean_tokens']}/{run['max_tokens']} (min/mean/max)",
+                file=sys.stderr,
+            )
+        tokens, recursive = results[f"tokens/{size}"], results[f"recursive/{size}"]
+        print(
+            f"  tokens vs recursive: {tokens['chunks'] / recursive['chunks']:.2f}x the chunks, "
+            f"{tokens['pages_per_second'] / recursive['pages_per_second']:.2f}x the pages/s",
+            file=sys.stderr,
+        )
+
+    report_results(results, {"repeat": args.repeat, "seed": args.seed}, args, METRICS)
+
+if __name__ == "__main__":
+    main()
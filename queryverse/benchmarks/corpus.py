@@ -0,0 +1,135 @@
+import itertools
+import random
+from typing import Iterable, List
+
+# Synthetic pages are about the size of a printed page of prose
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+_SYLLABLES = ("ka", "lo", "mi", "ren", "tas", "vo", "shi", "dar", "pel", "qua", "nor", "bex", "ul", "tri", "fen", "go")
+
+def make_vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    """
+    Returns size distinct pseudo-words, so synthetic text has a realistic
+    spread of rare and common terms without depending on any corpus.
+    """
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+def record_id(page_number: int) -> str:
+    """
+    Returns the identifier mentioned once on a page, which questions use to
+    exercise the keyword fast path.
+    """
+    return f"REF_{page_number:05d}"
+
+class SyntheticCorpus:
+    """
+    A deterministic synthetic document of some number of pages, and
+    questions about it. The same seed always gives the same text and
+    questions.
+    """
+
+    def __init__(self, pages: int, seed: int = 0):
+        self.pages = pages
+        self.seed = seed
+        self.vocabulary = make_vocabulary(random.Random(seed))
+        # Common words follow a Zipf-like distribution, like natural text
+        self._cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(self.vocabulary))))
+
+    def _rng(self, page_number: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + page_number)
+
+    def _phrase(self, rng: random.Random, words: int) -> List[str]:
+        return rng.choices(self.vocabulary, cum_weights=self._cum_weights, k=words)
+
+    def page_lines(self, page_number: int) -> List[str]:
+        """
+        Returns the lines of text of a page.
+        """
+        rng = self._rng(page_number)
+        lines = [" ".join(self._phrase(rng, WORDS_PER_LINE)) + "." for _ in range(LINES_PER_PAGE)]
+        topic = " ".join(self._phrase(rng, 3))
+        lines[rng.randrange(LINES_PER_PAGE)] = f"Record {record_id(page_number)} covers {topic}."
+        return lines
+
+    def iter_pages(self) -> Iterable[List[str]]:
+        for page_number in range(self.pages):
+            yield self.page_lines(page_number)
+
+    def questions(self, count: int) -> List[str]:
+        """
+        Returns count distinct questions: every other one names a record id
+        (answered from keywords alone), the rest quote a phrase of a page
+        (answered by hybrid search).
+        """
+        rng = random.Random(self.seed + 1)
+        questions = []
+        for i in range(count):
+            page_number = rng.randrange(self.pages)
+            if i % 2 == 0:
+                questions.append(f"What does record {record_id(page_number)} cover? ({i})")
+            else:
+                line = rng.choice(self.page_lines(page_number)).rstrip(".").split()
+                start = rng.randrange(max(1, len(line) - 5))
+                questions.append(f"What is said about {' '.join(line[start:start + 5])}? ({i})")
+        return questions
+
+    def write_text(self, path: str):
+        """
+        Writes the corpus as a text file, pages separated by form feeds.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for lines in self.iter_pages():
+                f.write("\n".join(lines) + "\n\f")
+
+    def write_pdf(self, path: str):
+        """
+        Writes the corpus as a PDF with one text page per synthetic page.
+        """
+        write_pdf(path, self.iter_pages())
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, pages: Iterable[List[str]]):
+    """
+    Writes a minimal PDF whose pages show some lines of ASCII text in
+    Helvetica, readable by pypdf. Only meant for synthetic benchmark corpora,
+    so no PDF library is needed to produce them.
+    """
+    # Objects 1-3 are the catalog, the page tree and the font; each page
+    # then takes two objects, the page and its content stream
+    bodies = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_ids = []
+    next_id = 4
+    for lines in pages:
+        text = "".join(f"({_escape(line)}) '\n" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 780 Td\n{text}ET".encode("latin-1")
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        bodies[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R"
+            " /Resources << /Font << /F1 3 0 R >> >> >>"
+        ).encode("latin-1")
+        bodies[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    bodies[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    bodies[2] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for object_id in range(1, next_id):
+            offsets[object_id] = f.tell()
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, bodies[object_id]))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % next_id)
+        for object_id in range(1, next_id):
+            f.write(b"%010d 00000 n \n" % offsets[object_id])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, xref))
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.baselines import parse_arguments, report_results
+
+# Run from the queryverse directory: python -m benchmarks.pipeline
+# Every corpus size is benchmarked in a fresh worker process with its own
+# vector store, so sizes do not share caches and peak RSS is per size
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Reported metrics, and whether a higher value is better
+METRICS = {
+    "chunks_per_second": True,
+    "pages_per_second": True,
+    "ingest_seconds": False,
+    "peak_rss_mb": False,
+    "index_bytes": False,
+    "store_bytes": False,
+    "cold_query_ms": False,
+    "query_p50_ms": False,
+    "query_p95_ms": False,
+    "query_p99_ms": False,
+}
+
+def percentile_ms(seconds, fraction: float):
+    """
+    Returns a percentile of some latencies, in milliseconds.
+    """
+    latencies = sorted(seconds)
+    if not latencies:
+        return None
+    position = min(len(latencies) - 1, int(fraction * len(latencies)))
+    return round(latencies[position] * 1000, 3)
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process in MiB, or None
+    where the resource module is not available (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_size(pages: int, args) -> dict:
+    """
+    Ingests a synthetic corpus of some pages and times questions against it,
+    with the stand-in embedder and chat model. Runs in a worker process whose
+    environment points the engine at an empty work directory.
+    """
+    # Imported here, once the worker's environment is in place
+    import engine.embeddings
+    import engine.query
+    from benchmarks.corpus import SyntheticCorpus
+    from engine.embeddings import CachedEmbeddings, EmbeddingCache
+    from engine.index_manager import get_index_manager
+    from engine.ingestion import load_and_process_documents
+    from engine.query import user_input
+    from engine.stubs import StubChatModel, StubEmbeddings
+
+    work_dir = os.environ["QUERYVERSE_BENCHMARK_DIR"]
+    corpus = SyntheticCorpus(pages, args.seed)
+    corpus_path = os.path.join(work_dir, f"corpus-{pages}.{args.format}")
+    if args.format == "pdf":
+        corpus.write_pdf(corpus_path)
+    else:
+        corpus.write_text(corpus_path)
+
+    # The stand-ins go where the engine keeps its process-wide clients
+    engine.embeddings._embeddings = CachedEmbeddings(
+        StubEmbeddings(size=args.dimension, latency=args.embed_latency),
+        f"stub-{args.dimension}",
+        EmbeddingCache(os.path.join(work_dir, "embeddings.sqlite")),
+    )
+    engine.query._chat_model = StubChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+
+    start = time.perf_counter()
+    entry = load_and_process_documents(corpus_path)
+    ingest_seconds = time.perf_counter() - start
+
+    questions = corpus.questions(args.questions + 1)
+    start = time.perf_counter()
+    user_input(questions[0])
+    cold_query_seconds = time.perf_counter() - start
+    latencies = []
+    for question in questions[1:]:
+        start = time.perf_counter()
+        user_input(question)
+        latencies.append(time.perf_counter() - start)
+
+    manager = get_index_manager()
+    return {
+        "pages": entry["pages"],
+        "chunks": entry["chunks"],
+        "ingest_seconds": round(ingest_seconds, 3),
+        "chunks_per_second": round(entry["chunks"] / ingest_seconds, 1),
+        "pages_per_second": round(entry["pages"] / ingest_seconds, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "index_type": manager.manifest()["index"]["type"],
+        "index_bytes": manager.manifest()["index"]["bytes"],
+        "store_bytes": os.path.getsize(manager.chunks_path),
+        "cold_query_ms": round(cold_query_seconds * 1000, 3),
+        "query_p50_ms": percentile_ms(latencies, 0.50),
+        "query_p95_ms": percentile_ms(latencies, 0.95),
+        "query_p99_ms": percentile_ms(latencies, 0.99),
+    }
+
+def run_worker(pages: int, args) -> dict:
+    """
+    Benchmarks one corpus size in a fresh worker process.
+    """
+    with tempfile.TemporaryDirectory(prefix="queryverse-benchmark-") as work_dir:
+        env = {
+            **os.environ,
+            "QUERYVERSE_BENCHMARK_DIR": work_dir,
+            "VECTOR_STORE_PATH": os.path.join(work_dir, "vector_store"),
+            "UPLOADS_PATH": os.path.join(work_dir, "uploads"),
+            "TRACE_LOG_PATH": "",
+            # The stand-ins need no credentials, but the clients check for them
+            "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "benchmark",
+        }
+        command = [sys.executable, "-m", "benchmarks.pipeline", "--worker", str(pages)] + worker_arguments(args)
+        completed = subprocess.run(
+            command, cwd=os.path.dirname(BENCHMARK_DIR), env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"The {pages}-page benchmark failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def worker_arguments(args) -> list:
+    return [
+        "--questions", str(args.questions),
+        "--embed-latency", str(args.embed_latency),
+        "--llm-latency", str(args.llm_latency),
+        "--token-latency", str(args.token_latency),
+        "--dimension", str(args.dimension),
+        "--format", args.format,
+        "--seed", str(args.seed),
+    ]
+
+def settings_of(args) -> dict:
+    return {name: getattr(args, name) for name in ("questions", "embed_latency", "llm_latency", "token_latency", "dimension", "format", "seed")}
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--pages", default="1,10,100,1000", help="Comma-separated corpus sizes, in pages (up to 10000).")
+    parser.add_argument("--questions", type=int, default=50, help="Questions timed per corpus size.")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Simulated seconds per embedding request.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds to the first answer token.")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Simulated seconds per further answer token.")
+    parser.add_argument("--dimension", type=int, default=768, help="Dimension of the stand-in embeddings.")
+    parser.add_argument("--format", choices=("pdf", "txt"), default="pdf", help="File format of the synthetic corpora.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+
+def main():
+    args = parse_arguments(
+        "Benchmarks ingestion throughput and query latency on synthetic corpora, "
+        "with local stand-ins for the embedding and chat models.",
+        DEFAULT_BASELINE,
+        add_arguments,
+    )
+
+    if args.worker is not None:
+        print(json.dumps(run_size(args.worker, args)))
+        return
+
+    results = {}
+    for pages in (int(size) for size in args.pages.split(",")):
+        print(f"Benchmarking {pages} pages...", file=sys.stderr)
+        results[str(pages)] = run_worker(pages, args)
+        run = results[str(pages)]
+        print(
+            f"  {run['chunks']} chunks in {run['ingest_seconds']}s ({run['chunks_per_second']} chunks/s), "
+            f"peak RSS {run['peak_rss_mb']} MiB, index {run['index_bytes']} bytes ({run['index_type']}), "
+            f"query p50/p95/p99 {run['query_p50_ms']}/{run['query_p95_ms']}/{run['query_p99_ms']} ms",
+            file=sys.stderr,
+        )
+
+    report_results(results, settings_of(args), args, METRICS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.baselines import parse_arguments, report_results
+from benchmarks.pipeline import percentile_ms
+
+# Run from the queryverse directory: python -m benchmarks.startup
+# Import times and the first script run are measured in fresh worker
+# processes, so nothing is already imported or cached when they start
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCHMARK_DIR), "app.py")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "startup_baseline.json")
+
+SCREENS = ("welcome", "chat")
+
+# Reported metrics, and whether a higher value is better
+METRICS = {
+    "streamlit_import_ms": False,
+    "app_import_ms": False,
+    "engine_import_ms": False,
+    "first_run_ms": False,
+    "rerun_p50_ms": False,
+    "rerun_p95_ms": False,
+}
+
+def measure_imports() -> dict:
+    """
+    Times, in this fresh process, importing Streamlit, then the modules the
+    app imports at startup, then the engine it imports on first use.
+    """
+    start = time.perf_counter()
+    import streamlit
+    streamlit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import engine.client
+    import engine.config
+    app_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import engine.ingestion
+    import engine.jobs
+    import engine.query
+    engine_seconds = time.perf_counter() - start
+    return {
+        "streamlit_import_ms": round(streamlit_seconds * 1000, 3),
+        "app_import_ms": round(app_seconds * 1000, 3),
+        "engine_import_ms": round(engine_seconds * 1000, 3),
+    }
+
+def measure_screen(screen: str, args) -> dict:
+    """
+    Runs the app script once cold and then args.reruns more times on one of
+    its screens, the way a session rerenders it on every interaction.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    if screen == "chat":
+        # The state the app itself sets up once a document is ready
+        state = {
+            "doc_ready": True,
+            "doc_name": "benchmark.pdf",
+            "processing": False,
+            "upload_id": None,
+            "doc_scope": [],
+            "ingest_job": None,
+            "ingest_notice": None,
+            "last_traces": {},
+            "namespace": None,
+        }
+        for key, value in state.items():
+            app.session_state[key] = value
+        app.session_state["messages"] = [
+            {"role": role, "content": f"Message {i} of the benchmark conversation."}
+            for i in range(args.messages)
+            for role in ("user", "assistant")
+        ]
+
+    start = time.perf_counter()
+    app.run()
+    first_run_seconds = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    reruns = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        app.run()
+        reruns.append(time.perf_counter() - start)
+    return {
+        "first_run_ms": round(first_run_seconds * 1000, 3),
+        "rerun_p50_ms": percentile_ms(reruns, 0.50),
+        "rerun_p95_ms": percentile_ms(reruns, 0.95),
+    }
+
+def run_worker(task: str, args) -> dict:
+    """
+    Runs one measurement in a fresh worker process.
+    """
+    with tempfile.TemporaryDirectory(prefix="queryverse-benchmark-") as work_dir:
+        env = {
+            **os.environ,
+            "VECTOR_STORE_PATH": os.path.join(work_dir, "vector_store"),
+            "UPLOADS_PATH": os.path.join(work_dir, "uploads"),
+            "TRACE_LOG_PATH": "",
+            "QUERYVERSE_SERVICE_URL": "",
+            # The app stops without a key, though nothing here calls Google
+            "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "benchmark",
+        }
+        command = [
+            sys.executable, "-m", "benchmarks.startup", "--worker", task,
+            "--reruns", str(args.reruns), "--messages", str(args.messages),
+        ]
+        completed = subprocess.run(
+            command, cwd=os.path.dirname(BENCHMARK_DIR), env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"The {task} benchmark failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh processes whose import times are averaged (median).")
+    parser.add_argument("--reruns", type=int, default=30, help="Script reruns timed per screen.")
+    parser.add_argument("--messages", type=int, default=20, help="Exchanges in the chat screen's conversation.")
+    parser.add_argument("--worker", choices=("imports",) + SCREENS, help=argparse.SUPPRESS)
+
+def main():
+    args = parse_arguments(
+        "Benchmarks the Streamlit app's cold start and per-rerun script time.", DEFAULT_BASELINE, add_arguments
+    )
+
+    if args.worker == "imports":
+        print(json.dumps(measure_imports()))
+        return
+    if args.worker is not None:
+        print(json.dumps(measure_screen(args.worker, args)))
+        return
+
+    print("Timing imports...", file=sys.stderr)
+    samples = [run_worker("imports", args) for _ in range(args.repeat)]
+    results = {"imports": {metric: round(statistics.median(sample[metric] for sample in samples), 3) for metric in samples[0]}}
+    imports = results["imports"]
+    print(
+        f"  streamlit {imports['streamlit_import_ms']} ms, app {imports['app_import_ms']} ms, "
+        f"engine {imports['engine_import_ms']} ms",
+        file=sys.stderr,
+    )
+    for screen in SCREENS:
+        print(f"Timing the {screen} screen...", file=sys.stderr)
+        results[screen] = run = run_worker(screen, args)
+        print(
+            f"  first run {run['first_run_ms']} ms, rerun p50/p95 {run['rerun_p50_ms']}/{run['rerun_p95_ms']} ms",
+            file=sys.stderr,
+        )
+
+    report_results(results, {"reruns": args.reruns, "messages": args.messages}, args, METRICS)
+
+if __name__ == "__main__":
+    main()
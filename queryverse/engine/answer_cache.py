@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+from engine.chunk_store import lexical_terms
+from engine.config import ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_TTL_SECONDS
+
+class _Bucket:
+    """
+    The cached questions of one index generation, document scope and set of
+    identifiers, with their unit vectors stacked so that a lookup scores
+    them all with one matrix product.
+    """
+
+    def __init__(self):
+        self.size = 0
+        # Normalized question -> entry key
+        self.by_text = {}
+        # Row i of vectors belongs to keys[i]
+        self.keys = []
+        self.rows = {}
+        self.vectors = None
+
+    def add(self, key: int, text: str, unit: Optional[np.ndarray]):
+        self.size += 1
+        self.by_text[text] = key
+        if unit is None:
+            return
+        if self.vectors is None:
+            self.vectors = np.empty((8, unit.shape[0]), dtype=np.float32)
+        elif unit.shape[0] != self.vectors.shape[1]:
+            return
+        elif len(self.keys) == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+        self.rows[key] = len(self.keys)
+        self.vectors[len(self.keys)] = unit
+        self.keys.append(key)
+
+    def remove(self, key: int, text: str):
+        self.size -= 1
+        if self.by_text.get(text) == key:
+            del self.by_text[text]
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        # Move the last row into the freed one
+        last = self.keys.pop()
+        if last != key:
+            self.keys[row] = last
+            self.rows[last] = row
+            self.vectors[row] = self.vectors[len(self.keys)]
+
+    def most_similar(self, query: np.ndarray) -> Optional[tuple]:
+        """
+        Returns the key and cosine similarity of the question most similar
+        to a unit query vector, or None if there is none to compare with.
+        """
+        if not self.keys or query.shape[0] != self.vectors.shape[1]:
+            return None
+        similarities = self.vectors[:len(self.keys)] @ query
+        best = int(np.argmax(similarities))
+        return self.keys[best], float(similarities[best])
+
+class AnswerCache:
+    """
+    An in-memory cache of generated answers, looked up by question embedding.
+
+    A question hits the cache when a cached question asked against the same
+    index generation and document scope has a cosine similarity of at least
+    the threshold, so rephrasings of a question reuse its answer. Their
+    identifiers (terms with digits, like "2023" or "q3") must match exactly,
+    since questions about different years or sections embed almost the same.
+    Questions looked up without an embedding only hit on the same
+    (normalized) text. Entries expire after ttl_seconds, the least recently
+    used ones are evicted past max_entries, and entries of older generations
+    are dropped on invalidate().
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_SIMILARITY,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Entry key -> (bucket key, question, answer, seconds, created), least recently used first
+        self._entries = OrderedDict()
+        # Entry key -> created, oldest first, so expired entries are found without a scan
+        self._created = OrderedDict()
+        # (generation, scope, identifiers) -> _Bucket, so a lookup only
+        # scores the questions it could match
+        self._buckets = {}
+        self._next = 0
+        self._hits = 0
+        self._misses = 0
+        self._seconds_saved = 0.0
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    @staticmethod
+    def _unit(vector) -> Optional[np.ndarray]:
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _identifiers(question: str) -> frozenset:
+        return frozenset(term for term in lexical_terms(question) if any(c.isdigit() for c in term))
+
+    def _remove(self, key: int):
+        bucket_key, text, _, _, _ = self._entries.pop(key)
+        del self._created[key]
+        bucket = self._buckets[bucket_key]
+        bucket.remove(key, text)
+        if not bucket.size:
+            del self._buckets[bucket_key]
+
+    def _expire(self, now: float):
+        while self._created:
+            key, created = next(iter(self._created.items()))
+            if now - created <= self.ttl_seconds:
+                return
+            self._remove(key)
+
+    def get(self, generation: Hashable, scope: Hashable, question: str, vector=None) -> Optional[str]:
+        """
+        Returns the cached answer of the most similar question, or None.
+
+        Args:
+            generation: Identifies the version of the index answers came from.
+            scope: Identifies the documents the question was asked against.
+            question (str): The question.
+            vector: The embedding of the question, if it was computed.
+        """
+        text = self._normalize(question)
+        query = self._unit(vector)
+        with self._lock:
+            self._expire(time.time())
+            key = None
+            bucket = self._buckets.get((generation, scope, self._identifiers(question)))
+            if bucket is not None:
+                key = bucket.by_text.get(text)
+                if key is None and query is not None:
+                    found = bucket.most_similar(query)
+                    if found is not None and found[1] >= self.threshold:
+                        key = found[0]
+
+            if key is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            _, _, answer, seconds, _ = self._entries[key]
+            self._hits += 1
+            self._seconds_saved += seconds
+            return answer
+
+    def put(self, generation: Hashable, scope: Hashable, question: str, vector, answer: str, seconds: float):
+        """
+        Caches the answer to a question.
+
+        Args:
+            generation: Identifies the version of the index the answer came from.
+            scope: Identifies the documents the question was asked against.
+            question (str): The question.
+            vector: The embedding of the question, or None if it was not
+                computed; the entry then only matches the same question text.
+            answer (str): The generated answer.
+            seconds (float): How long the answer took to generate.
+        """
+        if self.max_entries <= 0:
+            return
+        text = self._normalize(question)
+        bucket_key = (generation, scope, self._identifiers(question))
+        unit = self._unit(vector)
+        with self._lock:
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            key = self._next
+            self._next += 1
+            self._buckets.setdefault(bucket_key, _Bucket()).add(key, text, unit)
+            created = time.time()
+            self._entries[key] = (bucket_key, text, answer, seconds, created)
+            self._created[key] = created
+
+    def invalidate(self, generation: Hashable = None):
+        """
+        Drops every entry not computed against the given index generation,
+        or every entry if it is omitted.
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if generation is None or entry[0][0] != generation:
+                    self._remove(key)
+
+    def stats(self) -> dict:
+        """
+        Returns the hit rate and the generation time the cache saved.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "seconds_saved": round(self._seconds_saved, 3),
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,292 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+# Metadata stored in their own columns rather than in the JSON blob
+_COLUMNS = ("doc_id", "page", "start_index")
+
+# Words too common to say anything about which chunk a question is about
+_STOPWORDS = frozenset("""
+a about above after all also am an and any are as at be been being but by can could did do does
+doing for from had has have having he her here hers him his how i if in into is it its just me
+more most my no nor not of off on once only or other our ours out over own same she should so
+some such than that the their theirs them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+def lexical_terms(text: str) -> List[str]:
+    """
+    Returns the distinct, lowercased non-stopword terms of a question, the
+    way the full-text index tokenizes chunk texts.
+    """
+    terms = []
+    for term in re.findall(r"\w+", text.lower()):
+        if term not in _STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+def _doc_filter(column: str, doc_ids, exclude_doc_ids, max_label=None, label_column: str = "id"):
+    """
+    Returns the SQL condition and parameters restricting rows to some
+    documents, and to the labels published up to some generation.
+    """
+    sql, params = "", []
+    if max_label is not None:
+        sql += f" AND {label_column} <= ?"
+        params.append(max_label)
+    if doc_ids is not None:
+        doc_ids = list(doc_ids)
+        sql += f" AND {column} IN ({','.join('?' * len(doc_ids))})"
+        params += doc_ids
+    if exclude_doc_ids:
+        exclude_doc_ids = list(exclude_doc_ids)
+        sql += f" AND ({column} IS NULL OR {column} NOT IN ({','.join('?' * len(exclude_doc_ids))}))"
+        params += exclude_doc_ids
+    return sql, params
+
+class ChunkStore:
+    """
+    An SQLite-backed store of chunk texts and metadata, replacing the pickled
+    LangChain docstore. Each chunk row is keyed by the integer label of its
+    vector in the FAISS index, so opening the store costs the same whatever
+    the corpus size and only the chunks a search returns are ever read.
+
+    An FTS5 full-text index over the chunk texts is kept in sync by triggers,
+    so every chunk added at ingestion can also be found by BM25 keyword search.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id INTEGER PRIMARY KEY,"
+                " chunk_id TEXT NOT NULL UNIQUE,"
+                " doc_id TEXT,"
+                " page INTEGER,"
+                " start_index INTEGER,"
+                " metadata TEXT NOT NULL,"
+                " text TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id)")
+            # Labels are never reused, so a label held by a reader of an older
+            # generation can never point at another document's chunk
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._create_lexical_index()
+            self._conn.commit()
+        self.has_lexical_index = self._conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'chunks_fts'"
+        ).fetchone()[0] > 0
+        self._next_id = self._load_next_id()
+
+    def _load_next_id(self) -> int:
+        next_id = self._conn.execute("SELECT COALESCE(MAX(id), -1) + 1 FROM chunks").fetchone()[0]
+        if not self.read_only:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'next_label'").fetchone()
+            if row is not None:
+                next_id = max(next_id, row[0])
+        return next_id
+
+    def _create_lexical_index(self):
+        exists = self._conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()[0]
+        if exists:
+            return
+        # An external-content table: the texts are only stored once, in chunks
+        self._conn.execute("CREATE VIRTUAL TABLE chunks_fts USING fts5(text, content='chunks', content_rowid='id')")
+        self._conn.execute(
+            "CREATE TRIGGER chunks_fts_insert AFTER INSERT ON chunks BEGIN"
+            " INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text); END"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER chunks_fts_delete AFTER DELETE ON chunks BEGIN"
+            " INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+        )
+        # Index the chunks of stores created before the full-text index existed
+        self._conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+
+    def add(self, chunk_ids: List[str], chunks: List[Document]) -> List[int]:
+        """
+        Adds chunks to the store. Nothing is visible to other connections
+        until commit() is called.
+
+        Args:
+            chunk_ids (List[str]): The stable string ids of the chunks.
+            chunks (List[Document]): The chunks, with their metadata.
+
+        Returns:
+            List[int]: The integer labels to add the chunks' vectors under.
+        """
+        with self._lock:
+            labels = list(range(self._next_id, self._next_id + len(chunks)))
+            self._next_id += len(chunks)
+            rows = []
+            for label, chunk_id, chunk in zip(labels, chunk_ids, chunks):
+                metadata = {k: v for k, v in chunk.metadata.items() if k not in _COLUMNS}
+                rows.append((
+                    label,
+                    chunk_id,
+                    chunk.metadata.get("doc_id"),
+                    chunk.metadata.get("page"),
+                    chunk.metadata.get("start_index"),
+                    json.dumps(metadata),
+                    chunk.page_content,
+                ))
+            self._conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_label', ?)", (self._next_id,))
+        return labels
+
+    def labels_of(self, doc_ids: Iterable[str]) -> List[int]:
+        """
+        Returns the labels of every chunk of some documents.
+        """
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return []
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM chunks WHERE doc_id IN ({placeholders})", doc_ids
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_documents(self, doc_ids: Iterable[str]):
+        """
+        Deletes every chunk of some documents, pending the next commit().
+        """
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            self._conn.execute(f"DELETE FROM chunks WHERE doc_id IN ({placeholders})", doc_ids)
+
+    def get(
+        self,
+        labels: List[int],
+        doc_ids: Optional[Iterable[str]] = None,
+        exclude_doc_ids: Optional[Iterable[str]] = None,
+        max_label: Optional[int] = None,
+    ) -> Dict[int, Document]:
+        """
+        Materializes the chunks with the given labels, optionally restricted to
+        some documents or to the labels up to max_label. Labels with no chunk
+        (e.g. removed by a compaction that raced with the search) are left out.
+
+        Returns:
+            Dict[int, Document]: The chunks, keyed by label.
+        """
+        if not labels:
+            return {}
+        query = f"SELECT id, chunk_id, doc_id, page, start_index, metadata, text FROM chunks WHERE id IN ({','.join('?' * len(labels))})"
+        condition, filter_params = _doc_filter("doc_id", doc_ids, exclude_doc_ids, max_label)
+        query += condition
+        params = list(labels) + filter_params
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        chunks = {}
+        for label, chunk_id, doc_id, page, start_index, metadata, text in rows:
+            metadata = json.loads(metadata)
+            for name, value in zip(_COLUMNS, (doc_id, page, start_index)):
+                if value is not None:
+                    metadata[name] = value
+            chunks[label] = Document(id=chunk_id, page_content=text, metadata=metadata)
+        return chunks
+
+    def chunks_of(self, doc_id: str, max_label: Optional[int] = None) -> List[Document]:
+        """
+        Returns every chunk of a document, in document order.
+        """
+        with self._lock:
+            labels = [row[0] for row in self._conn.execute(
+                "SELECT id FROM chunks WHERE doc_id = ? ORDER BY id", (doc_id,)
+            ).fetchall()]
+        chunks = self.get(labels, max_label=max_label)
+        return [chunks[label] for label in labels if label in chunks]
+
+    def lexical_search(
+        self,
+        terms: List[str],
+        limit: int,
+        doc_ids: Optional[Iterable[str]] = None,
+        exclude_doc_ids: Optional[Iterable[str]] = None,
+        require_all: bool = False,
+        max_label: Optional[int] = None,
+    ) -> List[tuple]:
+        """
+        Ranks chunks against some terms with BM25.
+
+        Args:
+            terms (List[str]): The terms to look for, see lexical_terms().
+            limit (int): The maximum number of chunks to return.
+            doc_ids: Only return chunks of these documents.
+            exclude_doc_ids: Never return chunks of these documents.
+            require_all (bool): Only return chunks containing every term,
+                instead of any of them.
+            max_label: Only return chunks with labels up to this one, i.e.
+                those published in the generation being searched.
+
+        Returns:
+            List[tuple]: (label, BM25 score) pairs, best match first. Higher
+            scores are better.
+        """
+        if not terms or not self.has_lexical_index:
+            return []
+        # Quote the terms so FTS5 never parses them as query syntax
+        match = (" AND " if require_all else " OR ").join(f'"{term}"' for term in terms)
+        condition, params = _doc_filter("chunks.doc_id", doc_ids, exclude_doc_ids, max_label, "chunks.id")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunks_fts.rowid, bm25(chunks_fts) FROM chunks_fts"
+                " JOIN chunks ON chunks.id = chunks_fts.rowid"
+                f" WHERE chunks_fts MATCH ?{condition}"
+                " ORDER BY bm25(chunks_fts) LIMIT ?",
+                [match] + params + [limit],
+            ).fetchall()
+        # FTS5 reports BM25 negated, so that better matches sort first
+        return [(label, -score) for label, score in rows]
+
+    def max_label(self) -> Optional[int]:
+        """
+        Returns the highest label in the store, or None if it is empty.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT MAX(id) FROM chunks").fetchone()[0]
+
+    def delete_after(self, label: Optional[int]):
+        """
+        Deletes every chunk with a label above the given one (all of them if
+        it is None), pending the next commit(). Used to drop chunks left over
+        by a save that was interrupted before its generation was published.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE id > ?", (-1 if label is None else label,))
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def rollback(self):
+        with self._lock:
+            self._conn.rollback()
+            self._next_id = self._load_next_id()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
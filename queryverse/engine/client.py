@@ -0,0 +1,309 @@
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from types import SimpleNamespace
+from typing import Callable, Iterator, Optional
+
+# Kept to the standard library so load tests and other clients can use it
+# without the engine's dependencies
+
+class ServiceError(Exception):
+    """
+    Raised when the QueryVerse service reports an error.
+    """
+
+class ConnectionPool:
+    """
+    Keeps HTTP/1.1 connections to one service open between requests, so they
+    are reused instead of reconnecting for every request. Connections idle
+    for longer than idle_timeout are closed rather than reused, since the
+    server may have closed them (uvicorn does after 5 seconds by default).
+    """
+
+    def __init__(self, scheme: str, netloc: str, max_idle: int = 8, idle_timeout: float = 4.0):
+        self.connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self.netloc = netloc
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # (connection, released at) pairs, the most recently released last
+        self._idle = []
+        self._opened = 0
+        self._requests = 0
+        self._reused = 0
+
+    def acquire(self, timeout: float):
+        """
+        Returns an open connection, reusing an idle one if there is one.
+
+        Returns:
+            tuple: The connection, and whether it was reused.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._requests += 1
+            while self._idle:
+                connection, released_at = self._idle.pop()
+                if now - released_at < self.idle_timeout:
+                    self._reused += 1
+                    connection.sock.settimeout(timeout)
+                    return connection, True
+                connection.close()
+            self._opened += 1
+        return self.connection_class(self.netloc, timeout=timeout), False
+
+    def release(self, connection):
+        """
+        Returns a connection whose response was read in full to the pool.
+        """
+        with self._lock:
+            if connection.sock is not None and len(self._idle) < self.max_idle:
+                self._idle.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def stats(self) -> dict:
+        """
+        Returns how many requests were sent, how many connections were opened
+        for them and how many requests reused an open connection.
+        """
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "connections_opened": self._opened,
+                "connections_reused": self._reused,
+                "idle": len(self._idle),
+            }
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_connection_pool(base_url: str) -> ConnectionPool:
+    """
+    Returns the process-wide connection pool of a service, shared by every
+    client of it (e.g. by the clients of all Streamlit sessions).
+    """
+    parts = urllib.parse.urlsplit(base_url)
+    with _pools_lock:
+        key = (parts.scheme, parts.netloc)
+        if key not in _pools:
+            _pools[key] = ConnectionPool(parts.scheme, parts.netloc)
+        return _pools[key]
+
+class _PooledResponse:
+    """
+    A response whose connection goes back to its pool once the body has been
+    read in full. A response closed before that closes its connection.
+    """
+
+    def __init__(self, response: http.client.HTTPResponse, connection, pool: ConnectionPool):
+        self._response = response
+        self._connection = connection
+        self._pool = pool
+
+    def read(self) -> bytes:
+        try:
+            return self._response.read()
+        finally:
+            self.close()
+
+    def __iter__(self):
+        try:
+            # Not "yield from", which would close the response when the
+            # caller stops early, making it look fully read
+            for line in self._response:
+                yield line
+        finally:
+            self.close()
+
+    def close(self):
+        if self._connection is None:
+            return
+        connection, self._connection = self._connection, None
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool.release(connection)
+        else:
+            self._response.close()
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class StreamedAnswer:
+    """
+    The timings of an answer streamed from the service, available once all
+    of its tokens have been consumed.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.trace = None
+        self._summary = ""
+
+    def summary(self) -> str:
+        return self._summary
+
+class QueryverseClient:
+    """
+    A thin client of the HTTP service in service.py, mirroring the engine
+    functions the Streamlit app calls. With a namespace, every request works
+    on that index namespace instead of the default one. Requests go over the
+    kept-alive connections of the service's process-wide ConnectionPool, so
+    clients are cheap to create.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 600.0, namespace: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.namespace = namespace
+        self.pool = get_connection_pool(self.base_url)
+        self._prefix = urllib.parse.urlsplit(self.base_url).path
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None, content_type: str = "application/json"):
+        if self.namespace:
+            path += ("&" if "?" in path else "?") + urllib.parse.urlencode({"namespace": self.namespace})
+        headers = {"Content-Type": content_type} if body is not None else {}
+        while True:
+            connection, reused = self.pool.acquire(self.timeout)
+            try:
+                connection.request(method, self._prefix + path, body=body, headers=headers)
+                response = connection.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                # The server closed an idle connection; retry on a new one
+                if not reused:
+                    raise
+            except Exception:
+                connection.close()
+                raise
+
+        pooled = _PooledResponse(response, connection, self.pool)
+        if response.status >= 400:
+            data = pooled.read()
+            try:
+                message = json.loads(data).get("error", response.reason)
+            except ValueError:
+                message = response.reason
+            raise ServiceError(f"{response.status}: {message}")
+        return pooled
+
+    def _events(self, response) -> Iterator[dict]:
+        with response:
+            for line in response:
+                if line.strip():
+                    event = json.loads(line)
+                    if event.get("event") == "error":
+                        raise ServiceError(event["error"])
+                    yield event
+
+    def ingest(self, file_name: str, data: bytes, progress_callback: Optional[Callable] = None) -> dict:
+        """
+        Uploads and ingests a document.
+
+        Args:
+            file_name (str): The name of the document.
+            data (bytes): Its contents.
+            progress_callback: Called with the ingestion progress, with the
+                same attributes as an IngestionProgress.
+
+        Returns:
+            dict: The manifest entry of the document.
+        """
+        path = "/ingest?" + urllib.parse.urlencode({"name": file_name})
+        response = self._request("POST", path, data, "application/octet-stream")
+        for event in self._events(response):
+            if event["event"] == "progress" and progress_callback is not None:
+                progress_callback(SimpleNamespace(**{k: v for k, v in event.items() if k != "event"}))
+            elif event["event"] == "done":
+                return event["document"]
+        raise ServiceError("The service closed the connection before ingestion finished.")
+
+    def submit_ingestion(self, file_name: str, data: bytes) -> dict:
+        """
+        Uploads a document and queues its ingestion as a background job.
+
+        Returns:
+            dict: The job, with its "job_id" and "status".
+        """
+        path = "/jobs?" + urllib.parse.urlencode({"name": file_name})
+        with self._request("POST", path, data, "application/octet-stream") as response:
+            return json.loads(response.read())
+
+    def job(self, job_id: str) -> dict:
+        """
+        Returns the status and progress of an ingestion job.
+        """
+        with self._request("GET", "/jobs/" + urllib.parse.quote(job_id)) as response:
+            return json.loads(response.read())
+
+    def user_input(self, user_question: str, doc_ids=None) -> dict:
+        """
+        Answers a question, like engine.query.user_input.
+        """
+        body = json.dumps({"question": user_question, "doc_ids": doc_ids}).encode("utf-8")
+        with self._request("POST", "/query", body) as response:
+            result = json.loads(response.read())
+        result["trace"] = result["timings"].get("trace")
+        return result
+
+    def stream_user_input(self, user_question: str, doc_ids=None):
+        """
+        Streams the answer to a question, like engine.query.stream_user_input.
+
+        Returns:
+            tuple: An iterator over the answer tokens, and a StreamedAnswer
+            holding the timings once the iterator is exhausted.
+        """
+        answer = StreamedAnswer()
+        body = json.dumps({"question": user_question, "doc_ids": doc_ids}).encode("utf-8")
+
+        def tokens():
+            for event in self._events(self._request("POST", "/query/stream", body)):
+                if "token" in event:
+                    yield event["token"]
+                elif event.get("event") == "done":
+                    answer.timings = event["timings"]
+                    answer.trace = event["timings"].get("trace")
+                    answer._summary = event["summary"]
+
+        return tokens(), answer
+
+    def list_documents(self) -> dict:
+        with self._request("GET", "/documents") as response:
+            return json.loads(response.read())
+
+    def delete_document(self, doc_id: str) -> dict:
+        with self._request("DELETE", "/documents/" + urllib.parse.quote(doc_id)) as response:
+            return json.loads(response.read())
+
+    def stats(self) -> dict:
+        with self._request("GET", "/stats") as response:
+            return json.loads(response.read())
+
+    def traces(self, limit: Optional[int] = None) -> list:
+        """
+        Returns the service's most recent request traces, the oldest first.
+        """
+        path = "/traces" + (f"?limit={limit}" if limit else "")
+        with self._request("GET", path) as response:
+            return [json.loads(line) for line in response if line.strip()]
+
+    def pool_stats(self) -> dict:
+        """
+        Returns the request and connection reuse counts of the connection
+        pool this client shares with every other client of the service.
+        """
+        return self.pool.stats()
+
+    def metrics(self) -> str:
+        """
+        Returns the service's metrics in the Prometheus text format.
+        """
+        with self._request("GET", "/metrics") as response:
+            return response.read().decode("utf-8")
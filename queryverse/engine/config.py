@@ -0,0 +1,155 @@
+import os
+from dotenv import load_dotenv
+
+# Load .env here as well as in app.py, since the engine modules are imported
+# before the Streamlit script gets a chance to call load_dotenv() itself.
+load_dotenv()
+
+# Where the FAISS index and its docstore are persisted
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_PATH", "vector_store")
+
+# Where uploaded source documents are copied before ingestion
+UPLOADS_DIR = os.getenv("UPLOADS_PATH", "uploads")
+
+# Index namespaces (one per workspace, or per app session) each get their
+# own vector store and uploads directories under NAMESPACES_DIR; the default
+# namespace uses VECTOR_STORE_DIR and UPLOADS_DIR
+NAMESPACES_DIR = os.getenv("NAMESPACES_PATH", "namespaces")
+
+# "shared": every Streamlit session searches the default namespace;
+# "session": each session uploads to and searches a namespace of its own
+APP_NAMESPACE = os.getenv("APP_NAMESPACE", "shared")
+
+# The indexes of every namespace kept loaded at once stay within this many
+# bytes; the least recently used ones are unloaded and reloaded on demand
+RESIDENT_INDEX_BUDGET_BYTES = int(os.getenv("RESIDENT_INDEX_BUDGET_BYTES", str(1024 * 1024 * 1024)))
+
+# Query engines of namespaces without a question for this many seconds are
+# dropped whatever their size, so abandoned sessions do not pile up
+RESIDENT_INDEX_IDLE_SECONDS = float(os.getenv("RESIDENT_INDEX_IDLE_SECONDS", "900"))
+
+# The directories of app session namespaces unused for this many seconds
+# are deleted
+SESSION_NAMESPACE_TTL_SECONDS = float(os.getenv("SESSION_NAMESPACE_TTL_SECONDS", str(24 * 3600)))
+
+# Google Generative AI models used for embeddings and answer generation
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+
+# Embedding backend: "google" (EMBEDDING_MODEL over the network), "local"
+# (offline hashed n-gram vectors of LOCAL_EMBEDDING_DIM dimensions) or
+# "sentence-transformers" (LOCAL_EMBEDDING_MODEL, run on the CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google")
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "768"))
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemini-1.5-flash")
+CHAT_TEMPERATURE = float(os.getenv("CHAT_TEMPERATURE", "0.3"))
+
+# Number of chunks the retriever passes to the prompt
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+
+# Stamp file rewritten after every successful save of the vector store
+GENERATION_FILE = "GENERATION"
+
+# Chunking parameters, part of the ingestion manifest key. The "tokens"
+# chunker sizes chunks by CHUNK_TOKENS, an estimate of model tokens at four
+# characters per token rather than a count from the model's tokenizer, so
+# real token counts vary with the language and content of a document; the
+# "recursive" one sizes them by characters (CHUNK_SIZE)
+CHUNKER = os.getenv("CHUNKER", "tokens")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "16"))
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+
+# Records which documents are already embedded into the vector store
+MANIFEST_FILE = "manifest.json"
+
+# On-disk embedding cache shared by ingestion and queries
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("cache", "embeddings.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Embedding requests are sent in batches through a bounded worker pool
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "8"))
+
+# PDFs with at least PDF_PARALLEL_MIN_PAGES pages are parsed on a process
+# pool, PDF_PAGES_PER_TASK pages at a time; smaller ones are parsed serially
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+# Candidates fetched before metadata filtering when retrieval is scoped
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "50"))
+
+# Index type: "auto" picks flat, HNSW or IVF-PQ by corpus size; "flat",
+# "hnsw" and "ivfpq" force one
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")
+INDEX_HNSW_MIN_VECTORS = int(os.getenv("INDEX_HNSW_MIN_VECTORS", "50000"))
+INDEX_IVFPQ_MIN_VECTORS = int(os.getenv("INDEX_IVFPQ_MIN_VECTORS", "1000000"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+IVFPQ_SUBQUANTIZERS = int(os.getenv("IVFPQ_SUBQUANTIZERS", "64"))
+
+# Recall/latency knobs applied to the index at query time
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+
+# Indexes at least this large are memory-mapped instead of read into RAM
+INDEX_MMAP_MIN_BYTES = int(os.getenv("INDEX_MMAP_MIN_BYTES", str(256 * 1024 * 1024)))
+
+# Answers are reused for questions whose embeddings are at least this
+# cosine-similar to a cached one with the same identifiers (terms with
+# digits), against the same index generation
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Retrieval fuses BM25 keyword and vector rankings; questions with an
+# identifier (an error code, version or other term with digits) found in
+# only a few chunks skip the query embedding and vector search entirely
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# Retrieved chunks are merged, de-duplicated and trimmed to this many
+# (estimated) tokens before they are put into the prompt
+CONTEXT_COMPACTION = os.getenv("CONTEXT_COMPACTION", "true").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CONTEXT_DUPLICATE_SIMILARITY = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.8"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+
+# Headless HTTP service (service.py): at most SERVICE_MAX_CONCURRENCY
+# requests run at once, SERVICE_MAX_QUEUE more wait, the rest get a 503
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8765"))
+SERVICE_MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "4"))
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "32"))
+
+# When set, the Streamlit app sends its work to the service at this URL
+# instead of running the engine in-process
+SERVICE_URL = os.getenv("QUERYVERSE_SERVICE_URL", "")
+
+# Background ingestion jobs run at most this many at once per process
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "1"))
+
+# Batch question answering generates at most this many answers at once
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# Requests are traced stage by stage; the last TRACE_HISTORY traces are kept
+# for the debug panel and /traces, and every trace is appended as a JSON
+# line to TRACE_LOG_PATH when it is set
+TRACING = os.getenv("TRACING", "true").lower() == "true"
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "100"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")
+
+# Ingestion can also build a map-reduce summary tree of each document:
+# sections of SUMMARY_SECTION_CHUNKS chunks are summarized in parallel, then
+# reduced SUMMARY_FAN_IN at a time. Summary-style questions ("Summarize this
+# document") are then answered from it without retrieval or generation
+DOCUMENT_SUMMARIES = os.getenv("DOCUMENT_SUMMARIES", "false").lower() == "true"
+SUMMARY_SECTION_CHUNKS = int(os.getenv("SUMMARY_SECTION_CHUNKS", "10"))
+SUMMARY_FAN_IN = int(os.getenv("SUMMARY_FAN_IN", "6"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+SUMMARIES_DIR = "summaries"
@@ -0,0 +1,173 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import List
+
+from langchain_core.documents import Document
+from engine.config import (
+    CONTEXT_DUPLICATE_SIMILARITY,
+    CONTEXT_MMR_LAMBDA,
+    CONTEXT_TOKEN_BUDGET,
+)
+
+# Gemini tokenizes English text at roughly four characters per token
+CHARS_PER_TOKEN = 4
+
+# Trimmed chunks shorter than this are dropped rather than cut off
+_MIN_TRIMMED_TOKENS = 50
+
+# Put between the chunks of a context
+_SEPARATOR = "\n\n---\n\n"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Returns a cheap estimate of the number of model tokens in a text.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+@dataclass
+class ContextStats:
+    """
+    What the context assembly stage did to the retrieved chunks of a question.
+    """
+
+    chunks_in: int = 0
+    chunks_out: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    seconds: float = 0.0
+
+def merge_adjacent(chunks: List[Document]) -> List[Document]:
+    """
+    Merges chunks of the same page that overlap or touch, using the
+    start_index recorded by the splitter. Merged chunks keep the rank of
+    their best-ranked part; the input is assumed to be in rank order.
+    """
+    groups = {}
+    for rank, chunk in enumerate(chunks):
+        key = (chunk.metadata.get("doc_id"), chunk.metadata.get("source"), chunk.metadata.get("page"))
+        groups.setdefault(key, []).append((rank, chunk))
+
+    merged = []
+    for group in groups.values():
+        located = sorted(
+            (item for item in group if item[1].metadata.get("start_index") is not None),
+            key=lambda item: item[1].metadata["start_index"],
+        )
+        merged.extend(item for item in group if item[1].metadata.get("start_index") is None)
+
+        current = None
+        for rank, chunk in located:
+            start = chunk.metadata["start_index"]
+            if current is not None and start <= current[2]:
+                current_rank, current_chunk, current_end = current
+                # Only append the part of the chunk past the overlap
+                text = current_chunk.page_content + chunk.page_content[current_end - start:]
+                current_chunk = Document(page_content=text, metadata=current_chunk.metadata)
+                current = (min(current_rank, rank), current_chunk, max(current_end, start + len(chunk.page_content)))
+            else:
+                if current is not None:
+                    merged.append(current[:2])
+                current = (rank, chunk, start + len(chunk.page_content))
+        if current is not None:
+            merged.append(current[:2])
+
+    return [chunk for _, chunk in sorted(merged, key=lambda item: item[0])]
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+def _similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def select_mmr(
+    chunks: List[Document],
+    lambda_mult: float = CONTEXT_MMR_LAMBDA,
+    duplicate_similarity: float = CONTEXT_DUPLICATE_SIMILARITY,
+) -> List[Document]:
+    """
+    Reorders chunks by maximal marginal relevance and drops near-duplicates.
+    Relevance comes from the retrieval rank and redundancy from the word
+    trigram overlap with the chunks already selected, so no embeddings are
+    needed.
+
+    Args:
+        chunks (List[Document]): The chunks, in rank order.
+        lambda_mult (float): The weight of relevance against novelty.
+        duplicate_similarity (float): Chunks at least this similar to a
+            selected one are dropped.
+    """
+    shingles = [_shingles(chunk.page_content) for chunk in chunks]
+    remaining = list(range(len(chunks)))
+    selected = []
+    while remaining:
+        best, best_score = None, None
+        for i in list(remaining):
+            redundancy = max((_similarity(shingles[i], shingles[j]) for j in selected), default=0.0)
+            if redundancy >= duplicate_similarity:
+                remaining.remove(i)
+                continue
+            score = lambda_mult * (1.0 / (i + 1)) - (1 - lambda_mult) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+        if best is None:
+            break
+        selected.append(best)
+        remaining.remove(best)
+    return [chunks[i] for i in selected]
+
+def trim_to_budget(chunks: List[Document], token_budget: int = CONTEXT_TOKEN_BUDGET) -> List[Document]:
+    """
+    Keeps chunks in order until the token budget is spent, cutting the last
+    one at a word boundary if enough of the budget is left for it. The
+    separators format_context() puts between chunks count against the budget.
+    """
+    kept, used = [], 0
+    for chunk in chunks:
+        if kept:
+            used += estimate_tokens(_SEPARATOR)
+        tokens = estimate_tokens(chunk.page_content)
+        if used + tokens <= token_budget:
+            kept.append(chunk)
+            used += tokens
+            continue
+        left = token_budget - used
+        if left >= _MIN_TRIMMED_TOKENS:
+            text = chunk.page_content[:left * CHARS_PER_TOKEN].rsplit(" ", 1)[0]
+            kept.append(Document(page_content=text, metadata=chunk.metadata))
+        break
+    return kept
+
+def format_context(chunks: List[Document]) -> str:
+    """
+    Renders chunks as the context text of the prompt.
+    """
+    return _SEPARATOR.join(chunk.page_content for chunk in chunks)
+
+def assemble_context(chunks: List[Document], token_budget: int = CONTEXT_TOKEN_BUDGET, compact: bool = True):
+    """
+    Turns retrieved chunks into prompt context: merges adjacent and
+    overlapping chunks of the same page, drops near-duplicates and trims the
+    result to the token budget.
+
+    Args:
+        chunks (List[Document]): The retrieved chunks, in rank order.
+        token_budget (int): The maximum estimated tokens of context.
+        compact (bool): If False, the chunks are only formatted, for comparison.
+
+    Returns:
+        tuple: The context text and its ContextStats.
+    """
+    start = time.perf_counter()
+    stats = ContextStats(
+        chunks_in=len(chunks),
+        tokens_before=estimate_tokens(format_context(chunks)),
+    )
+    if compact:
+        chunks = trim_to_budget(select_mmr(merge_adjacent(chunks)), token_budget)
+    context = format_context(chunks)
+    stats.chunks_out = len(chunks)
+    stats.tokens_after = estimate_tokens(context)
+    stats.seconds = time.perf_counter() - start
+    return context, stats
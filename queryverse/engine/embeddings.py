@@ -0,0 +1,283 @@
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from engine.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_DIM,
+    LOCAL_EMBEDDING_MODEL,
+)
+from engine.local_embeddings import HashingEmbeddings
+
+def text_hash(text: str) -> str:
+    """
+    Returns the content hash used as the cache key of a text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    An on-disk, SQLite-backed cache of embedding vectors keyed by
+    (model name, text hash). Vectors are stored as raw float32 blobs and the
+    least recently used entries are evicted once the cache holds more than
+    max_entries vectors.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The connection is shared by every thread and guarded by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def _key(model: str, digest: str) -> str:
+        return f"{model}:{digest}"
+
+    def get_many(self, model: str, digests: List[str]) -> dict:
+        """
+        Looks up cached vectors and marks them as recently used.
+
+        Args:
+            model (str): The embedding model (and task) the vectors belong to.
+            digests (List[str]): The text hashes to look up.
+
+        Returns:
+            dict: The cached vectors, keyed by text hash.
+        """
+        found = {}
+        keys = [self._key(model, digest) for digest in set(digests)]
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key.rsplit(":", 1)[1]] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, self._key(model, digest)) for digest in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, vectors: dict):
+        """
+        Stores vectors in the cache, evicting the least recently used ones if
+        the cache grows past its bound.
+
+        Args:
+            model (str): The embedding model (and task) the vectors belong to.
+            vectors (dict): The vectors to store, keyed by text hash.
+        """
+        if not vectors:
+            return
+        now = time.time()
+        rows = [
+            (self._key(model, digest), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for digest, vector in vectors.items()
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so that every document and query embedding
+    reads through an EmbeddingCache. Only texts that are not cached yet are
+    sent to the underlying client.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._miss_seconds = 0.0
+
+    def _record(self, hits: int, misses: int, seconds: float):
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+            self._miss_seconds += seconds
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Documents and queries are embedded with different task types, so
+        # they are cached under separate keys
+        model = f"{self.model_name}:document"
+        digests = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(model, digests)
+
+        # Embed each missing text once, even if it appears several times
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in cached and digest not in missing:
+                missing[digest] = text
+
+        seconds = 0.0
+        if missing:
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            seconds = time.perf_counter() - start
+            fresh = dict(zip(missing.keys(), (np.asarray(v, dtype=np.float32) for v in vectors)))
+            self.cache.put_many(model, fresh)
+            cached.update(fresh)
+
+        self._record(len(texts) - len(missing), len(missing), seconds)
+        return [cached[digest].tolist() for digest in digests]
+
+    def embed_query(self, text: str) -> List[float]:
+        model = f"{self.model_name}:query"
+        digest = text_hash(text)
+        cached = self.cache.get_many(model, [digest])
+        if digest in cached:
+            self._record(1, 0, 0.0)
+            return cached[digest].tolist()
+
+        start = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        self._record(0, 1, time.perf_counter() - start)
+        self.cache.put_many(model, {digest: vector})
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds several queries, sending every uncached one in a single
+        batched request when the underlying client supports query task types.
+        """
+        model = f"{self.model_name}:query"
+        digests = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(model, digests)
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in cached and digest not in missing:
+                missing[digest] = text
+
+        seconds = 0.0
+        if missing:
+            start = time.perf_counter()
+            if "task_type" in inspect.signature(self.embeddings.embed_documents).parameters:
+                # The same task type GoogleGenerativeAIEmbeddings.embed_query uses
+                vectors = self.embeddings.embed_documents(list(missing.values()), task_type="RETRIEVAL_QUERY")
+            else:
+                vectors = [self.embeddings.embed_query(text) for text in missing.values()]
+            seconds = time.perf_counter() - start
+            fresh = dict(zip(missing.keys(), (np.asarray(v, dtype=np.float32) for v in vectors)))
+            self.cache.put_many(model, fresh)
+            cached.update(fresh)
+
+        self._record(len(texts) - len(missing), len(missing), seconds)
+        return [cached[digest].tolist() for digest in digests]
+
+    def stats(self) -> dict:
+        """
+        Returns the cache hit rate and an estimate of the embedding calls and
+        latency the cache saved, based on the average cost of a miss.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            seconds_per_miss = self._miss_seconds / self._misses if self._misses else 0.0
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "calls_saved": self._hits,
+                "seconds_saved": round(self._hits * seconds_per_miss, 3),
+                "entries": len(self.cache),
+            }
+
+EMBEDDING_BACKENDS = ("google", "local", "sentence-transformers")
+
+def embedding_model_name(backend: str = EMBEDDING_BACKEND) -> str:
+    """
+    Returns the name identifying the vectors an embedding backend produces.
+    It is recorded in the index and is part of the ingestion key, so
+    switching backends never mixes incompatible vectors.
+    """
+    if backend == "google":
+        return EMBEDDING_MODEL
+    if backend == "local":
+        return f"local-hashing-{LOCAL_EMBEDDING_DIM}"
+    if backend == "sentence-transformers":
+        return LOCAL_EMBEDDING_MODEL
+    raise ValueError(f"Unsupported embedding backend: {backend}. Use one of {', '.join(EMBEDDING_BACKENDS)}.")
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND):
+    """
+    Creates the embeddings client of a backend. Remote and model-based
+    backends read through the on-disk cache; the hashing backend is cheaper
+    to run than a cache lookup, so it is used directly.
+    """
+    model_name = embedding_model_name(backend)
+    if backend == "local":
+        return HashingEmbeddings(LOCAL_EMBEDDING_DIM)
+    if backend == "sentence-transformers":
+        # Only needed for this backend, and slow to import
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        client = HuggingFaceEmbeddings(
+            model_name=LOCAL_EMBEDDING_MODEL,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    else:
+        client = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+    return CachedEmbeddings(client, model_name, EmbeddingCache())
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings():
+    """
+    Returns the process-wide embeddings client of the configured backend,
+    shared by ingestion and the query engine.
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                _embeddings = create_embeddings()
+    return _embeddings
@@ -0,0 +1,686 @@
+import json
+import math
+import os
+import pickle
+import threading
+import time
+import weakref
+from typing import Iterable, List, Optional
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from engine.config import (
+    GENERATION_FILE,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_M,
+    INDEX_HNSW_MIN_VECTORS,
+    INDEX_IVFPQ_MIN_VECTORS,
+    INDEX_MMAP_MIN_BYTES,
+    INDEX_TYPE,
+    IVFPQ_SUBQUANTIZERS,
+    MANIFEST_FILE,
+    VECTOR_STORE_DIR,
+)
+from engine.chunk_store import ChunkStore, lexical_terms
+from engine.namespaces import store_dir_of
+from engine.summaries import remove_summaries
+
+def write_generation_stamp(store_dir: str = VECTOR_STORE_DIR):
+    """
+    Writes a new generation stamp next to the saved vector store so that
+    resident query engines know to reload it.
+
+    Args:
+        store_dir (str): The vector store directory.
+    """
+    stamp_path = os.path.join(store_dir, GENERATION_FILE)
+    tmp_path = stamp_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, stamp_path)
+
+def load_manifest(store_dir: str = VECTOR_STORE_DIR) -> dict:
+    """
+    Loads the ingestion manifest of a vector store.
+
+    Returns:
+        dict: The manifest, with empty "documents" and "deleted" mappings if
+        none exists yet.
+    """
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+    manifest.setdefault("documents", {})
+    manifest.setdefault("deleted", {})
+    return manifest
+
+def save_manifest(manifest: dict, store_dir: str = VECTOR_STORE_DIR):
+    """
+    Atomically writes the ingestion manifest of a vector store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def index_embedding_model(manifest: dict) -> Optional[str]:
+    """
+    Returns the embedding model the vectors of an index were built with, or
+    None for an empty index or one saved before it was recorded.
+    """
+    model = manifest.get("index", {}).get("embedding_model")
+    if model is None:
+        # Older manifests only recorded the model per document
+        models = {entry.get("embedding_model") for entry in manifest["documents"].values()} - {None}
+        model = models.pop() if len(models) == 1 else None
+    return model
+
+def check_embedding_model(manifest: dict, model_name: str):
+    """
+    Raises a ValueError if an index was built with another embedding model
+    than the configured one, since their vectors are not comparable.
+    """
+    built_with = index_embedding_model(manifest)
+    if built_with is not None and built_with != model_name:
+        raise ValueError(
+            f"The vector store was built with the {built_with} embeddings, but {model_name} is configured. "
+            "Switch EMBEDDING_BACKEND back or re-index the documents into an empty vector store."
+        )
+
+def chunk_ids(doc_id: str, start: int, count: int) -> List[str]:
+    """
+    Returns the stable ids of count chunks of a document, from the start-th one.
+    """
+    return [f"{doc_id}-{n}" for n in range(start, start + count)]
+
+# Index types from the cheapest to build to the most scalable
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# IVF-PQ needs enough vectors to train its 256-centroid PQ codebooks
+_IVFPQ_MIN_TRAINING = 256 * 39
+
+def choose_index_type(n_vectors: int) -> str:
+    """
+    Returns the index type to use for a corpus of n_vectors vectors: the
+    configured INDEX_TYPE, or flat, HNSW or IVF-PQ by size when it is "auto".
+    """
+    if INDEX_TYPE != "auto":
+        index_type = INDEX_TYPE
+    elif n_vectors >= INDEX_IVFPQ_MIN_VECTORS:
+        index_type = "ivfpq"
+    elif n_vectors >= INDEX_HNSW_MIN_VECTORS:
+        index_type = "hnsw"
+    else:
+        index_type = "flat"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    if index_type == "ivfpq" and n_vectors < _IVFPQ_MIN_TRAINING:
+        # Too few vectors to train on; HNSW is exact enough at this size
+        index_type = "hnsw"
+    return index_type
+
+def _inner(index):
+    """
+    Returns the index wrapped by an IndexIDMap2, which holds the actual vectors.
+    """
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
+
+def index_type_of(index) -> str:
+    """
+    Returns the type name ("flat", "hnsw" or "ivfpq") of a FAISS index.
+    """
+    index = _inner(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivfpq"
+    return "flat"
+
+def build_index(vectors: np.ndarray, labels: np.ndarray, index_type: str):
+    """
+    Builds a FAISS index of the given type holding the vectors under the
+    given labels.
+
+    Args:
+        vectors (np.ndarray): A float32 matrix with one vector per row.
+        labels (np.ndarray): The int64 label of each vector.
+        index_type (str): "flat", "hnsw" or "ivfpq".
+
+    Returns:
+        faiss.IndexIDMap2: The populated index.
+    """
+    n_vectors, dimension = vectors.shape
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == "ivfpq":
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+        # The number of subquantizers has to divide the dimension
+        subquantizers = max(m for m in range(1, IVFPQ_SUBQUANTIZERS + 1) if dimension % m == 0)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, subquantizers, 8)
+        # Train on a sample; the full corpus adds build time but little accuracy
+        sample_size = min(n_vectors, max(nlist * 64, _IVFPQ_MIN_TRAINING))
+        sample = np.random.default_rng(0).choice(n_vectors, sample_size, replace=False)
+        index.train(vectors[np.sort(sample)])
+    else:
+        index = faiss.IndexFlatL2(dimension)
+    id_map = faiss.IndexIDMap2(index)
+    id_map.add_with_ids(vectors, labels)
+    return id_map
+
+def _vectors_and_labels(index):
+    """
+    Returns every vector of an IndexIDMap2 with its label.
+    """
+    inner = _inner(index)
+    ivf = faiss.try_extract_index_ivf(inner)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return inner.reconstruct_n(0, inner.ntotal), faiss.vector_to_array(index.id_map)
+
+def adapt_index(index):
+    """
+    Rebuilds an index as the type its size calls for. In "auto" mode an index
+    is only ever upgraded, so deleting documents does not cause rebuilds.
+
+    Returns:
+        tuple: The (possibly new) index and the rebuild time in seconds, or
+        None if the index was kept as is.
+    """
+    current = index_type_of(index)
+    target = choose_index_type(index.ntotal)
+    if target == current:
+        return index, None
+    if INDEX_TYPE == "auto" and INDEX_TYPES.index(target) < INDEX_TYPES.index(current):
+        return index, None
+
+    start = time.perf_counter()
+    rebuilt = build_index(*_vectors_and_labels(index), target)
+    return rebuilt, time.perf_counter() - start
+
+def apply_search_params(index, nprobe: int, ef_search: int):
+    """
+    Sets the recall/latency knobs of an approximate index: the number of IVF
+    lists probed and the size of the HNSW search queue.
+    """
+    index = _inner(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+
+class ChunkIndex:
+    """
+    A FAISS index paired with the ChunkStore holding its chunks. Vectors are
+    added under the integer labels of their chunk rows, so labels stay stable
+    when other documents are removed.
+
+    A snapshot opened for searching only sees the chunks published with its
+    generation (labels up to max_label), even after newer chunks are
+    committed to the shared store.
+    """
+
+    def __init__(self, index, store: ChunkStore, manifest: Optional[dict] = None, max_label: Optional[int] = None):
+        self.index = index
+        self.store = store
+        # The manifest of the generation this index was loaded from
+        self.manifest = manifest if manifest is not None else {"documents": {}, "deleted": {}}
+        self.max_label = max_label
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def add(self, ids: List[str], chunks: List[Document], vectors):
+        """
+        Adds chunks and their vectors.
+
+        Args:
+            ids (List[str]): The stable ids of the chunks.
+            chunks (List[Document]): The chunks.
+            vectors: One embedding per chunk.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+        labels = self.store.add(ids, chunks)
+        self.index.add_with_ids(vectors, np.asarray(labels, dtype=np.int64))
+
+    def remove_documents(self, doc_ids: Iterable[str]):
+        """
+        Removes every chunk of some documents and their vectors. HNSW indexes
+        do not support removal, so they are rebuilt from the remaining vectors.
+        """
+        doc_ids = list(doc_ids)
+        labels = self.store.labels_of(doc_ids)
+        if labels and self.index is not None:
+            if index_type_of(self.index) == "hnsw":
+                vectors, all_labels = _vectors_and_labels(self.index)
+                keep = ~np.isin(all_labels, labels)
+                self.index = build_index(vectors[keep], all_labels[keep], "hnsw")
+            else:
+                self.index.remove_ids(np.asarray(labels, dtype=np.int64))
+        self.store.delete_documents(doc_ids)
+
+    def vector_search(self, vector, limit: int) -> List[tuple]:
+        """
+        Returns the (label, L2 distance) pairs of the vectors closest to a
+        query vector, closest first.
+        """
+        return self.vector_search_many([vector], limit)[0]
+
+    def vector_search_many(self, vectors, limit: int) -> List[List[tuple]]:
+        """
+        Searches the index for several query vectors in one call.
+
+        Returns:
+            list: The (label, L2 distance) pairs of each query, closest first.
+        """
+        if self.index is None or self.index.ntotal == 0:
+            return [[] for _ in vectors]
+        scores, labels = self.index.search(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1), limit)
+        return [
+            [(int(label), float(score)) for label, score in zip(row_labels, row_scores) if label != -1]
+            for row_labels, row_scores in zip(labels, scores)
+        ]
+
+    def search(self, vector, k: int, fetch_k: int, doc_ids=None, exclude_doc_ids=None):
+        """
+        Returns the k chunks closest to a query vector. Only those chunks are
+        read from the chunk store.
+
+        Args:
+            vector: The query embedding.
+            k (int): The number of chunks to return.
+            fetch_k (int): Candidates fetched before filtering, if filtered.
+            doc_ids: Only return chunks of these documents.
+            exclude_doc_ids: Never return chunks of these documents.
+
+        Returns:
+            list: (chunk, L2 distance) pairs, closest first.
+        """
+        filtered = doc_ids is not None or bool(exclude_doc_ids)
+        return self.materialize(self.vector_search(vector, fetch_k if filtered else k), k, doc_ids, exclude_doc_ids)
+
+    def materialize(self, ranking: List[tuple], k: int, doc_ids=None, exclude_doc_ids=None):
+        """
+        Reads the chunks of the first k labels of a ranking that pass the
+        document filters.
+
+        Args:
+            ranking: (label, score) pairs, best first.
+
+        Returns:
+            list: (chunk, score) pairs, best first.
+        """
+        # Filtering happens in the store, so read in slices until k survive
+        results = []
+        for start in range(0, len(ranking), k):
+            part = ranking[start:start + k]
+            chunks = self.store.get([label for label, _ in part], doc_ids, exclude_doc_ids, self.max_label)
+            results.extend((chunks[label], score) for label, score in part if label in chunks)
+            if len(results) >= k:
+                break
+        return results[:k]
+
+    def lexical_fast_path(self, question: str, k: int, doc_ids=None, exclude_doc_ids=None):
+        """
+        Answers a search from the full-text index alone when the keyword match
+        is confident: the question has an identifier-like term (such as an
+        error code or version number) found in at most k chunks. Ordinary
+        words are left to the hybrid search even when they are rare, since
+        a question made of them still needs its semantic matches.
+
+        Returns:
+            list: The best BM25 (chunk, score) pairs, or None if the match is
+            not confident and a vector search is needed.
+        """
+        terms = lexical_terms(question)
+        identifiers = [term for term in terms if "_" in term or any(c.isdigit() for c in term)]
+        if not identifiers:
+            return None
+
+        def is_rare(term):
+            hits = self.store.lexical_search([term], k + 1, doc_ids, exclude_doc_ids, max_label=self.max_label)
+            return 0 < len(hits) <= k
+
+        if not any(is_rare(term) for term in identifiers):
+            return None
+        hits = self.store.lexical_search(terms, k, doc_ids, exclude_doc_ids, max_label=self.max_label)
+        chunks = self.store.get([label for label, _ in hits])
+        return [(chunks[label], score) for label, score in hits if label in chunks]
+
+    def hybrid_search(self, question: str, embed_query, k: int, fetch_k: int, doc_ids=None, exclude_doc_ids=None, rrf_k: int = 60):
+        """
+        Returns the k chunks that best match a question, fusing the BM25 and
+        vector similarity rankings with reciprocal rank fusion.
+
+        Args:
+            question (str): The question.
+            embed_query: Returns the embedding of the question when called.
+            k (int): The number of chunks to return.
+            fetch_k (int): Candidates taken from each ranking before fusion.
+            doc_ids: Only return chunks of these documents.
+            exclude_doc_ids: Never return chunks of these documents.
+            rrf_k (int): Damps the weight of the top ranks in the fusion.
+
+        Returns:
+            list: (chunk, fused score) pairs, best first.
+        """
+        return self.fuse(question, self.vector_search(embed_query(), fetch_k), k, fetch_k, doc_ids, exclude_doc_ids, rrf_k)
+
+    def fuse(self, question: str, vector_ranking: List[tuple], k: int, fetch_k: int, doc_ids=None, exclude_doc_ids=None, rrf_k: int = 60):
+        """
+        Fuses the BM25 ranking of a question with an already computed vector
+        ranking, see hybrid_search().
+        """
+        lexical = self.store.lexical_search(
+            lexical_terms(question), fetch_k, doc_ids, exclude_doc_ids, max_label=self.max_label
+        )
+        fused = {}
+        for ranking in (lexical, vector_ranking):
+            for rank, (label, _) in enumerate(ranking):
+                fused[label] = fused.get(label, 0.0) + 1.0 / (rrf_k + rank + 1)
+        ranked = sorted(fused, key=fused.get, reverse=True)
+        return self.materialize([(label, fused[label]) for label in ranked], k, doc_ids, exclude_doc_ids)
+
+class IndexManager:
+    """
+    Owns a multi-document vector store on disk: a FAISS index of labelled
+    vectors and an SQLite chunk store. New documents are appended to the
+    existing index, and deleted documents are tombstoned in the manifest
+    right away and physically removed by a background compaction.
+
+    Every save publishes a new generation: the index is written to a new
+    index-<generation>.faiss file and the manifest naming it is then
+    replaced atomically. Readers load a consistent snapshot from whichever
+    manifest they read, and keep searching it until they reload.
+    """
+
+    def __init__(self, store_dir: str = VECTOR_STORE_DIR):
+        self.store_dir = store_dir
+        self.chunks_path = os.path.join(store_dir, "chunks.sqlite")
+        # Held by anything that modifies and saves the store
+        self.lock = threading.RLock()
+        # Guards starting and ending the background compaction, which holds
+        # the store lock while it runs
+        self._compaction_lock = threading.Lock()
+        self._compaction = None
+
+    def _index_path(self, manifest: dict) -> str:
+        # Stores saved before generations were introduced use index.faiss
+        return os.path.join(self.store_dir, manifest.get("index", {}).get("file", "index.faiss"))
+
+    def is_pickled(self) -> bool:
+        """
+        Whether the store was written by FAISS.save_local with a pickled
+        docstore, and still has to be migrated before it can be loaded.
+        """
+        return os.path.exists(os.path.join(self.store_dir, "index.pkl"))
+
+    def exists(self) -> bool:
+        return os.path.exists(self._index_path(self.manifest()))
+
+    def manifest(self) -> dict:
+        return load_manifest(self.store_dir)
+
+    def documents(self) -> dict:
+        """
+        Returns the manifest entries of the searchable documents, keyed by id.
+        """
+        return self.manifest()["documents"]
+
+    def load(self, mmap: bool = False, read_only: bool = False) -> Optional[ChunkIndex]:
+        """
+        Opens the current generation of the vector store, or returns None if
+        there is none yet. Only the FAISS index is read; chunks are read from
+        the store when needed.
+
+        Args:
+            mmap (bool): Memory-map the index if it is at least
+                INDEX_MMAP_MIN_BYTES large. Memory-mapped indexes are read-only.
+            read_only (bool): Open a read-only snapshot for searching.
+        """
+        if self.is_pickled():
+            raise ValueError(
+                f"The vector store in {self.store_dir} was saved by an older version with a pickled docstore, "
+                "which is not loaded for safety. Convert it once with python migrate_store.py, or delete it "
+                "and upload the documents again."
+            )
+
+        manifest = self.manifest()
+        index_path = self._index_path(manifest)
+        if not os.path.exists(index_path):
+            return None
+        flags = 0
+        if mmap and os.path.getsize(index_path) >= INDEX_MMAP_MIN_BYTES:
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(index_path, flags)
+        store = ChunkStore(self.chunks_path, read_only=read_only)
+        max_label = manifest.get("index", {}).get("max_label") if read_only else None
+        return ChunkIndex(index, store, manifest, max_label)
+
+    def open_for_write(self) -> ChunkIndex:
+        """
+        Opens the vector store for appending, creating an empty one if needed.
+        """
+        with self.lock:
+            chunk_index = self.load() or ChunkIndex(None, ChunkStore(self.chunks_path))
+            # Drop chunks committed by a save that never got published
+            chunk_index.store.delete_after(chunk_index.manifest.get("index", {}).get("max_label"))
+            return chunk_index
+
+    def migrate_pickled_store(self, embedding_model: str) -> Optional[dict]:
+        """
+        Converts a store written by FAISS.save_local (index.faiss + a pickled
+        docstore) into a labelled index and a chunk store, then deletes the
+        pickle so it is never loaded again. Unpickling runs code from the
+        file, so this is only ever run explicitly, on stores this app wrote.
+
+        Args:
+            embedding_model (str): The embedding model the store was built
+                with, recorded so other models' vectors are never added to it.
+
+        Returns:
+            dict: The manifest entry of the migrated chunks, or None if
+            there was nothing to migrate.
+        """
+        with self.lock:
+            pickle_path = os.path.join(self.store_dir, "index.pkl")
+            if not os.path.exists(pickle_path):
+                return None
+            with open(pickle_path, "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            index = faiss.read_index(os.path.join(self.store_dir, "index.faiss"))
+            vectors = _inner(index).reconstruct_n(0, index.ntotal)
+
+            store = ChunkStore(self.chunks_path)
+            ids = [index_to_docstore_id[i] for i in range(index.ntotal)]
+            chunks = []
+            for chunk_id in ids:
+                chunk = docstore.search(chunk_id)
+                chunks.append(Document(
+                    page_content=chunk.page_content,
+                    metadata={"doc_id": "legacy", **chunk.metadata},
+                ))
+            labels = np.asarray(store.add(ids, chunks), dtype=np.int64)
+            store.commit()
+
+            manifest = self.manifest()
+            legacy_chunks = sum(1 for chunk in chunks if chunk.metadata["doc_id"] == "legacy")
+            entry = None
+            if legacy_chunks:
+                entry = manifest["documents"]["legacy"] = {
+                    "doc_id": "legacy",
+                    # Sources saved on Windows use backslashes
+                    "source": os.path.basename(chunks[0].metadata.get("source", "legacy").replace("\\", "/")),
+                    "chunks": legacy_chunks,
+                    "embedding_model": embedding_model,
+                }
+            self._write_index(build_index(vectors, labels, index_type_of(index)), store, manifest)
+            manifest["index"]["embedding_model"] = embedding_model
+            store.close()
+            self._publish(manifest)
+            os.remove(pickle_path)
+            return entry
+
+    def _write_index(self, index, store: ChunkStore, manifest: dict, rebuild_seconds: Optional[float] = None):
+        """
+        Writes an index as the next generation and records it in the manifest,
+        which still has to be saved to publish it.
+        """
+        start = time.perf_counter()
+        generation = manifest.get("generation", 0) + 1
+        file_name = f"index-{generation}.faiss"
+        index_path = os.path.join(self.store_dir, file_name)
+        tmp_path = index_path + ".tmp"
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, index_path)
+        manifest["generation"] = generation
+        manifest["index"] = {
+            **manifest.get("index", {}),
+            "file": file_name,
+            "max_label": store.max_label(),
+            "type": index_type_of(index),
+            "vectors": index.ntotal,
+            "dimension": index.d,
+            "bytes": os.path.getsize(index_path),
+            "save_seconds": round(time.perf_counter() - start, 3),
+        }
+        if rebuild_seconds is not None:
+            manifest["index"]["rebuild_seconds"] = round(rebuild_seconds, 3)
+
+    def _publish(self, manifest: dict):
+        """
+        Publishes a manifest, making its generation the current one, and
+        removes the index files of generations before the previous one.
+        Readers that read the previous manifest can still open its index.
+        """
+        save_manifest(manifest, self.store_dir)
+        write_generation_stamp(self.store_dir)
+
+        keep = {manifest.get("index", {}).get("file"), f"index-{manifest.get('generation', 0) - 1}.faiss"}
+        for name in os.listdir(self.store_dir):
+            if name.startswith("index") and name.endswith(".faiss") and name not in keep:
+                try:
+                    os.remove(os.path.join(self.store_dir, name))
+                except OSError:
+                    # Still memory-mapped on Windows; removed after a later save
+                    pass
+
+    def _save(self, chunk_index: ChunkIndex, manifest: dict):
+        """
+        Writes a vector store as the next generation, switching its index
+        type first if its size calls for another one, and records the index
+        stats in the manifest.
+        """
+        chunk_index.index, rebuild_seconds = adapt_index(chunk_index.index)
+        # Chunks are committed before the generation that refers to them is
+        # published; older snapshots ignore them by label
+        chunk_index.store.commit()
+        self._write_index(chunk_index.index, chunk_index.store, manifest, rebuild_seconds)
+
+    def add_document(self, chunk_index: ChunkIndex, entry: dict, replaces: Optional[List[str]] = None):
+        """
+        Saves a vector store that a document was appended to and records the
+        document in the manifest.
+
+        Args:
+            chunk_index: The vector store holding the new document's chunks.
+            entry (dict): The manifest entry of the document.
+            replaces: Ids of documents the new one supersedes; they are deleted.
+        """
+        with self.lock:
+            manifest = self.manifest()
+            self._save(chunk_index, manifest)
+            manifest["index"]["embedding_model"] = entry["embedding_model"]
+            manifest["documents"][entry["doc_id"]] = entry
+            for doc_id in replaces or []:
+                if doc_id in manifest["documents"]:
+                    manifest["deleted"][doc_id] = manifest["documents"].pop(doc_id)["chunks"]
+            self._publish(manifest)
+        if replaces:
+            self.schedule_compaction()
+
+    def delete_document(self, doc_id: str):
+        """
+        Deletes a document. It stops being searchable immediately, and its
+        vectors are removed by a background compaction.
+
+        Args:
+            doc_id (str): The id of the document to delete.
+        """
+        with self.lock:
+            manifest = self.manifest()
+            if doc_id not in manifest["documents"]:
+                raise KeyError(f"Unknown document: {doc_id}")
+            manifest["deleted"][doc_id] = manifest["documents"].pop(doc_id)["chunks"]
+            self._publish(manifest)
+        self.schedule_compaction()
+
+    def compact(self):
+        """
+        Physically removes the vectors, chunks and summaries of deleted documents.
+        """
+        with self.lock:
+            manifest = self.manifest()
+            if not manifest["deleted"]:
+                return
+            chunk_index = self.load()
+            if chunk_index is not None:
+                chunk_index.remove_documents(manifest["deleted"])
+                self._save(chunk_index, manifest)
+                chunk_index.store.close()
+            remove_summaries(self.store_dir, manifest["deleted"])
+            manifest["deleted"] = {}
+            self._publish(manifest)
+
+    def _compact_until_clean(self):
+        # Documents deleted while a compaction runs are picked up by the next pass
+        while True:
+            with self._compaction_lock:
+                if not self.manifest()["deleted"]:
+                    self._compaction = None
+                    return
+            self.compact()
+
+    def schedule_compaction(self):
+        """
+        Runs a compaction on a background thread unless one is already
+        running. Never waits for the running one.
+        """
+        with self._compaction_lock:
+            if self._compaction is not None:
+                return
+            self._compaction = threading.Thread(target=self._compact_until_clean, name="index-compaction", daemon=True)
+            self._compaction.start()
+
+# Weak, so the managers of namespaces no longer in use are freed; while
+# anything holds (or holds the lock of) one, every caller gets that one
+_managers = weakref.WeakValueDictionary()
+_managers_lock = threading.Lock()
+
+def get_index_manager(store_dir: str = VECTOR_STORE_DIR) -> IndexManager:
+    """
+    Returns the process-wide index manager of a vector store directory.
+    """
+    with _managers_lock:
+        manager = _managers.get(store_dir)
+        if manager is None:
+            manager = _managers[store_dir] = IndexManager(store_dir)
+        return manager
+
+def list_documents(namespace: Optional[str] = None) -> dict:
+    """
+    Returns the manifest entries of the searchable documents of an index
+    namespace, keyed by id.
+    """
+    return get_index_manager(store_dir_of(namespace)).documents()
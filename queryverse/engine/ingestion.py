@@ -1,38 +1,760 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.documents import Document
+import numpy as np
+from engine.config import (
+    CHUNK_OVERLAP,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_SIZE,
+    CHUNK_TOKENS,
+    CHUNKER,
+    DOCUMENT_SUMMARIES,
+    EMBED_BATCH_SIZE,
+    EMBED_MAX_IN_FLIGHT,
+    EMBED_MAX_RETRIES,
+    EMBED_MAX_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PDF_PARALLEL_MIN_PAGES,
+    PDF_PARSE_WORKERS,
+    UPLOADS_DIR,
+)
+from engine.embeddings import get_embeddings
+from engine.chunk_store import ChunkStore
+from engine.context import CHARS_PER_TOKEN
+from engine.index_manager import ChunkIndex, check_embedding_model, chunk_ids, get_index_manager
+from engine.namespaces import store_dir_of, touch_namespace
+from engine.query import get_chat_model
+from engine.pdf_parsing import count_pages, get_parse_pool, parse_page_range
+from engine.summaries import load_summary, summarize_document
+from engine.tracing import Trace
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional
+import hashlib
+import json
 import os
+import re
+import tempfile
+import threading
+import time
 
-def load_and_process_documents(file_path: str):
+def hash_bytes(data: bytes) -> str:
     """
-    Loads a document, splits it into chunks, creates embeddings,
-    and stores them in a FAISS vector store.
+    Returns the SHA-256 hex digest of some bytes.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(file_path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Where the token chunker prefers to end a chunk, best first
+_BREAKS = ("\n\n", "\n", ". ", " ")
+
+_NON_SPACE = re.compile(r"\S")
+
+# The default chunk size and overlap of each chunker, in its own unit
+_CHUNK_DEFAULTS = {
+    "tokens": (CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS),
+    "recursive": (CHUNK_SIZE, CHUNK_OVERLAP),
+}
+
+def ingestion_key(file_hash: str, chunk_size: int, chunk_overlap: int, model_name: str, chunker: str = "recursive") -> str:
+    """
+    Builds the manifest key of a document: its content hash combined with
+    everything that changes the resulting vectors, including the name of
+    the embedding model the vectors are made with.
+    """
+    params = f"{file_hash}:{chunk_size}:{chunk_overlap}:{model_name}"
+    if chunker != "recursive":
+        # Documents indexed before there was a choice keep their keys
+        params = f"{chunker}:{params}"
+    return hash_bytes(params.encode("utf-8"))
+
+def save_upload(file_name: str, data: bytes, uploads_dir: str = UPLOADS_DIR) -> str:
+    """
+    Copies an uploaded file into the uploads directory, skipping the write
+    when a file with identical bytes is already there.
 
     Args:
-        file_path (str): The path to the document file.
+        file_name (str): The name of the uploaded file.
+        data (bytes): The contents of the uploaded file.
+        uploads_dir (str): The directory to copy the file into.
+
+    Returns:
+        str: The path of the stored file.
+    """
+    os.makedirs(uploads_dir, exist_ok=True)
+    file_path = os.path.join(uploads_dir, os.path.basename(file_name))
+    if os.path.exists(file_path) and os.path.getsize(file_path) == len(data):
+        if hash_file(file_path) == hash_bytes(data):
+            return file_path
+
+    with open(file_path, "wb") as f:
+        f.write(data)
+    return file_path
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    Checks whether an embedding error is a quota / rate-limit error (HTTP 429),
+    looking through the exception chain since LangChain wraps the API errors.
+    """
+    while error is not None:
+        if getattr(error, "code", None) == 429:
+            return True
+        message = str(error).lower()
+        if "429" in message or "quota" in message or "resource has been exhausted" in message:
+            return True
+        error = error.__cause__
+    return False
+
+class AdaptiveRateLimiter:
+    """
+    Spaces out embedding requests shared by all workers. The interval between
+    requests doubles on every quota error and decays again on success.
+    """
+
+    def __init__(self, initial_delay: float = 1.0, max_delay: float = 60.0, decay: float = 0.5):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.decay = decay
+        self.interval = 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the caller may send its next request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def on_success(self):
+        with self._lock:
+            self.interval *= self.decay
+            if self.interval < 0.01:
+                self.interval = 0.0
+
+    def on_quota_error(self):
+        with self._lock:
+            self.interval = min(self.max_delay, max(self.initial_delay, self.interval * 2))
+            # Hold back every worker, not just the one that hit the quota
+            self._next_start = max(self._next_start, time.monotonic() + self.interval)
+
+def _embed_batch(embeddings, texts: List[str], limiter: AdaptiveRateLimiter, max_retries: int, trace: Optional[Trace] = None):
+    """
+    Embeds one batch of texts, retrying it on failure without touching any
+    other batch.
+    """
+    for attempt in range(max_retries + 1):
+        limiter.wait()
+        start = time.perf_counter()
+        try:
+            vectors = embeddings.embed_documents(texts)
+        except Exception as error:
+            if attempt == max_retries:
+                raise
+            if is_quota_error(error):
+                limiter.on_quota_error()
+            else:
+                time.sleep(min(0.5 * 2 ** attempt, 30.0))
+            continue
+        limiter.on_success()
+        if trace is not None:
+            trace.record("embed", time.perf_counter() - start, chunks=len(texts), retries=attempt)
+        return vectors
+
+@dataclass
+class IngestionProgress:
+    """
+    A snapshot of a running ingestion, passed to progress callbacks.
+    """
+
+    pages_parsed: int = 0
+    total_pages: Optional[int] = None
+    chunks_split: int = 0
+    chunks_embedded: int = 0
+    elapsed_seconds: float = 0.0
+    eta_seconds: Optional[float] = None
+    page_parse_seconds: List[float] = field(default_factory=list)
+
+    @property
+    def fraction(self) -> float:
+        """
+        The estimated fraction of the work done, from 0.0 to 1.0.
+        """
+        if not self.total_pages or not self.pages_parsed or not self.chunks_split:
+            return 0.0
+        estimated_chunks = self.chunks_split / self.pages_parsed * self.total_pages
+        return min(1.0, self.chunks_embedded / estimated_chunks)
+
+class _ProgressTracker:
+    """
+    Updates an IngestionProgress as the pipeline advances and forwards it to
+    the caller's callback.
+    """
+
+    def __init__(self, callback: Optional[Callable[[IngestionProgress], None]], trace: Optional[Trace] = None):
+        self.callback = callback
+        self.trace = trace
+        self.progress = IngestionProgress()
+        self._start = time.perf_counter()
+
+    def update(self, **changes):
+        for name, value in changes.items():
+            setattr(self.progress, name, getattr(self.progress, name) + value)
+        progress = self.progress
+        progress.elapsed_seconds = time.perf_counter() - self._start
+        fraction = progress.fraction
+        if fraction > 0:
+            progress.eta_seconds = progress.elapsed_seconds * (1 - fraction) / fraction
+        if self.callback is not None:
+            self.callback(progress)
+
+    def page_parsed(self, page: Document, seconds: float):
+        if self.progress.total_pages is None:
+            self.progress.total_pages = page.metadata.get("total_pages", 1)
+        self.progress.page_parse_seconds.append(seconds)
+        if self.trace is not None:
+            self.trace.record("parse", seconds, pages=1, characters=len(page.page_content))
+        self.update(pages_parsed=1)
+
+def get_loader(file_path: str):
+    """
+    Returns the LangChain document loader for a file, based on its extension.
     """
-    # Determine the loader based on the file extension
     file_extension = os.path.splitext(file_path)[1]
     if file_extension.lower() == ".pdf":
-        loader = PyPDFLoader(file_path)
+        return PyPDFLoader(file_path)
     elif file_extension.lower() == ".txt":
-        loader = TextLoader(file_path, encoding='utf-8')
+        return TextLoader(file_path, encoding='utf-8')
     else:
         raise ValueError(f"Unsupported file type: {file_extension}")
 
-    documents = loader.load()
+def iter_pages(loader, tracker: _ProgressTracker) -> Iterator[Document]:
+    """
+    Lazily parses a document one page at a time.
+    """
+    pages = loader.lazy_load()
+    while True:
+        page_start = time.perf_counter()
+        page = next(pages, None)
+        if page is None:
+            break
+        tracker.page_parsed(page, time.perf_counter() - page_start)
+        yield page
+
+def iter_pdf_pages_parallel(
+    file_path: str,
+    total_pages: int,
+    tracker: _ProgressTracker,
+    max_workers: int = PDF_PARSE_WORKERS,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+) -> Iterator[Document]:
+    """
+    Parses a PDF on a process pool, a range of pages per task, and yields
+    the pages in order with the same text and metadata as PyPDFLoader.
+    """
+    # The first page goes through PyPDFLoader itself so the document-level
+    # metadata matches what it produces exactly
+    first_pages = PyPDFLoader(file_path).lazy_load()
+    page_start = time.perf_counter()
+    first_page = next(first_pages)
+    first_pages.close()
+    tracker.page_parsed(first_page, time.perf_counter() - page_start)
+    yield first_page
+
+    doc_metadata = {k: v for k, v in first_page.metadata.items() if k not in ("page", "page_label")}
+    pool = get_parse_pool(max_workers)
+    pending = deque()
+
+    def pages_of(future):
+        for page_number, text, page_label, seconds in future.result():
+            page = Document(
+                page_content=text,
+                metadata={**doc_metadata, "page": page_number, "page_label": page_label},
+            )
+            tracker.page_parsed(page, seconds)
+            yield page
+
+    try:
+        # Keep only a couple of ranges per worker in flight to bound memory
+        for start in range(1, total_pages, pages_per_task):
+            stop = min(start + pages_per_task, total_pages)
+            pending.append(pool.submit(parse_page_range, file_path, start, stop))
+            if len(pending) >= max_workers * 2:
+                yield from pages_of(pending.popleft())
+        while pending:
+            yield from pages_of(pending.popleft())
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_document_pages(file_path: str, tracker: _ProgressTracker) -> Iterator[Document]:
+    """
+    Lazily parses a document into pages, on a process pool for PDFs large
+    enough for it to pay off and serially otherwise.
+    """
+    loader = get_loader(file_path)
+    if isinstance(loader, PyPDFLoader) and PDF_PARSE_WORKERS > 1:
+        total_pages = count_pages(file_path)
+        if total_pages >= PDF_PARALLEL_MIN_PAGES:
+            tracker.progress.total_pages = total_pages
+            return iter_pdf_pages_parallel(file_path, total_pages, tracker)
+    return iter_pages(loader, tracker)
+
+class TokenChunker:
+    """
+    Splits pages into chunks of at most chunk_tokens estimated model tokens,
+    in a single pass over each page. Tokens are estimated from the length
+    of the text (see engine.context.estimate_tokens), not counted with the
+    model's tokenizer, so the budget is approximate.
+
+    Each chunk ends at the last paragraph, line, sentence or word break
+    within its budget, except that the last two chunks of a page share its
+    end evenly, so chunks come out close to the budget without short tails.
+    Consecutive chunks share the whole lines or sentences of the first one
+    that fit in overlap_tokens.
+    Every character is scanned a bounded number of times and chunks never
+    span pages. Only the chunks themselves are copied out of the page text,
+    and each keeps its page's metadata plus its start_index in the page,
+    like RecursiveCharacterTextSplitter(add_start_index=True).
+    """
+
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        if chunk_tokens <= 0 or not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("The chunk overlap must be smaller than the chunk size.")
+        self.max_chars = chunk_tokens * CHARS_PER_TOKEN
+        self.overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+
+    def split_page(self, page: Document) -> Iterator[Document]:
+        """
+        Lazily splits one page into chunks, in page order.
+        """
+        text = page.page_content
+        start = _skip_space(text, 0)
+        while start < len(text):
+            end = self._chunk_end(text, start)
+            yield Document(page_content=text[start:end], metadata={**page.metadata, "start_index": start})
+            if start + self.max_chars >= len(text):
+                return
+            start = self._next_start(text, start, end)
+
+    def split_documents(self, pages: Iterable[Document]) -> List[Document]:
+        return [chunk for page in pages for chunk in self.split_page(page)]
+
+    def _chunk_end(self, text: str, start: int) -> int:
+        remaining = len(text) - start
+        if remaining <= self.max_chars:
+            end = len(text)
+        else:
+            size = self.max_chars
+            if remaining <= 2 * self.max_chars - self.overlap_chars:
+                # Share the end of the page evenly between its last two
+                # chunks, instead of leaving a short last chunk
+                size = (remaining + self.overlap_chars + 1) // 2
+            # Cut mid-word only when the window has no break at all
+            end = start + size
+            for separator in _BREAKS:
+                found = text.rfind(separator, start + size // 2, start + size)
+                if found != -1:
+                    # Keep the full stop of a sentence break
+                    end = found + (separator == ". ")
+                    break
+        while text[end - 1].isspace():
+            end -= 1
+        return end
+
+    def _next_start(self, text: str, start: int, end: int) -> int:
+        # Repeat the last lines or sentences of the chunk that fit in the
+        # overlap; like the recursive splitter, never a part of one
+        position = max(start + 1, end - self.overlap_chars)
+        for separator in ("\n", ". "):
+            found = text.find(separator, position, end)
+            if found != -1:
+                return _skip_space(text, found + len(separator))
+        return _skip_space(text, end)
+
+def _skip_space(text: str, position: int) -> int:
+    found = _NON_SPACE.search(text, position)
+    return found.start() if found else len(text)
+
+def get_text_splitter(chunker: str, chunk_size: int, chunk_overlap: int):
+    """
+    Builds the splitter of a chunker.
+
+    Args:
+        chunker (str): "tokens" for a TokenChunker, or "recursive" for
+            LangChain's RecursiveCharacterTextSplitter.
+        chunk_size (int): The maximum size of a chunk, in estimated tokens
+            for "tokens" and in characters for "recursive".
+        chunk_overlap (int): The overlap between consecutive chunks, in the
+            same unit.
+    """
+    if chunker == "tokens":
+        return TokenChunker(chunk_size, chunk_overlap)
+    if chunker == "recursive":
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+        )
+    raise ValueError(f"Unknown chunker: {chunker}")
+
+def iter_chunks(pages: Iterable[Document], text_splitter, tracker: _ProgressTracker) -> Iterator[Document]:
+    """
+    Splits each page into chunks as soon as it has been parsed.
+    """
+    for page in pages:
+        start = time.perf_counter()
+        chunks = text_splitter.split_documents([page])
+        if tracker.trace is not None:
+            tracker.trace.record("split", time.perf_counter() - start, chunks=len(chunks))
+        tracker.update(chunks_split=len(chunks))
+        yield from chunks
+
+def iter_batches(chunks: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    """
+    Groups chunks into embedding batches.
+    """
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_batches(
+    batches: Iterable[List[Document]],
+    embeddings,
+    max_workers: int = EMBED_MAX_WORKERS,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+    max_retries: int = EMBED_MAX_RETRIES,
+    trace: Optional[Trace] = None,
+):
+    """
+    Embeds batches of chunks concurrently on a bounded thread pool. Batches
+    are pulled from the (lazy) input only while fewer than max_in_flight are
+    pending, which bounds how much of the document is held in memory.
+
+    Args:
+        batches: An iterable of lists of chunks.
+        embeddings: The embeddings client.
+        max_workers (int): The maximum number of concurrent embedding requests.
+        max_in_flight (int): The maximum number of batches submitted but not yet consumed.
+        max_retries (int): How many times a failed batch is retried.
+        trace: Receives an "embed" run per batch. Runs overlap, so their
+            summed time can exceed the wall-clock time.
+
+    Yields:
+        tuple: Each batch with its vectors, in the order of the batches.
+    """
+    limiter = AdaptiveRateLimiter()
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed")
+    pending = deque()
+    try:
+        for batch in batches:
+            texts = [chunk.page_content for chunk in batch]
+            pending.append((batch, pool.submit(_embed_batch, embeddings, texts, limiter, max_retries, trace)))
+            if len(pending) >= max_in_flight:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+class EmbeddedChunks:
+    """
+    The embedded chunks of a document, spooled to temporary files. A
+    document is embedded into one before the index lock is taken, so the
+    slow parse, split and embed stages never block deletes, compactions or
+    other ingestions, and its vectors are still not all held in memory.
+    """
+
+    def __init__(self):
+        self._vectors = tempfile.TemporaryFile()
+        self._chunks = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self._batch_sizes = []
+        self._dimension = None
+
+    def __len__(self):
+        return sum(self._batch_sizes)
+
+    def append(self, batch: List[Document], vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._vectors.write(vectors.tobytes())
+        for chunk in batch:
+            self._chunks.write(json.dumps([chunk.page_content, chunk.metadata]) + "\n")
+        self._batch_sizes.append(len(batch))
+        self._dimension = vectors.shape[1]
+
+    def __iter__(self) -> Iterator[tuple]:
+        """
+        Reads the batches back, in the order they were appended.
+
+        Yields:
+            tuple: Each batch of chunks with its vectors.
+        """
+        self._vectors.seek(0)
+        self._chunks.seek(0)
+        for size in self._batch_sizes:
+            data = self._vectors.read(size * self._dimension * 4)
+            vectors = np.frombuffer(data, dtype=np.float32).reshape(size, self._dimension)
+            batch = []
+            for _ in range(size):
+                text, metadata = json.loads(self._chunks.readline())
+                batch.append(Document(page_content=text, metadata=metadata))
+            yield batch, vectors
+
+    def close(self):
+        self._vectors.close()
+        self._chunks.close()
+
+def embed_chunks(
+    chunks: Iterable[Document],
+    embeddings,
+    doc_id: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_workers: int = EMBED_MAX_WORKERS,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+    tracker: Optional[_ProgressTracker] = None,
+) -> EmbeddedChunks:
+    """
+    Embeds document chunks in batches, in the original chunk order.
+
+    Args:
+        chunks: The document chunks, possibly a lazy iterator.
+        embeddings: The embeddings client.
+        doc_id (str): The id of the document the chunks belong to.
+        batch_size (int): The number of chunks per embedding request.
+        max_workers (int): The maximum number of concurrent embedding requests.
+        max_in_flight (int): The maximum number of batches in flight at once.
+        tracker: Receives the number of chunks embedded, and the per-stage
+            timings if it carries a trace.
+
+    Returns:
+        EmbeddedChunks: The embedded chunks, to add with add_chunks().
+    """
+    embedded = EmbeddedChunks()
+    trace = tracker.trace if tracker is not None else None
+    batches = iter_batches(chunks, batch_size)
+    try:
+        for batch, vectors in embed_batches(batches, embeddings, max_workers, max_in_flight, trace=trace):
+            embedded.append([
+                Document(page_content=chunk.page_content, metadata={**chunk.metadata, "doc_id": doc_id})
+                for chunk in batch
+            ], vectors)
+            if tracker is not None:
+                tracker.update(chunks_embedded=len(batch))
+        if not len(embedded):
+            raise ValueError("No text could be extracted from the document.")
+    except BaseException:
+        embedded.close()
+        raise
+    return embedded
+
+def add_chunks(embedded: EmbeddedChunks, doc_id: str, chunk_index: ChunkIndex, trace: Optional[Trace] = None) -> int:
+    """
+    Appends the embedded chunks of a document to a vector store.
+
+    Returns:
+        int: The number of chunks added.
+    """
+    added = 0
+    for batch, vectors in embedded:
+        with trace.span("index_add", chunks=len(batch)) if trace is not None else nullcontext():
+            chunk_index.add(chunk_ids(doc_id, added, len(batch)), batch, vectors)
+        added += len(batch)
+    return added
+
+def load_and_process_documents(
+    file_path: str,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    chunker: str = CHUNKER,
+    progress_callback: Optional[Callable[[IngestionProgress], None]] = None,
+    summarize: bool = DOCUMENT_SUMMARIES,
+    namespace: Optional[str] = None,
+):
+    """
+    Loads a document, splits it into chunks, creates embeddings,
+    and appends them to the FAISS vector store.
+
+    The document is streamed through the pipeline (page -> chunks ->
+    embedding batches -> temporary files), so only a bounded number of pages
+    and batches are held in memory at once, and only appending the spooled
+    chunks to the index holds the index lock. Documents already recorded in
+    the ingestion manifest with the same contents and chunking parameters
+    are not embedded again, and an earlier version of the same file is
+    replaced.
+
+    Args:
+        file_path (str): The path to the document file.
+        chunk_size (int): The maximum size of a chunk, in the chunker's unit
+            (see get_text_splitter()). The chunker's configured one if omitted.
+        chunk_overlap (int): The overlap between consecutive chunks.
+        chunker (str): "tokens" or "recursive", see get_text_splitter().
+        progress_callback: Called with an IngestionProgress after every
+            parsed page and every embedded batch.
+        summarize (bool): Also build the document's summary tree, see
+            engine.summaries, for instant answers to summary questions.
+        namespace: The index namespace to add the document to. The default
+            one if omitted.
+
+    Returns:
+        dict: The manifest entry of the document, with "cached" set to True
+        if it was already indexed, the "summary" status if one was built,
+        and the "trace" of its ingestion stages.
+    """
+    # Fail early on unsupported file types, chunkers and namespace names
+    get_loader(file_path)
+    default_size, default_overlap = _CHUNK_DEFAULTS.get(chunker, (None, None))
+    chunk_size = default_size if chunk_size is None else chunk_size
+    chunk_overlap = default_overlap if chunk_overlap is None else chunk_overlap
+    text_splitter = get_text_splitter(chunker, chunk_size, chunk_overlap)
+    manager = get_index_manager(store_dir_of(namespace))
+    touch_namespace(namespace)
+
+    source = os.path.basename(file_path)
+    with Trace("ingestion", source=source, bytes=os.path.getsize(file_path)) as trace:
+        params = (chunker, chunk_size, chunk_overlap)
+        entry = _ingest(file_path, source, text_splitter, params, progress_callback, trace, manager)
+        trace.annotate(cached=entry["cached"], chunks=entry["chunks"])
+        if summarize:
+            entry["summary"] = _summarize(entry, trace, manager)
+    return {**entry, "trace": trace.to_dict()}
+
+def _summarize(entry: dict, trace: Trace, manager) -> str:
+    """
+    Builds the summary tree of an ingested document unless it already has
+    one. The document is searchable whatever happens here, so a failure is
+    reported rather than raised.
+
+    Returns:
+        str: "ready" or the error that prevented the summary.
+    """
+    store_dir = manager.store_dir
+    if load_summary(store_dir, entry["doc_id"]) is not None:
+        return "ready"
+    with trace.span("summarize", chunks=entry["chunks"]) as span:
+        try:
+            store = ChunkStore(manager.chunks_path, read_only=True)
+            try:
+                chunks = store.chunks_of(entry["doc_id"])
+            finally:
+                store.close()
+            summary = summarize_document(store_dir, entry, chunks, get_chat_model())
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            return f"failed: {e}"
+        span.set(levels=len(summary["levels"]), sections=len(summary["levels"][0]))
+    return "ready"
+
+def _ingest(file_path: str, source: str, text_splitter, params: tuple, progress_callback, trace: Trace, manager) -> dict:
+    """
+    Runs the ingestion pipeline of load_and_process_documents(), recording
+    each stage in the trace. params are the (chunker, chunk size, chunk
+    overlap) the text splitter was built with.
+    """
+    chunker, chunk_size, chunk_overlap = params
+    with trace.span("hash"):
+        file_hash = hash_file(file_path)
+    # Create embeddings with the configured backend, reading through the
+    # on-disk cache so previously embedded chunks are not sent again. The
+    # client's model name is the one recorded and checked in the manifest
+    embeddings = get_embeddings()
+    key = ingestion_key(file_hash, chunk_size, chunk_overlap, embeddings.model_name, chunker)
+    doc_id = key[:16]
+
+    # Skip the whole pipeline if this exact document is already indexed
+    manifest = manager.manifest()
+    if doc_id in manifest["documents"] and manager.exists():
+        return {**manifest["documents"][doc_id], "cached": True}
+    # Vectors of another embedding model cannot share the index
+    check_embedding_model(manifest, embeddings.model_name)
+
+    start = time.perf_counter()
+    tracker = _ProgressTracker(progress_callback, trace)
+    cache_before = embeddings.stats()
+
+    # Stream the pages through the splitter and the embedding stage without
+    # the manager lock, which only the index update below needs
+    chunks = iter_chunks(iter_document_pages(file_path, tracker), text_splitter, tracker)
+    embedded = embed_chunks(chunks, embeddings, doc_id, tracker=tracker)
+    cache_after = embeddings.stats()
+    trace.annotate(
+        "embed",
+        cache_hits=cache_after["hits"] - cache_before["hits"],
+        cache_misses=cache_after["misses"] - cache_before["misses"],
+    )
+
+    try:
+        with manager.lock:
+            # The index may have changed while the document was embedded
+            manifest = manager.manifest()
+            documents = manifest["documents"]
+            if doc_id in documents and manager.exists():
+                return {**documents[doc_id], "cached": True}
+            check_embedding_model(manifest, embeddings.model_name)
+            if doc_id in manifest["deleted"]:
+                # The chunks of a deleted copy must be gone before re-adding them
+                with trace.span("compact"):
+                    manager.compact()
 
-    # Split the document into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    docs = text_splitter.split_documents(documents)
+            with trace.span("open_index") as span:
+                chunk_index = manager.open_for_write()
+                span.set(vectors=chunk_index.ntotal)
+            try:
+                added = add_chunks(embedded, doc_id, chunk_index, trace)
+            except Exception:
+                chunk_index.store.rollback()
+                chunk_index.store.close()
+                raise
 
-    # Create embeddings using Google Generative AI
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    
-    # Create a FAISS vector store from the document chunks and embeddings
-    vector_store = FAISS.from_documents(docs, embeddings)
+            entry = {
+                "doc_id": doc_id,
+                "key": key,
+                "source": source,
+                "file_hash": file_hash,
+                "chunker": chunker,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "pages": tracker.progress.pages_parsed,
+                "chunks": added,
+                "parse_seconds": round(sum(tracker.progress.page_parse_seconds), 3),
+                "slowest_page_seconds": round(max(tracker.progress.page_parse_seconds, default=0.0), 3),
+                "embedding_model": embeddings.model_name,
+                "embedding_cache_hits": cache_after["hits"] - cache_before["hits"],
+                "embedding_cache_misses": cache_after["misses"] - cache_before["misses"],
+                "build_seconds": round(time.perf_counter() - start, 3),
+                "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            }
 
-    # Save the vector store locally in the 'vector_store' directory
-    vector_store.save_local("vector_store")
+            # Save the vector store locally; an older version of the same file
+            # stops being searchable and is compacted away in the background
+            replaced = [other for other, other_entry in documents.items() if other_entry["source"] == source]
+            try:
+                with trace.span("save") as span:
+                    manager.add_document(chunk_index, entry, replaces=replaced)
+                    index_stats = manager.manifest().get("index", {})
+                    span.set(index_bytes=index_stats.get("bytes"), index_type=index_stats.get("type"))
+            finally:
+                chunk_index.store.close()
+    finally:
+        embedded.close()
 
+    return {**entry, "cached": False}
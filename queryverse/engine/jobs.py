@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from engine.config import INGEST_MAX_JOBS
+from engine.ingestion import IngestionProgress, load_and_process_documents
+
+@dataclass
+class IngestionJob:
+    """
+    A document ingestion running in the background.
+
+    The status goes from "queued" to "running" and ends as "done", with the
+    manifest entry of the document, or "failed", with the error message.
+    """
+
+    job_id: str
+    file_name: str
+    namespace: Optional[str] = None
+    status: str = "queued"
+    progress: Optional[IngestionProgress] = None
+    document: Optional[dict] = None
+    error: Optional[str] = None
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        """
+        Returns the job as JSON-serializable data.
+        """
+        job = asdict(self)
+        if self.progress is not None:
+            job["progress"].pop("page_parse_seconds")
+            job["progress"]["fraction"] = self.progress.fraction
+        return job
+
+class JobQueue:
+    """
+    Runs ingestions as background jobs on a bounded worker pool, so callers
+    get a job id back immediately and poll its status and progress. Each job
+    publishes a new index generation when it finishes; queries keep using
+    the previous one until then.
+    """
+
+    def __init__(self, max_workers: int = INGEST_MAX_JOBS, max_finished: int = 100):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, file_path: str, file_name: Optional[str] = None, namespace: Optional[str] = None) -> IngestionJob:
+        """
+        Queues the ingestion of a document.
+
+        Args:
+            file_path (str): The path to the document file.
+            file_name (str): The name to show for the job. The file's name if omitted.
+            namespace: The index namespace to add the document to. The
+                default one if omitted.
+
+        Returns:
+            IngestionJob: The queued job.
+        """
+        job = IngestionJob(
+            job_id=uuid.uuid4().hex[:12],
+            file_name=file_name or file_path.replace("\\", "/").rsplit("/", 1)[-1],
+            namespace=namespace,
+            submitted_at=time.time(),
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._forget_finished()
+        self._executor.submit(self._run, job, file_path)
+        return job
+
+    def _run(self, job: IngestionJob, file_path: str):
+        job.status = "running"
+        job.started_at = time.time()
+
+        def on_progress(progress):
+            job.progress = progress
+
+        try:
+            job.document = load_and_process_documents(file_path, progress_callback=on_progress, namespace=job.namespace)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _forget_finished(self):
+        # Keep the most recent finished jobs around for their callers to poll
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in sorted(finished, key=lambda job: job.finished_at)[:-self.max_finished or None]:
+            del self._jobs[job.job_id]
+
+    def get(self, job_id: str) -> IngestionJob:
+        """
+        Returns a job by id.
+
+        Raises:
+            KeyError: If there is no such job.
+        """
+        with self._lock:
+            if job_id not in self._jobs:
+                raise KeyError(f"Unknown job: {job_id}")
+            return self._jobs[job_id]
+
+    def jobs(self, namespace: Optional[str] = None) -> list:
+        """
+        Returns the known jobs of an index namespace, the most recently
+        submitted first.
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.namespace == namespace]
+        return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """
+    Returns the process-wide ingestion job queue.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
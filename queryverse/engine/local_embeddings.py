@@ -0,0 +1,132 @@
+import re
+import threading
+import time
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from engine.config import LOCAL_EMBEDDING_DIM
+
+# Weights of the features a text is hashed by
+_WORD_WEIGHT = 1.0
+_BIGRAM_WEIGHT = 1.0
+_TRIGRAM_WEIGHT = 0.5
+
+# An odd 64-bit constant (Knuth's multiplicative hashing) for trigram codes
+_TRIGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+class HashingEmbeddings(Embeddings):
+    """
+    An offline, CPU-only embedding backend. Texts are hashed into a fixed
+    number of dimensions by their words, word bigrams and character
+    trigrams (the hashing trick), weighted by sublinear term frequency and
+    L2-normalized, so similar wording gives similar vectors. A batch is
+    encoded with a single vectorized NumPy scatter-add.
+
+    Documents and queries are encoded the same way, so no network round
+    trip or model weights are ever needed.
+    """
+
+    def __init__(self, size: int = LOCAL_EMBEDDING_DIM, max_cached_features: int = 1 << 20):
+        self.size = size
+        self.model_name = f"local-hashing-{size}"
+        self.max_cached_features = max_cached_features
+        self._lock = threading.Lock()
+        # Feature -> signed column (+/- (column + 1)), to hash each feature once
+        self._features = {}
+        self._texts = 0
+        self._seconds = 0.0
+
+    def _column(self, feature: str) -> int:
+        column = self._features.get(feature)
+        if column is None:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # The low bit picks the sign, which keeps collisions unbiased
+            column = (digest >> 1) % self.size + 1
+            if digest & 1:
+                column = -column
+            if len(self._features) < self.max_cached_features:
+                self._features[feature] = column
+        return column
+
+    def _word_features(self, words: List[str]):
+        for word in words:
+            yield self._column(word), _WORD_WEIGHT
+        for first, second in zip(words, words[1:]):
+            yield self._column(f"{first} {second}"), _BIGRAM_WEIGHT
+
+    def _trigram_columns(self, words: List[str]) -> np.ndarray:
+        # Character trigrams are hashed in one vectorized pass over the bytes
+        # of the normalized text instead of one dictionary lookup each
+        data = np.frombuffer(f" {' '.join(words)} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        if len(data) < 3:
+            return np.zeros(0, dtype=np.int64)
+        codes = (data[:-2] << np.uint64(16)) | (data[1:-1] << np.uint64(8)) | data[2:]
+        digests = (codes * _TRIGRAM_MULTIPLIER) >> np.uint64(32)
+        columns = ((digests >> np.uint64(1)) % np.uint64(self.size)).astype(np.int64) + 1
+        return np.where((digests & np.uint64(1)).astype(bool), -columns, columns)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes a batch of texts.
+
+        Returns:
+            np.ndarray: A float32 matrix with one unit vector per text (or a
+            zero vector for texts without any word).
+        """
+        start = time.perf_counter()
+        rows, columns, weights = [], [], []
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            features = list(self._word_features(words))
+            trigrams = self._trigram_columns(words)
+            rows.append(np.full(len(features) + len(trigrams), row, dtype=np.int64))
+            columns.append(np.fromiter((column for column, _ in features), dtype=np.int64, count=len(features)))
+            columns.append(trigrams)
+            weights.append(np.fromiter((weight for _, weight in features), dtype=np.float32, count=len(features)))
+            weights.append(np.full(len(trigrams), _TRIGRAM_WEIGHT, dtype=np.float32))
+
+        # One scatter-add over the flattened (text, column) cells of the batch
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+        cells = (np.concatenate(rows) if rows else columns) * self.size + np.abs(columns) - 1
+        signed_weights = np.sign(columns) * (np.concatenate(weights) if weights else 1.0)
+        matrix = np.bincount(cells, weights=signed_weights, minlength=len(texts) * self.size)
+        matrix = matrix.reshape(len(texts), self.size).astype(np.float32)
+        # Sublinear term frequency, so repeated words do not dominate
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+        with self._lock:
+            self._texts += len(texts)
+            self._seconds += time.perf_counter() - start
+        return matrix
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def stats(self) -> dict:
+        """
+        Returns the same statistics as CachedEmbeddings.stats(); nothing is
+        cached, since encoding is cheaper than a cache lookup. The encoding
+        throughput is reported instead.
+        """
+        with self._lock:
+            return {
+                "hits": 0,
+                "misses": 0,
+                "hit_rate": 0.0,
+                "calls_saved": 0,
+                "seconds_saved": 0.0,
+                "entries": 0,
+                "backend": self.model_name,
+                "texts_encoded": self._texts,
+                "encode_seconds": round(self._seconds, 3),
+            }
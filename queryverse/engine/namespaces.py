@@ -0,0 +1,91 @@
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import List, Optional
+
+from engine.config import NAMESPACES_DIR, SESSION_NAMESPACE_TTL_SECONDS, UPLOADS_DIR, VECTOR_STORE_DIR
+
+# Kept free of the engine's heavy imports, so the app can resolve its
+# directories before the engine is loaded
+
+_NAMESPACE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Names of the namespaces the app creates for its sessions start with this;
+# they are deleted once abandoned, while other namespaces are kept
+SESSION_PREFIX = "session-"
+
+def check_namespace(namespace: Optional[str]) -> Optional[str]:
+    """
+    Validates the name of an index namespace. None is the default namespace.
+
+    Raises:
+        ValueError: If the name is not 1 to 64 letters, digits, "-" or "_",
+            so it can never escape the namespaces directory.
+    """
+    if namespace is not None and not _NAMESPACE.fullmatch(namespace):
+        raise ValueError(f"Invalid namespace: {namespace!r}. Use 1 to 64 letters, digits, '-' or '_'.")
+    return namespace
+
+def store_dir_of(namespace: Optional[str] = None) -> str:
+    """
+    Returns the vector store directory of an index namespace.
+    """
+    if check_namespace(namespace) is None:
+        return VECTOR_STORE_DIR
+    return os.path.join(NAMESPACES_DIR, namespace, "vector_store")
+
+def uploads_dir_of(namespace: Optional[str] = None) -> str:
+    """
+    Returns the directory the uploads of an index namespace are copied to.
+    """
+    if check_namespace(namespace) is None:
+        return UPLOADS_DIR
+    return os.path.join(NAMESPACES_DIR, namespace, "uploads")
+
+def new_session_namespace() -> str:
+    """
+    Returns the name of a new, empty namespace for an app session.
+    """
+    return SESSION_PREFIX + uuid.uuid4().hex[:12]
+
+def touch_namespace(namespace: Optional[str]):
+    """
+    Records that a namespace is in use, by updating the modification time of
+    its directory if it has one yet.
+    """
+    if check_namespace(namespace) is None:
+        return
+    try:
+        os.utime(os.path.join(NAMESPACES_DIR, namespace))
+    except FileNotFoundError:
+        pass
+
+def remove_expired_sessions(max_age_seconds: float = SESSION_NAMESPACE_TTL_SECONDS) -> List[str]:
+    """
+    Deletes the directories of the session namespaces that were not used
+    (see touch_namespace()) for max_age_seconds. Sessions end without
+    notice, so this is how their indexes and uploads are cleaned up.
+
+    Returns:
+        List[str]: The names of the deleted namespaces.
+    """
+    try:
+        names = os.listdir(NAMESPACES_DIR)
+    except FileNotFoundError:
+        return []
+    removed = []
+    now = time.time()
+    for name in names:
+        if not name.startswith(SESSION_PREFIX) or not _NAMESPACE.fullmatch(name):
+            continue
+        path = os.path.join(NAMESPACES_DIR, name)
+        try:
+            if now - os.stat(path).st_mtime <= max_age_seconds:
+                continue
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed
@@ -0,0 +1,59 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pypdf
+
+# Kept free of LangChain imports so the worker processes start quickly
+
+def parse_page_range(file_path: str, start: int, stop: int):
+    """
+    Extracts the text of a range of PDF pages, the way PyPDFLoader does.
+    Runs inside a worker process.
+
+    Args:
+        file_path (str): The path to the PDF file.
+        start (int): The first page number (0-based) to parse.
+        stop (int): The page number to stop before.
+
+    Returns:
+        list: A (page number, text, page label, parse seconds) tuple per page.
+    """
+    reader = pypdf.PdfReader(file_path)
+    page_labels = reader.page_labels
+    pages = []
+    for page_number in range(start, stop):
+        page_start = time.perf_counter()
+        page = reader.pages[page_number]
+        if pypdf.__version__.startswith("3"):
+            text = page.extract_text()
+        else:
+            text = page.extract_text(extraction_mode="plain")
+        pages.append((page_number, text.strip(), page_labels[page_number], time.perf_counter() - page_start))
+    return pages
+
+def count_pages(file_path: str) -> int:
+    """
+    Returns the number of pages of a PDF without extracting any text.
+    """
+    return len(pypdf.PdfReader(file_path).pages)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_parse_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the process-wide PDF parsing pool, started on first use and kept
+    alive so later uploads do not pay the process startup cost again.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Forking a threaded server (Streamlit) is unsafe, so spawn
+                _pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
@@ -1,17 +1,220 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Any, Iterator, List, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import ConfigurableField, RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from engine.config import (
+    CHAT_MODEL,
+    BATCH_MAX_CONCURRENCY,
+    CHAT_TEMPERATURE,
+    CONTEXT_COMPACTION,
+    CONTEXT_TOKEN_BUDGET,
+    GENERATION_FILE,
+    HNSW_EF_SEARCH,
+    HYBRID_RRF_K,
+    HYBRID_SEARCH,
+    IVF_NPROBE,
+    LEXICAL_FAST_PATH,
+    MANIFEST_FILE,
+    RETRIEVAL_FETCH_K,
+    RESIDENT_INDEX_BUDGET_BYTES,
+    RESIDENT_INDEX_IDLE_SECONDS,
+    RETRIEVAL_K,
+    VECTOR_STORE_DIR,
+)
+from engine.answer_cache import AnswerCache
+from engine.context import ContextStats, assemble_context, estimate_tokens
+from engine.embeddings import get_embeddings
+from engine.index_manager import apply_search_params, check_embedding_model, get_index_manager
+from engine.namespaces import store_dir_of, touch_namespace
+from engine.single_flight import SingleFlight
+from engine.summaries import load_summary, summary_answer, summary_intent
+from engine.tracing import Trace, trace_of
 
-def get_retrieval_chain(vector_store):
+class ChunkRetriever(BaseRetriever):
+    """
+    Retrieves the chunks that best match a question from a ChunkIndex. Only
+    the chunks that are returned are read from the chunk store.
+
+    With hybrid search, BM25 keyword and vector rankings are fused, and a
+    confident keyword match is returned without embedding the question.
+
+    The search_kwargs are "k", "fetch_k" (the candidates fetched per ranking),
+    and "doc_ids" / "exclude_doc_ids" to scope the search.
+    """
+
+    chunk_index: Any
+    embeddings: Any
+    search_kwargs: dict = {"k": RETRIEVAL_K}
+    hybrid: bool = HYBRID_SEARCH
+    lexical_fast_path: bool = LEXICAL_FAST_PATH
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        k = self.search_kwargs.get("k", RETRIEVAL_K)
+        fetch_k = self.search_kwargs.get("fetch_k", RETRIEVAL_FETCH_K)
+        doc_ids = self.search_kwargs.get("doc_ids")
+        exclude_doc_ids = self.search_kwargs.get("exclude_doc_ids")
+        trace = run_manager.metadata.get("trace")
+
+        def embed_query():
+            start = time.perf_counter()
+            vector = self.embeddings.embed_query(query)
+            if trace is not None:
+                trace.record("embed_query", time.perf_counter() - start)
+            return vector
+
+        if not self.hybrid:
+            if trace is not None:
+                trace.annotate("retrieval", mode="vector")
+            hits = self.chunk_index.search(embed_query(), k, fetch_k, doc_ids, exclude_doc_ids)
+            return [chunk for chunk, _ in hits]
+
+        if self.lexical_fast_path:
+            # The query engine already looks it up for the answer cache
+            if "lexical_hits" in run_manager.metadata:
+                hits = run_manager.metadata["lexical_hits"]
+            else:
+                hits = self.chunk_index.lexical_fast_path(query, k, doc_ids, exclude_doc_ids)
+            if hits is not None:
+                if trace is not None:
+                    trace.annotate("retrieval", mode="lexical")
+                return [chunk for chunk, _ in hits]
+        if trace is not None:
+            trace.annotate("retrieval", mode="hybrid")
+        hits = self.chunk_index.hybrid_search(
+            query,
+            embed_query,
+            k,
+            max(fetch_k, k),
+            doc_ids,
+            exclude_doc_ids,
+            rrf_k=HYBRID_RRF_K,
+        )
+        return [chunk for chunk, _ in hits]
+
+def get_retrieval_chain(
+    chunk_index,
+    embeddings,
+    model=None,
+    nprobe: int = IVF_NPROBE,
+    ef_search: int = HNSW_EF_SEARCH,
+    on_retrieval=None,
+    on_context=None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    compact_context: bool = CONTEXT_COMPACTION,
+):
     """
     Creates and returns a modern retrieval chain using LCEL.
+
+    Args:
+        chunk_index: The vector store to retrieve context from.
+        embeddings: The embeddings client used to embed questions.
+        model: An existing chat model to reuse. A new one is created if omitted.
+        nprobe (int): IVF lists probed per search; higher means better recall.
+        ef_search (int): HNSW search queue size; higher means better recall.
+        on_retrieval: Called with the retrieval latency in seconds.
+        on_context: Called with the ContextStats of every assembled context.
+        token_budget (int): The maximum estimated tokens of context.
+        compact_context (bool): Merge, de-duplicate and trim the retrieved
+            chunks before they are put into the prompt.
+
+    A Trace passed as "trace" in the config metadata receives the retrieval,
+    query embedding, context and prompt stages of each call.
     """
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3)
+    if model is None:
+        model = ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=CHAT_TEMPERATURE)
+
+    # Only approximate indexes have these knobs; a flat index ignores them
+    apply_search_params(chunk_index.index, nprobe, ef_search)
+    
+    # The search kwargs can be overridden per call to scope retrieval to
+    # some documents without rebuilding the chain
+    retriever = ChunkRetriever(
+        chunk_index=chunk_index, embeddings=embeddings, search_kwargs={"k": RETRIEVAL_K}
+    ).configurable_fields(search_kwargs=ConfigurableField(id="search_kwargs"))
+
+    search = retriever
+
+    def timed_retrieve(question, config):
+        start = time.perf_counter()
+        docs = search.invoke(question, config)
+        seconds = time.perf_counter() - start
+        if on_retrieval is not None:
+            on_retrieval(seconds)
+        # Streaming callers pass an AnswerTimings to get their own numbers
+        timings = config.get("metadata", {}).get("answer_timings")
+        if timings is not None:
+            timings.retrieval_seconds = seconds
+        trace = trace_of(config)
+        if trace is not None:
+            trace.record("retrieval", seconds, chunks=len(docs))
+        return docs
+
+    retriever = RunnableLambda(timed_retrieve)
+
+    # Retrieved chunks and the question are handed to the answer chain
+    chain = (
+        {"context": retriever, "question": RunnablePassthrough()}
+        | get_answer_chain(model, on_context, token_budget, compact_context)
+    )
     
-    retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 3})
+    return chain
+
+def get_answer_chain(
+    model=None,
+    on_context=None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    compact_context: bool = CONTEXT_COMPACTION,
+):
+    """
+    Creates the generation half of the retrieval chain: it takes a
+    {"context": retrieved chunks, "question": question} input and returns
+    the answer.
+
+    Args:
+        model: An existing chat model to reuse. A new one is created if omitted.
+        on_context: Called with the ContextStats of every assembled context.
+        token_budget (int): The maximum estimated tokens of context.
+        compact_context (bool): Merge, de-duplicate and trim the retrieved
+            chunks before they are put into the prompt.
+    """
+    if model is None:
+        model = ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=CHAT_TEMPERATURE)
+
+    def build_context(chunks, config):
+        context, stats = assemble_context(chunks, token_budget, compact=compact_context)
+        if on_context is not None:
+            on_context(stats)
+        timings = config.get("metadata", {}).get("answer_timings")
+        if timings is not None:
+            timings.context = stats
+        trace = trace_of(config)
+        if trace is not None:
+            trace.record(
+                "context",
+                stats.seconds,
+                chunks_in=stats.chunks_in,
+                chunks_out=stats.chunks_out,
+                tokens_before=stats.tokens_before,
+                tokens_after=stats.tokens_after,
+            )
+        return context
+
+    def count_prompt(prompt_value, config):
+        trace = trace_of(config)
+        if trace is not None:
+            # Estimated like the context budget, since the model reports no usage when streaming
+            trace.annotate("generation", prompt_tokens=estimate_tokens(prompt_value.to_string()))
+        return prompt_value
 
     prompt_template = """
     Answer the question as detailed as possible from the provided context. Make sure to provide all the details. If the answer is not in
@@ -25,33 +228,714 @@ def get_retrieval_chain(vector_store):
 
     # This is the modern LCEL (LangChain Expression Language) way to build chains
     chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
+        RunnablePassthrough.assign(context=itemgetter("context") | RunnableLambda(build_context))
         | prompt
+        | RunnableLambda(count_prompt)
         | model
         | StrOutputParser()
     )
     
     return chain
 
-def user_input(user_question: str):
+@dataclass
+class AnswerTimings:
+    """
+    Latencies of one streamed answer, in seconds from the question. They are
+    filled in while the answer streams and are final once it has ended.
+    """
+
+    retrieval_seconds: Optional[float] = None
+    first_token_seconds: Optional[float] = None
+    total_seconds: Optional[float] = None
+    cached: bool = False
+    precomputed: bool = False
+    # Shared with an identical question that was already being answered
+    coalesced: bool = False
+    context: Optional[ContextStats] = None
+    # The stage-by-stage breakdown, see Trace.to_dict()
+    trace: Optional[dict] = None
+
+    def summary(self) -> str:
+        parts = []
+        for label, seconds in (
+            ("retrieval", self.retrieval_seconds),
+            ("first token", self.first_token_seconds),
+            ("total", self.total_seconds),
+        ):
+            if seconds is not None:
+                parts.append(f"{label} {seconds * 1000:.0f} ms")
+        if self.context is not None:
+            parts.append(f"context {self.context.tokens_before} → {self.context.tokens_after} tokens")
+        if self.cached:
+            parts.append("cached answer")
+        if self.coalesced:
+            parts.append("shared in-flight answer")
+        if self.precomputed:
+            parts.append("precomputed summary")
+        return " · ".join(parts)
+
+class QueryEngine:
+    """
+    Keeps the vector store, embeddings client and retrieval chain resident
+    between questions. The store is only reloaded when a new generation of
+    it is published; until then questions are answered from the old one.
+
+    Args:
+        store_dir (str): The vector store directory of the engine's namespace.
+        on_load: Called with the engine after every (re)load of its store.
+    """
+
+    def __init__(self, store_dir: str = VECTOR_STORE_DIR, on_load=None):
+        self.store_dir = store_dir
+        self.on_load = on_load
+        # The size of the loaded index, or 0 until it is loaded
+        self.resident_bytes = 0
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._model = None
+        self._vector_store = None
+        self._chain = None
+        # Answers in flight per loaded store, and replaced stores still in use
+        self._leases = Counter()
+        self._retired = set()
+        self._deleted = frozenset()
+        self._index_stats = {}
+        self._signature = None
+        self._retrieval_seconds = deque(maxlen=1000)
+        self._first_token_seconds = deque(maxlen=1000)
+        self._total_seconds = deque(maxlen=1000)
+        self._contexts = deque(maxlen=1000)
+        self._hits = 0
+        self._reloads = 0
+        self._summaries = {}
+        self.answer_cache = AnswerCache()
+        self._flights = SingleFlight()
+
+    def _store_signature(self):
+        """
+        Returns a cheap fingerprint of the published generation: the mtime
+        and size of the generation stamp and of the manifest naming the index.
+        """
+        signature = []
+        for name in (GENERATION_FILE, MANIFEST_FILE):
+            try:
+                stat = os.stat(os.path.join(self.store_dir, name))
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get_chain(self):
+        """
+        Returns the resident retrieval chain, reloading the store first if it
+        changed on disk since it was last loaded.
+        """
+        chain, _ = self._checkout(lease=False)
+        return chain
+
+    def _checkout(self, lease: bool):
+        """
+        Returns the resident retrieval chain and the store it searches,
+        reloading them first if the store changed on disk. A leased store is
+        kept open until it is released, even if a newer generation replaces
+        it meanwhile; a replaced store nobody holds is closed right away.
+        """
+        signature = self._store_signature()
+        model = self.get_model()
+        with self._lock:
+            if self._chain is not None and signature == self._signature:
+                self._hits += 1
+                if lease:
+                    self._leases[self._vector_store] += 1
+                return self._chain, self._vector_store
+
+            # The clients are independent of the store, so they survive reloads
+            if self._embeddings is None:
+                self._embeddings = get_embeddings()
+
+            # Loading a snapshot does not need the manager lock, so queries
+            # keep being answered while an ingestion holds it
+            chunk_index = get_index_manager(self.store_dir).load(mmap=True, read_only=True)
+            if chunk_index is None:
+                raise FileNotFoundError("No documents have been indexed yet.")
+            # Deleted documents stay in the index until compaction
+            manifest = chunk_index.manifest
+            try:
+                check_embedding_model(manifest, self._embeddings.model_name)
+            except ValueError:
+                chunk_index.store.close()
+                raise
+            previous, self._vector_store = self._vector_store, chunk_index
+            if previous is not None:
+                self._retired.add(previous)
+                self._close_retired(previous)
+            self._deleted = frozenset(manifest["deleted"])
+            self._index_stats = manifest.get("index", {})
+            self._chain = get_retrieval_chain(
+                self._vector_store, self._embeddings, model, on_retrieval=self._retrieval_seconds.append,
+                on_context=self._contexts.append,
+            )
+            self._signature = signature
+            self._reloads += 1
+            self.resident_bytes = self._index_stats.get("bytes") or 0
+            # Answers computed against the previous index are stale
+            self.answer_cache.invalidate(signature)
+            chain = self._chain
+            if lease:
+                self._leases[chunk_index] += 1
+        if self.on_load is not None:
+            # Outside the lock, since it may unload other engines
+            self.on_load(self)
+        return chain, chunk_index
+
+    def _lease(self, chunk_index):
+        with self._lock:
+            self._leases[chunk_index] += 1
+
+    def _release(self, chunk_index):
+        """
+        Ends an answer's hold on a store, closing the store if a newer
+        generation replaced it and this was the last answer using it.
+        """
+        with self._lock:
+            self._leases[chunk_index] -= 1
+            self._close_retired(chunk_index)
+
+    def _close_retired(self, chunk_index):
+        # Must be called with the lock held
+        if self._leases[chunk_index] > 0:
+            return
+        del self._leases[chunk_index]
+        if chunk_index in self._retired:
+            self._retired.discard(chunk_index)
+            chunk_index.store.close()
+
+    def get_model(self):
+        """
+        Returns the chat model the engine answers with, the process-wide one
+        unless it was given its own.
+        """
+        if self._model is None:
+            self._model = get_chat_model()
+        return self._model
+
+    def search_config(self, doc_ids=None) -> dict:
+        """
+        Returns the chain config that scopes retrieval to some documents and
+        hides deleted documents that have not been compacted away yet.
+
+        Args:
+            doc_ids: The ids of the documents to search. All if omitted.
+        """
+        deleted = self._deleted
+        if not doc_ids and not deleted:
+            return {}
+
+        search_kwargs = {
+            "k": RETRIEVAL_K,
+            "fetch_k": RETRIEVAL_FETCH_K,
+            "doc_ids": list(doc_ids) if doc_ids else None,
+            "exclude_doc_ids": list(deleted),
+        }
+        return {"configurable": {"search_kwargs": search_kwargs}}
+
+    def invoke(self, question: str, doc_ids=None, timings: Optional[AnswerTimings] = None) -> str:
+        """
+        Answers a question against the resident chain. Like stream(), it
+        shares the answer of an identical question already in flight.
+
+        Args:
+            question (str): The user's question.
+            doc_ids: The ids of the documents to search. All if omitted.
+            timings: Filled in with the latencies and trace of this answer.
+        """
+        return "".join(self._answer(question, doc_ids, timings, streaming=False))
+
+    def _traced_chain(self, trace: Trace):
+        """
+        Returns the resident chain and the store it searches, leased until
+        the caller passes the store to _release().
+        """
+        reloads = self._reloads
+        with trace.span("load") as span:
+            chain, chunk_index = self._checkout(lease=True)
+            span.set(reloaded=self._reloads != reloads)
+        return chain, chunk_index
+
+    @staticmethod
+    def _record_generation(trace: Trace, chain_seconds: float, answer: str):
+        # The model runs last in the chain, so it took whatever the earlier stages did not
+        earlier = sum(span.seconds for span in trace.stages() if span.name in ("retrieval", "context"))
+        trace.record("generation", max(0.0, chain_seconds - earlier), response_tokens=estimate_tokens(answer))
+
+    def _precomputed_answer(self, chunk_index, question: str, doc_ids=None, trace: Optional[Trace] = None) -> Optional[str]:
+        """
+        Answers a summary-style question ("Summarize this document") from the
+        summary trees built at ingestion, or returns None if the question is
+        about something more specific or a document in scope has no summary.
+        """
+        intent = summary_intent(question)
+        if intent is None:
+            return None
+        start = time.perf_counter()
+        documents = chunk_index.manifest["documents"]
+        scope = [doc_id for doc_id in (doc_ids or documents) if doc_id in documents and doc_id not in self._deleted]
+        summaries = {}
+        for doc_id in scope:
+            # Document ids are content hashes, so a summary never goes stale
+            summary = self._summaries.get(doc_id) or load_summary(self.store_dir, doc_id)
+            if summary is None:
+                break
+            self._summaries[doc_id] = summaries[doc_id] = summary
+        answer = summary_answer(summaries, intent) if scope and len(summaries) == len(scope) else None
+        if trace is not None:
+            trace.record("summary", time.perf_counter() - start, intent=intent, hit=answer is not None, documents=len(scope))
+        return answer
+
+    def _cached_answer(self, chunk_index, question: str, doc_ids=None, trace: Optional[Trace] = None):
+        """
+        Looks a question up in the answer cache.
+
+        Returns:
+            tuple: The (generation, scope) cache key, the question embedding
+            (None if it was not needed), the search metadata the retriever
+            reuses, and the cached answer, or None on a miss.
+        """
+        start = time.perf_counter()
+        vector = None
+        metadata = {}
+        if HYBRID_SEARCH and LEXICAL_FAST_PATH:
+            # Handed to the retriever, so the keyword index is searched once
+            metadata["lexical_hits"] = chunk_index.lexical_fast_path(question, RETRIEVAL_K, doc_ids, self._deleted)
+        # Questions the retriever answers from keywords alone are only matched
+        # by text, so they are never embedded at all
+        if metadata.get("lexical_hits") is None:
+            # The query embedding is cached, so retrieval does not embed it again
+            vector = self._embeddings.embed_query(question)
+        cache_key = (self._signature, tuple(sorted(doc_ids)) if doc_ids else None)
+        answer = self.answer_cache.get(*cache_key, question, vector)
+        if trace is not None:
+            trace.record("answer_cache", time.perf_counter() - start, cache_hit=answer is not None, embedded=vector is not None)
+        return cache_key, vector, metadata, answer
+
+    def stream(self, question: str, doc_ids=None, timings: Optional[AnswerTimings] = None) -> Iterator[str]:
+        """
+        Answers a question against the resident chain, yielding the answer
+        tokens as the model generates them. A question asked again while an
+        identical one (same generation, question and documents) is still
+        being answered shares its answer instead of being answered again.
+
+        Args:
+            question (str): The user's question.
+            doc_ids: The ids of the documents to search. All if omitted.
+            timings: Filled in with the latencies of this answer.
+        """
+        yield from self._answer(question, doc_ids, timings, streaming=True)
+
+    def _answer(self, question: str, doc_ids, timings: Optional[AnswerTimings], streaming: bool) -> Iterator[str]:
+        timings = timings if timings is not None else AnswerTimings()
+        start = time.perf_counter()
+        with Trace("query", question_chars=len(question)) as trace:
+            chain, chunk_index = self._traced_chain(trace)
+            try:
+                answer = self._precomputed_answer(chunk_index, question, doc_ids, trace)
+                if answer is not None:
+                    timings.precomputed = True
+                    timings.first_token_seconds = timings.total_seconds = time.perf_counter() - start
+                    trace.finish()
+                    timings.trace = trace.to_dict()
+                    yield answer
+                    return
+
+                key = (self._signature, question, tuple(sorted(doc_ids)) if doc_ids else None)
+                tokens, timings.coalesced = self._flights.join(
+                    key, lambda: self._generate(chain, chunk_index, question, doc_ids, timings, trace, streaming)
+                )
+                trace.annotate(coalesced=timings.coalesced)
+                for token in tokens:
+                    if timings.first_token_seconds is None and token:
+                        timings.first_token_seconds = time.perf_counter() - start
+                    yield token
+                timings.total_seconds = time.perf_counter() - start
+                if not timings.cached:
+                    if timings.first_token_seconds is not None:
+                        trace.annotate(first_token_ms=_ms(timings.first_token_seconds))
+                    with self._lock:
+                        if timings.first_token_seconds is not None:
+                            self._first_token_seconds.append(timings.first_token_seconds)
+                        self._total_seconds.append(timings.total_seconds)
+                trace.finish()
+                timings.trace = trace.to_dict()
+            finally:
+                self._release(chunk_index)
+
+    def _generate(self, chain, chunk_index, question: str, doc_ids, timings: AnswerTimings, trace: Trace, streaming: bool) -> Iterator[str]:
+        """
+        Answers a question from the answer cache or the chain, and caches a
+        generated answer. Runs once for every caller asking the same question
+        at the same time, with the timings and trace of the caller that
+        started it. The answer is streamed token by token if that caller
+        streams it, and produced in one piece otherwise.
+        """
+        # Holds the store even if the caller that started it stops reading
+        self._lease(chunk_index)
+        try:
+            cache_key, vector, search_metadata, answer = self._cached_answer(chunk_index, question, doc_ids, trace)
+            if answer is not None:
+                timings.cached = True
+                yield answer
+                return
+
+            config = self.search_config(doc_ids)
+            config["metadata"] = {"answer_timings": timings, "trace": trace, **search_metadata}
+            start = time.perf_counter()
+            if streaming:
+                tokens = []
+                for token in chain.stream(question, config=config):
+                    tokens.append(token)
+                    yield token
+                answer = "".join(tokens)
+            else:
+                answer = chain.invoke(question, config=config)
+                yield answer
+            seconds = time.perf_counter() - start
+            self._record_generation(trace, seconds, answer)
+            self.answer_cache.put(*cache_key, question, vector, answer, seconds)
+        finally:
+            self._release(chunk_index)
+
+    def batch(self, questions: List[str], doc_ids=None, max_concurrency: int = BATCH_MAX_CONCURRENCY) -> List[dict]:
+        """
+        Answers a list of questions at once. Questions the keyword index
+        cannot answer confidently are embedded in one batched call and
+        searched in one vectorized index call, and the answers are generated
+        through the answer chain's batch() with bounded concurrency.
+
+        Args:
+            questions (List[str]): The questions.
+            doc_ids: The ids of the documents to search. All if omitted.
+            max_concurrency (int): The maximum number of answers generated at once.
+
+        Returns:
+            List[dict]: One result per question, in order, with its "answer"
+            (or "error") and timings in milliseconds.
+        """
+        with Trace("batch", questions=len(questions)) as trace:
+            start = time.perf_counter()
+            _, chunk_index = self._traced_chain(trace)
+            try:
+                return self._batch(chunk_index, questions, doc_ids, max_concurrency, trace, start)
+            finally:
+                self._release(chunk_index)
+
+    def _batch(self, chunk_index, questions: List[str], doc_ids, max_concurrency: int, trace: Trace, start: float) -> List[dict]:
+        k, fetch_k = RETRIEVAL_K, max(RETRIEVAL_FETCH_K, RETRIEVAL_K)
+        exclude_doc_ids = list(self._deleted)
+        results = [{"question": question} for question in questions]
+
+        # Summary questions are answered from the precomputed summary trees
+        for result, question in zip(results, questions):
+            summary_start = time.perf_counter()
+            answer = self._precomputed_answer(chunk_index, question, doc_ids, trace)
+            if answer is not None:
+                result["answer"] = answer
+                result["retrieval_ms"] = _ms(time.perf_counter() - summary_start)
+                result["retrieval"] = "summary"
+
+        # Keyword fast path first, so those questions are never embedded
+        contexts = [None] * len(questions)
+        for i, question in enumerate(questions):
+            if "answer" in results[i]:
+                contexts[i] = []
+            elif HYBRID_SEARCH and LEXICAL_FAST_PATH:
+                retrieval_start = time.perf_counter()
+                hits = chunk_index.lexical_fast_path(question, k, doc_ids, exclude_doc_ids)
+                seconds = time.perf_counter() - retrieval_start
+                trace.record("lexical_fast_path", seconds, matched=hits is not None)
+                if hits is not None:
+                    contexts[i] = [chunk for chunk, _ in hits]
+                    results[i]["retrieval_ms"] = _ms(seconds)
+                    results[i]["retrieval"] = "lexical"
+
+        pending = [i for i, context in enumerate(contexts) if context is None]
+        embed_seconds = search_seconds = 0.0
+        if pending:
+            embed_start = time.perf_counter()
+            vectors = self._embeddings.embed_queries([questions[i] for i in pending])
+            search_start = time.perf_counter()
+            embed_seconds = search_start - embed_start
+            rankings = chunk_index.vector_search_many(vectors, fetch_k)
+            search_seconds = time.perf_counter() - search_start
+            trace.record("embed_query", embed_seconds, questions=len(pending))
+            trace.record("vector_search", search_seconds, questions=len(pending))
+            for i, ranking in zip(pending, rankings):
+                retrieval_start = time.perf_counter()
+                if HYBRID_SEARCH:
+                    hits = chunk_index.fuse(questions[i], ranking, k, fetch_k, doc_ids, exclude_doc_ids, rrf_k=HYBRID_RRF_K)
+                else:
+                    hits = chunk_index.materialize(ranking, k, doc_ids, exclude_doc_ids)
+                contexts[i] = [chunk for chunk, _ in hits]
+                seconds = time.perf_counter() - retrieval_start
+                trace.record("fuse", seconds, chunks=len(contexts[i]))
+                results[i]["retrieval_ms"] = _ms(seconds)
+                results[i]["retrieval"] = "hybrid" if HYBRID_SEARCH else "vector"
+
+        answer_chain = get_answer_chain(self.get_model(), on_context=self._contexts.append)
+
+        def timed_answer(inputs, config):
+            generation_start = time.perf_counter()
+            answer = answer_chain.invoke(inputs, config)
+            seconds = time.perf_counter() - generation_start
+            # Includes the context assembly, which is also recorded on its own
+            trace.record("generation", seconds, response_tokens=estimate_tokens(answer))
+            return answer, seconds
+
+        generate = [i for i, result in enumerate(results) if "answer" not in result]
+        answers = RunnableLambda(timed_answer).batch(
+            [{"context": contexts[i], "question": questions[i]} for i in generate],
+            config={"max_concurrency": max_concurrency, "metadata": {"trace": trace}},
+            return_exceptions=True,
+        )
+        for result, answer in zip((results[i] for i in generate), answers):
+            if isinstance(answer, Exception):
+                result["error"] = str(answer)
+                trace.annotate(errors=1)
+            else:
+                result["answer"], generation_seconds = answer
+                result["generation_ms"] = _ms(generation_seconds)
+
+        # Work shared by the whole batch is reported once per result
+        total_ms = _ms(time.perf_counter() - start)
+        for result in results:
+            result["batch_embed_ms"] = _ms(embed_seconds)
+            result["batch_search_ms"] = _ms(search_seconds)
+            result["batch_total_ms"] = total_ms
+        return results
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/reload counters of the resident store, its index type,
+        size and build time, the retrieval, first-token and total latency
+        percentiles, the prompt context sizes before and after compaction, the
+        embedding and answer cache statistics and how many questions shared
+        an identical in-flight answer.
+        """
+        with self._lock:
+            contexts = list(self._contexts)
+            return {
+                "hits": self._hits,
+                "reloads": self._reloads,
+                "resident_bytes": self.resident_bytes,
+                "index": dict(self._index_stats),
+                "retrieval_ms": _latency_stats(self._retrieval_seconds),
+                "first_token_ms": _latency_stats(self._first_token_seconds),
+                "total_ms": _latency_stats(self._total_seconds),
+                "context": {
+                    "count": len(contexts),
+                    "compaction": CONTEXT_COMPACTION,
+                    "tokens_before": sum(stats.tokens_before for stats in contexts),
+                    "tokens_after": sum(stats.tokens_after for stats in contexts),
+                    "assembly_ms": _latency_stats([stats.seconds for stats in contexts]),
+                },
+                "embedding_cache": get_embeddings().stats(),
+                "answer_cache": self.answer_cache.stats(),
+                "single_flight": self._flights.stats(),
+            }
+
+def _latency_stats(seconds) -> dict:
+    latencies = sorted(seconds)
+    return {
+        "count": len(latencies),
+        "p50": _percentile_ms(latencies, 0.50),
+        "p95": _percentile_ms(latencies, 0.95),
+    }
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+def _percentile_ms(sorted_seconds, fraction: float):
+    if not sorted_seconds:
+        return None
+    position = min(len(sorted_seconds) - 1, int(fraction * len(sorted_seconds)))
+    return round(sorted_seconds[position] * 1000, 2)
+
+class ResidentIndexes:
+    """
+    The query engines of the index namespaces, each keeping its namespace's
+    index resident. Once the loaded indexes together take more than
+    budget_bytes, the least recently used engines are dropped; questions
+    still running on one finish against it, and the next question to its
+    namespace loads the index again. A single index larger than the budget
+    is still loaded, as the only resident one. Engines not used for
+    idle_seconds are dropped too, loaded or not, so namespaces that stop
+    being used (e.g. of ended app sessions) do not accumulate.
+    """
+
+    def __init__(self, budget_bytes: int = RESIDENT_INDEX_BUDGET_BYTES, idle_seconds: float = RESIDENT_INDEX_IDLE_SECONDS):
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        # Least recently used first, with the time of their last use
+        self._engines = OrderedDict()
+        self._last_used = {}
+        self._loads = 0
+        self._evictions = 0
+        self._evicted_bytes = 0
+        self._expirations = 0
+
+    def get(self, store_dir: str) -> QueryEngine:
+        """
+        Returns the query engine of a vector store directory, creating it
+        (without loading its index yet) if it is not resident.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            engine = self._engines.get(store_dir)
+            if engine is None:
+                engine = self._engines[store_dir] = QueryEngine(store_dir, on_load=self._loaded)
+            self._engines.move_to_end(store_dir)
+            self._last_used[store_dir] = now
+            return engine
+
+    def _drop(self, store_dir: str) -> QueryEngine:
+        del self._last_used[store_dir]
+        return self._engines.pop(store_dir)
+
+    def _expire(self, now: float):
+        # The least recently used come first, so stop at the first recent one
+        for store_dir in list(self._engines):
+            if now - self._last_used[store_dir] <= self.idle_seconds:
+                break
+            self._drop(store_dir)
+            self._expirations += 1
+
+    def _loaded(self, engine: QueryEngine):
+        with self._lock:
+            if self._engines.get(engine.store_dir) is not engine:
+                # Evicted while it was loading; it is freed once its questions end
+                return
+            self._loads += 1
+            self._expire(time.monotonic())
+            resident = sum(other.resident_bytes for other in self._engines.values())
+            for store_dir in list(self._engines):
+                if resident <= self.budget_bytes:
+                    break
+                if store_dir == engine.store_dir:
+                    continue
+                evicted = self._drop(store_dir)
+                resident -= evicted.resident_bytes
+                if evicted.resident_bytes:
+                    self._evictions += 1
+                    self._evicted_bytes += evicted.resident_bytes
+
+    def stats(self) -> dict:
+        """
+        Returns the budget, the bytes of the indexes currently loaded, and
+        how many loads, evictions and idle expirations there have been.
+        """
+        with self._lock:
+            engines = list(self._engines.values())
+            return {
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": sum(engine.resident_bytes for engine in engines),
+                "resident_indexes": sum(1 for engine in engines if engine.resident_bytes),
+                "namespaces": len(engines),
+                "loads": self._loads,
+                "evictions": self._evictions,
+                "evicted_bytes": self._evicted_bytes,
+                "expirations": self._expirations,
+            }
+
+_resident_indexes = None
+_resident_indexes_lock = threading.Lock()
+
+def get_resident_indexes() -> ResidentIndexes:
+    """
+    Returns the process-wide cache of resident indexes, shared by all
+    Streamlit sessions and threads.
+    """
+    global _resident_indexes
+    if _resident_indexes is None:
+        with _resident_indexes_lock:
+            if _resident_indexes is None:
+                _resident_indexes = ResidentIndexes()
+    return _resident_indexes
+
+def get_query_engine(namespace: Optional[str] = None) -> QueryEngine:
+    """
+    Returns the query engine of an index namespace (the default one if
+    omitted), loading its index on the first question.
+    """
+    store_dir = store_dir_of(namespace)
+    touch_namespace(namespace)
+    return get_resident_indexes().get(store_dir)
+
+_chat_model = None
+_chat_model_lock = threading.Lock()
+
+def get_chat_model():
+    """
+    Returns the process-wide chat model, shared by the query engines of every
+    namespace and used to summarize documents.
+    """
+    global _chat_model
+    if _chat_model is None:
+        with _chat_model_lock:
+            if _chat_model is None:
+                _chat_model = ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=CHAT_TEMPERATURE)
+    return _chat_model
+
+def user_input(user_question: str, doc_ids=None, namespace: Optional[str] = None):
     """
     Handles user input by querying the vector store and generating a response.
     
     Args:
         user_question (str): The user's question.
+        doc_ids: The ids of the documents to search. All if omitted.
+        namespace: The index namespace to search. The default one if omitted.
 
     Returns:
-        dict: A dictionary containing the answer.
+        dict: A dictionary containing the answer, and the trace of its stages.
     """
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    
-    # allow_dangerous_deserialization is needed for FAISS with langchain
-    vector_store = FAISS.load_local("vector_store", embeddings, allow_dangerous_deserialization=True)
-    
-    chain = get_retrieval_chain(vector_store)
-    
     # Use .invoke() which is the new standard method
-    response = chain.invoke(user_question)
+    timings = AnswerTimings()
+    response = get_query_engine(namespace).invoke(user_question, doc_ids, timings)
     
-    return {"answer": response}
+    return {"answer": response, "trace": timings.trace}
 
+def stream_user_input(user_question: str, doc_ids=None, namespace: Optional[str] = None):
+    """
+    Handles user input like user_input, but streams the answer.
+
+    Args:
+        user_question (str): The user's question.
+        doc_ids: The ids of the documents to search. All if omitted.
+        namespace: The index namespace to search. The default one if omitted.
+
+    Returns:
+        tuple: An iterator over the answer tokens, and the AnswerTimings it
+        fills in as it is consumed.
+    """
+    timings = AnswerTimings()
+    return get_query_engine(namespace).stream(user_question, doc_ids, timings), timings
+
+def answer_questions(
+    questions: List[str],
+    doc_ids=None,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    namespace: Optional[str] = None,
+) -> List[dict]:
+    """
+    Answers a list of questions in one batch, see QueryEngine.batch().
+
+    Args:
+        questions (List[str]): The questions.
+        doc_ids: The ids of the documents to search. All if omitted.
+        max_concurrency (int): The maximum number of answers generated at once.
+        namespace: The index namespace to search. The default one if omitted.
+
+    Returns:
+        List[dict]: One result per question, in order.
+    """
+    return get_query_engine(namespace).batch(questions, doc_ids, max_concurrency)
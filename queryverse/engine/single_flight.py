@@ -0,0 +1,132 @@
+import threading
+from typing import Callable, Hashable, Iterable, Iterator, Tuple
+
+class _Flight:
+    """
+    The tokens produced so far by one in-flight computation.
+    """
+
+    def __init__(self):
+        self.tokens = []
+        self.followers = 0
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+class SingleFlight:
+    """
+    Coalesces identical computations that are in flight at the same time.
+
+    The first caller of a key runs the computation and reads its tokens as
+    usual. Callers arriving with the same key before it ends read the same
+    tokens, as they are produced, instead of running it again. If the first
+    caller stops reading while others are still following, the computation
+    is finished on a thread of its own so they still get the whole result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._started = 0
+        self._coalesced = 0
+
+    def join(self, key: Hashable, produce: Callable[[], Iterable[str]]) -> Tuple[Iterator[str], bool]:
+        """
+        Joins the computation of a key, starting it if none is in flight.
+
+        Args:
+            key: Identifies the computation, e.g. (generation, question).
+            produce: Returns an iterable of the computation's tokens. Only
+                called by the caller that starts the computation.
+
+        Returns:
+            tuple: An iterator over the tokens, which re-raises the error of
+            a failed computation, and whether an in-flight computation was
+            joined rather than started.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self._coalesced += 1
+                return self._follow(flight), True
+            flight = self._flights[key] = _Flight()
+            self._started += 1
+        return self._lead(key, flight, iter(produce())), False
+
+    def _lead(self, key: Hashable, flight: _Flight, tokens: Iterator[str]) -> Iterator[str]:
+        try:
+            for token in tokens:
+                self._publish(flight, token)
+                yield token
+        except GeneratorExit:
+            with self._lock:
+                abandoned = flight.followers == 0
+                if abandoned:
+                    del self._flights[key]
+            if abandoned:
+                close = getattr(tokens, "close", None)
+                if close is not None:
+                    close()
+            else:
+                threading.Thread(
+                    target=self._finish, args=(key, flight, tokens), name="single-flight", daemon=True
+                ).start()
+            raise
+        except Exception as e:
+            self._end(key, flight, e)
+            raise
+        self._end(key, flight, None)
+
+    def _finish(self, key: Hashable, flight: _Flight, tokens: Iterator[str]):
+        try:
+            for token in tokens:
+                self._publish(flight, token)
+        except Exception as e:
+            self._end(key, flight, e)
+            return
+        self._end(key, flight, None)
+
+    @staticmethod
+    def _publish(flight: _Flight, token: str):
+        with flight.condition:
+            flight.tokens.append(token)
+            flight.condition.notify_all()
+
+    def _end(self, key: Hashable, flight: _Flight, error):
+        # Callers arriving from now on start a new computation
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.condition:
+            flight.error = error
+            flight.done = True
+            flight.condition.notify_all()
+
+    @staticmethod
+    def _follow(flight: _Flight) -> Iterator[str]:
+        position = 0
+        while True:
+            with flight.condition:
+                while position == len(flight.tokens) and not flight.done:
+                    flight.condition.wait()
+                tokens = flight.tokens[position:]
+                done = flight.done
+            position += len(tokens)
+            yield from tokens
+            if done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    def stats(self) -> dict:
+        """
+        Returns how many computations were started, how many callers joined
+        one already in flight instead, and how many are in flight now.
+        """
+        with self._lock:
+            return {
+                "started": self._started,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._flights),
+            }
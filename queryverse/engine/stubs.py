@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class StubQuotaError(Exception):
+    """
+    Raised by StubEmbeddings to simulate a Google API quota error (HTTP 429).
+    """
+
+    code = 429
+
+class StubEmbeddings(Embeddings):
+    """
+    A deterministic, offline stand-in for GoogleGenerativeAIEmbeddings.
+
+    Every text maps to the same unit vector on every run. Each call sleeps
+    for a simulated network latency, and every quota_every-th call fails with
+    a StubQuotaError so rate-limit handling can be exercised locally.
+    """
+
+    def __init__(self, size: int = 768, latency: float = 0.0, quota_every: int = 0):
+        self.size = size
+        self.latency = latency
+        self.quota_every = quota_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.quota_every and calls % self.quota_every == 0:
+            raise StubQuotaError("429 Resource has been exhausted (e.g. check quota).")
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call()
+        return self._vector(text)
+
+class StubChatModel(BaseChatModel):
+    """
+    A deterministic, offline stand-in for ChatGoogleGenerativeAI.
+
+    The answer is made of the first answer_words words of the prompt's last
+    lines, so it is the same on every run. The first token arrives after a
+    simulated latency and every further token after token_latency seconds.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    answer_words: int = 50
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _answer_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        words = " ".join(str(message.content) for message in messages).split()
+        return [word + " " for word in words[-self.answer_words:]]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._answer_tokens(messages)
+        time.sleep(self.latency + self.token_latency * max(0, len(tokens) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._answer_tokens(messages)):
+            time.sleep(self.latency if i == 0 else self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
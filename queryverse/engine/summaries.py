@@ -0,0 +1,182 @@
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from engine.chunk_store import lexical_terms
+from engine.config import SUMMARIES_DIR, SUMMARY_FAN_IN, SUMMARY_MAX_CONCURRENCY, SUMMARY_SECTION_CHUNKS
+
+MAP_PROMPT = PromptTemplate.from_template("""
+Summarize the following section of a document in a few sentences. Keep its key facts, figures and
+conclusions, and do not add anything that is not in the text.\n\n
+Section:\n{text}\n
+
+Summary:
+""")
+
+REDUCE_PROMPT = PromptTemplate.from_template("""
+The following are summaries of consecutive sections of a document. Combine them into a single
+summary that covers all of them, keeping the key facts, figures and conclusions.\n\n
+Summaries:\n{summaries}\n
+
+Combined summary:
+""")
+
+CONCLUSIONS_PROMPT = PromptTemplate.from_template("""
+The following are summaries of the parts of a document. List the main conclusions of the document
+as a few short bullet points, based only on these summaries.\n\n
+Summaries:\n{summaries}\n
+
+Main conclusions:
+""")
+
+# Question words that only say "the whole document", so a summary question
+# about a specific topic still goes through retrieval
+_GENERIC_TERMS = frozenset("""
+summarize summarise summary summarization overview gist tl dr recap brief short quick give provide
+document doc file pdf paper report text whole entire please main key conclusions conclusion
+takeaways takeaway findings points
+""".split())
+
+_INTENT_TERMS = {
+    "conclusions": ("conclusions", "conclusion", "takeaways", "takeaway", "findings"),
+    "summary": ("summarize", "summarise", "summary", "summarization", "overview", "gist", "tl", "recap"),
+}
+
+def summary_intent(question: str) -> Optional[str]:
+    """
+    Returns which precomputed answer a question asks for: "summary",
+    "conclusions", or None if it is about anything more specific.
+    """
+    terms = lexical_terms(question)
+    if not terms or set(terms) - _GENERIC_TERMS:
+        return None
+    for intent, intent_terms in _INTENT_TERMS.items():
+        if any(term in intent_terms for term in terms):
+            return intent
+    return None
+
+def summary_path(store_dir: str, doc_id: str) -> str:
+    return os.path.join(store_dir, SUMMARIES_DIR, f"{doc_id}.json")
+
+def load_summary(store_dir: str, doc_id: str) -> Optional[dict]:
+    """
+    Loads the summary tree of a document, or returns None if it has none.
+    """
+    try:
+        with open(summary_path(store_dir, doc_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_summary(store_dir: str, summary: dict):
+    """
+    Atomically writes the summary tree of a document next to the index.
+    """
+    path = summary_path(store_dir, summary["doc_id"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, path)
+
+def remove_summaries(store_dir: str, doc_ids: Iterable[str]):
+    """
+    Deletes the summary trees of some documents, if they have any.
+    """
+    for doc_id in doc_ids:
+        try:
+            os.remove(summary_path(store_dir, doc_id))
+        except FileNotFoundError:
+            pass
+
+def _pages(chunks: List[Document]) -> List[Optional[int]]:
+    pages = [chunk.metadata.get("page") for chunk in chunks if chunk.metadata.get("page") is not None]
+    return [min(pages), max(pages)] if pages else [None, None]
+
+def build_summary_tree(
+    chunks: List[Document],
+    model,
+    section_chunks: int = SUMMARY_SECTION_CHUNKS,
+    fan_in: int = SUMMARY_FAN_IN,
+    max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+) -> dict:
+    """
+    Summarizes a document map-reduce style: every section of section_chunks
+    consecutive chunks is summarized (in parallel), then the summaries are
+    combined fan_in at a time, level by level, until one is left. The main
+    conclusions are drawn from the level below the root.
+
+    Args:
+        chunks (List[Document]): The chunks of the document, in order.
+        model: The chat model to summarize with.
+        section_chunks (int): The number of chunks per section.
+        fan_in (int): The number of summaries combined per reduce step.
+        max_concurrency (int): The maximum number of model calls at once.
+
+    Returns:
+        dict: The "summary", the "conclusions" and every "level" of the
+        tree, from the section summaries (with their page ranges) up.
+    """
+    if not chunks:
+        raise ValueError("The document has no chunks to summarize.")
+    config = {"max_concurrency": max_concurrency}
+    map_chain = MAP_PROMPT | model | StrOutputParser()
+    reduce_chain = REDUCE_PROMPT | model | StrOutputParser()
+
+    sections = [chunks[i:i + section_chunks] for i in range(0, len(chunks), section_chunks)]
+    texts = map_chain.batch([{"text": "\n\n".join(chunk.page_content for chunk in section)} for section in sections], config)
+    level = [{"text": text.strip(), "pages": _pages(section)} for text, section in zip(texts, sections)]
+    levels = [level]
+
+    while len(level) > 1:
+        groups = [level[i:i + max(2, fan_in)] for i in range(0, len(level), max(2, fan_in))]
+        texts = reduce_chain.batch([{"summaries": "\n\n".join(node["text"] for node in group)} for group in groups], config)
+        level = [
+            {"text": text.strip(), "pages": [group[0]["pages"][0], group[-1]["pages"][1]]}
+            for text, group in zip(texts, groups)
+        ]
+        levels.append(level)
+
+    # The root alone would hide conclusions that only one part reaches
+    below_root = levels[-2] if len(levels) > 1 else levels[-1]
+    conclusions = (CONCLUSIONS_PROMPT | model | StrOutputParser()).invoke(
+        {"summaries": "\n\n".join(node["text"] for node in below_root)}
+    )
+    return {"summary": levels[-1][0]["text"], "conclusions": conclusions.strip(), "levels": levels}
+
+def summarize_document(store_dir: str, entry: dict, chunks: List[Document], model) -> dict:
+    """
+    Builds the summary tree of an ingested document and stores it next to
+    the index.
+
+    Args:
+        store_dir (str): The vector store directory.
+        entry (dict): The manifest entry of the document.
+        chunks (List[Document]): Its chunks, in order.
+        model: The chat model to summarize with.
+    """
+    start = time.perf_counter()
+    tree = build_summary_tree(chunks, model)
+    summary = {
+        "doc_id": entry["doc_id"],
+        "source": entry["source"],
+        **tree,
+        "chunks": len(chunks),
+        "build_seconds": round(time.perf_counter() - start, 3),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    save_summary(store_dir, summary)
+    return summary
+
+def summary_answer(summaries: Dict[str, dict], intent: str) -> str:
+    """
+    Formats the precomputed answer to a summary-style question about one or
+    more documents.
+    """
+    if len(summaries) == 1:
+        return next(iter(summaries.values()))[intent]
+    return "\n\n".join(f"**{summary['source']}**\n\n{summary[intent]}" for summary in summaries.values())
@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from engine.config import TRACE_HISTORY, TRACE_LOG_PATH, TRACING
+
+# Upper bounds of the stage latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Span:
+    """
+    One stage of a trace. Stages that run many times in a request (e.g. one
+    embedding call per batch) are accumulated into a single span, whose
+    count is the number of runs and whose numeric attributes are summed.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.seconds = 0.0
+        self.count = 0
+        self.attributes = dict(attributes)
+
+    def add(self, seconds: float, **attributes):
+        self.seconds += seconds
+        self.count += 1
+        self.annotate(**attributes)
+
+    def annotate(self, **attributes):
+        for name, value in attributes.items():
+            previous = self.attributes.get(name)
+            if _is_number(value) and _is_number(previous):
+                self.attributes[name] = previous + value
+            else:
+                self.attributes[name] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ms": round(self.seconds * 1000, 3),
+            "count": self.count,
+            "attributes": dict(self.attributes),
+        }
+
+class Trace:
+    """
+    The stage-by-stage breakdown of one request (an ingestion, a query or a
+    batch). Stages are recorded from any thread; the trace is handed to the
+    metrics registry when it finishes, which it does on leaving a with block.
+
+    Usage:
+        with Trace("query") as trace:
+            with trace.span("retrieval", chunks=4):
+                ...
+            trace.record("generation", seconds, response_tokens=120)
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.started_at = time.time()
+        self.seconds = None
+        self.error = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        # Stage name -> Span, in the order the stages first ran
+        self._spans = {}
+
+    def _span(self, name: str) -> Span:
+        if name not in self._spans:
+            self._spans[name] = Span(name)
+        return self._spans[name]
+
+    def record(self, name: str, seconds: float, **attributes):
+        """
+        Adds a run of a stage that took some seconds.
+        """
+        with self._lock:
+            self._span(name).add(seconds, **attributes)
+
+    def annotate(self, name: Optional[str] = None, **attributes):
+        """
+        Attaches attributes to a stage, or to the whole trace if no stage is
+        named, without adding a run.
+        """
+        with self._lock:
+            if name is None:
+                self.attributes.update(attributes)
+            else:
+                self._span(name).annotate(**attributes)
+
+    def span(self, name: str, **attributes) -> "_TimedSpan":
+        """
+        Returns a context manager recording a run of a stage around a block.
+        Attributes known only at the end of the block are passed to the
+        set() method of the object it yields.
+        """
+        return _TimedSpan(self, name, attributes)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def finish(self, error: Optional[BaseException] = None):
+        """
+        Ends the trace and records it in the process-wide metrics registry.
+        Only the first call has any effect.
+        """
+        with self._lock:
+            if self.seconds is not None:
+                return
+            self.seconds = self.elapsed()
+            if error is not None:
+                self.error = f"{type(error).__name__}: {error}"
+        if TRACING:
+            get_metrics().record(self)
+
+    def __enter__(self) -> "Trace":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A generator closed early is not an error
+        self.finish(exc if isinstance(exc, Exception) else None)
+
+    def stages(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans.values())
+
+    def to_dict(self) -> dict:
+        """
+        Returns the trace as JSON-serializable data.
+        """
+        seconds = self.seconds if self.seconds is not None else self.elapsed()
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "ms": round(seconds * 1000, 3),
+            "error": self.error,
+            "attributes": dict(self.attributes),
+            "stages": [span.to_dict() for span in self.stages()],
+        }
+
+class _TimedSpan:
+    def __init__(self, trace: Trace, name: str, attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "_TimedSpan":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(exc, Exception):
+            self.attributes["error"] = type(exc).__name__
+        self.trace.record(self.name, time.perf_counter() - self._start, **self.attributes)
+
+def trace_of(config) -> Optional[Trace]:
+    """
+    Returns the Trace passed to a chain in its config metadata, if any.
+    """
+    return (config or {}).get("metadata", {}).get("trace")
+
+def _is_number(value) -> bool:
+    # Booleans (e.g. cache_hit) count as 0 or 1
+    return isinstance(value, (int, float))
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRegistry:
+    """
+    Aggregates finished traces into per-stage latency histograms and
+    attribute counters, keeps the most recent traces, and exports them as
+    Prometheus text or JSON lines.
+    """
+
+    def __init__(self, history: int = TRACE_HISTORY, log_path: str = TRACE_LOG_PATH):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._traces = deque(maxlen=history)
+        # (trace name, stage name) -> [bucket counts, count, seconds]
+        self._latencies = {}
+        # (trace name, stage name, attribute) -> sum
+        self._counters = {}
+        self._errors = {}
+
+    def _observe(self, key, seconds: float):
+        buckets, count, total = self._latencies.get(key, ([0] * len(LATENCY_BUCKETS), 0, 0.0))
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+        self._latencies[key] = (buckets, count + 1, total + seconds)
+
+    def _count(self, trace_name: str, stage: str, attributes: dict):
+        for name, value in attributes.items():
+            if _is_number(value):
+                key = (trace_name, stage, name)
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def record(self, trace: Trace):
+        """
+        Adds a finished trace to the metrics and the history.
+        """
+        data = trace.to_dict()
+        with self._lock:
+            self._traces.append(data)
+            self._observe((trace.name, "total"), trace.seconds)
+            self._count(trace.name, "total", trace.attributes)
+            if trace.error is not None:
+                self._errors[trace.name] = self._errors.get(trace.name, 0) + 1
+            for span in trace.stages():
+                if span.count:
+                    self._observe((trace.name, span.name), span.seconds)
+                self._count(trace.name, span.name, span.attributes)
+        if self.log_path:
+            line = json.dumps(data, default=str) + "\n"
+            with self._lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+
+    def last_trace(self, name: Optional[str] = None) -> Optional[dict]:
+        """
+        Returns the most recent finished trace, optionally of a given name.
+        """
+        with self._lock:
+            for data in reversed(self._traces):
+                if name is None or data["name"] == name:
+                    return data
+        return None
+
+    def traces(self, limit: Optional[int] = None) -> List[dict]:
+        """
+        Returns the most recent finished traces, the oldest first.
+        """
+        with self._lock:
+            traces = list(self._traces)
+        return traces[-limit:] if limit else traces
+
+    def jsonl(self, limit: Optional[int] = None) -> str:
+        """
+        Returns the most recent finished traces as JSON lines.
+        """
+        return "".join(json.dumps(data, default=str) + "\n" for data in self.traces(limit))
+
+    def prometheus(self) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format: a
+        latency histogram per (trace, stage), a counter per numeric
+        attribute (chunks, bytes, tokens, cache hits...) and error counts.
+        """
+        with self._lock:
+            latencies = dict(self._latencies)
+            counters = dict(self._counters)
+            errors = dict(self._errors)
+
+        lines = [
+            "# HELP queryverse_stage_seconds Time spent in each stage of a request.",
+            "# TYPE queryverse_stage_seconds histogram",
+        ]
+        for (trace_name, stage), (buckets, count, total) in sorted(latencies.items()):
+            labels = f'trace="{_label(trace_name)}",stage="{_label(stage)}"'
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f'queryverse_stage_seconds_bucket{{{labels},le="{bound}"}} {bucket}')
+            lines.append(f'queryverse_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"queryverse_stage_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"queryverse_stage_seconds_count{{{labels}}} {count}")
+
+        by_attribute = {}
+        for (trace_name, stage, name), value in counters.items():
+            by_attribute.setdefault(_metric_name(name), []).append((trace_name, stage, value))
+        for name, samples in sorted(by_attribute.items()):
+            lines.append(f"# TYPE queryverse_{name}_total counter")
+            for trace_name, stage, value in sorted(samples):
+                labels = f'trace="{_label(trace_name)}",stage="{_label(stage)}"'
+                lines.append(f"queryverse_{name}_total{{{labels}}} {float(value):g}")
+
+        lines.append("# TYPE queryverse_errors_total counter")
+        for trace_name, count in sorted(errors.items()):
+            lines.append(f'queryverse_errors_total{{trace="{_label(trace_name)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Returns the process-wide metrics registry.
+    """
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = MetricsRegistry()
+    return _metrics
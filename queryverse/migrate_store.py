@@ -0,0 +1,32 @@
+import argparse
+import sys
+
+from engine.index_manager import get_index_manager
+from engine.namespaces import store_dir_of
+
+# Versions that saved pickled docstores always embedded with this model
+LEGACY_EMBEDDING_MODEL = "models/embedding-001"
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Converts a vector store saved by older versions with a pickled docstore into the current format. "
+        "Only run it on stores this app wrote, since unpickling a file runs code from it."
+    )
+    parser.add_argument("--namespace", help="The index namespace to migrate. The default one if omitted.")
+    parser.add_argument(
+        "--embedding-model",
+        default=LEGACY_EMBEDDING_MODEL,
+        help="The embedding model the store was built with.",
+    )
+    args = parser.parse_args()
+
+    manager = get_index_manager(store_dir_of(args.namespace))
+    if not manager.is_pickled():
+        print(f"Nothing to migrate in {manager.store_dir}.", file=sys.stderr)
+        return
+    entry = manager.migrate_pickled_store(args.embedding_model)
+    chunks = entry["chunks"] if entry else 0
+    print(f"Migrated {chunks} chunks in {manager.store_dir}.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from engine.config import (
+    SERVICE_HOST,
+    SERVICE_MAX_CONCURRENCY,
+    SERVICE_MAX_QUEUE,
+    SERVICE_PORT,
+)
+from engine.index_manager import get_index_manager, list_documents
+from engine.ingestion import load_and_process_documents, save_upload
+from engine.jobs import get_job_queue
+from engine.namespaces import check_namespace, remove_expired_sessions, store_dir_of, uploads_dir_of
+from engine.query import AnswerTimings, get_query_engine, get_resident_indexes
+from engine.tracing import get_metrics
+
+# How often the namespaces of abandoned app sessions are looked for
+_SESSION_CLEANUP_SECONDS = 3600
+
+class Overloaded(Exception):
+    """
+    Raised when a request arrives while the service queue is full.
+    """
+
+class StreamClosed(Exception):
+    """
+    Raised to a streaming worker when its client has stopped reading.
+    """
+
+class WorkLimiter:
+    """
+    Bounds the engine work the service runs at once. Requests beyond the
+    concurrency limit wait in a queue of bounded length; requests beyond
+    that are rejected so the service sheds load instead of piling it up.
+    Engine calls are blocking, so they run on a thread pool sized to the
+    concurrency limit.
+    """
+
+    def __init__(self, max_concurrency: int = SERVICE_MAX_CONCURRENCY, max_queue: int = SERVICE_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="service")
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._queue_seconds = 0.0
+
+    async def acquire(self):
+        """
+        Waits for a free slot, or raises Overloaded if the queue is full.
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self._queue_seconds += time.perf_counter() - start
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    async def run(self, work, *args):
+        """
+        Runs a blocking function on the worker threads.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, work, *args)
+
+    def start(self, work):
+        """
+        Starts a blocking function on the worker threads, in the slot the
+        caller acquired, and returns an async iterator over every item it
+        passes to its emit callback, as soon as it is emitted.
+
+        The slot is released when the work finishes, not when the iterator
+        is closed, so a client that disconnects cannot free its slot while
+        its work still runs. Once the iterator is closed, emit raises
+        StreamClosed to stop the work early.
+
+        Args:
+            work: Called as work(emit) on a worker thread.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        closed = threading.Event()
+
+        def emit(item):
+            if closed.is_set():
+                raise StreamClosed()
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def produce():
+            try:
+                work(emit)
+            except StreamClosed:
+                pass
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+                loop.call_soon_threadsafe(self.release)
+
+        future = loop.run_in_executor(self._executor, produce)
+
+        async def items():
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    yield item
+                # Re-raise anything the work raised
+                await future
+            finally:
+                closed.set()
+
+        return items()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_seconds": round(self._queue_seconds, 3),
+        }
+
+def _line(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+def _overloaded() -> JSONResponse:
+    return JSONResponse({"error": "The service is busy, retry later."}, status_code=503, headers={"Retry-After": "1"})
+
+def _progress_event(progress) -> dict:
+    event = {key: value for key, value in asdict(progress).items() if key != "page_parse_seconds"}
+    return {"event": "progress", **event, "fraction": progress.fraction}
+
+def _namespace(request: Request):
+    """
+    Returns the index namespace a request works on: the "namespace" query
+    parameter, or the default namespace if it is not given.
+
+    Raises:
+        ValueError: If the namespace name is invalid.
+    """
+    return check_namespace(request.query_params.get("namespace") or None)
+
+async def _question(request: Request):
+    """
+    Reads the question and document scope of a query request.
+
+    Raises:
+        ValueError: If the body is not a JSON object with a non-empty
+            "question" string and, optionally, a "doc_ids" list of strings.
+    """
+    body = await request.json()
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object.")
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError("A non-empty 'question' is required.")
+    doc_ids = body.get("doc_ids")
+    if doc_ids is not None and not (isinstance(doc_ids, list) and all(isinstance(doc_id, str) for doc_id in doc_ids)):
+        raise ValueError("'doc_ids' must be a list of document ids.")
+    return question, doc_ids or None
+
+async def ingest(request: Request):
+    """
+    Ingests the document in the request body, named by the "name" query
+    parameter. Streams NDJSON progress events, then a "done" event with the
+    manifest entry of the document, or an "error" event.
+    """
+    name = request.query_params.get("name")
+    if not name:
+        return JSONResponse({"error": "The 'name' query parameter is required."}, status_code=400)
+    try:
+        namespace = _namespace(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    data = await request.body()
+
+    limiter = request.app.state.limiter
+    try:
+        await limiter.acquire()
+    except Overloaded:
+        return _overloaded()
+
+    def work(emit):
+        try:
+            file_path = save_upload(name, data, uploads_dir_of(namespace))
+            entry = load_and_process_documents(
+                file_path, progress_callback=lambda progress: emit(_progress_event(progress)), namespace=namespace
+            )
+            emit({"event": "done", "document": entry})
+        except Exception as e:
+            emit({"event": "error", "error": str(e)})
+
+    # Started here, so the slot is released even if the body is never sent
+    stream = limiter.start(work)
+
+    async def events():
+        async with contextlib.aclosing(stream):
+            async for event in stream:
+                yield _line(event)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def submit_job(request: Request):
+    """
+    Saves the document in the request body, named by the "name" query
+    parameter, and queues its ingestion as a background job.
+    """
+    name = request.query_params.get("name")
+    if not name:
+        return JSONResponse({"error": "The 'name' query parameter is required."}, status_code=400)
+    try:
+        namespace = _namespace(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    data = await request.body()
+    file_path = await asyncio.to_thread(save_upload, name, data, uploads_dir_of(namespace))
+    job = get_job_queue().submit(file_path, name, namespace)
+    return JSONResponse(job.to_dict(), status_code=202)
+
+async def job_status(request: Request):
+    """
+    Returns the status and progress of an ingestion job.
+    """
+    try:
+        job = get_job_queue().get(request.path_params["job_id"])
+    except KeyError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    return JSONResponse(job.to_dict())
+
+async def jobs(request: Request):
+    """
+    Lists the known ingestion jobs of a namespace, the most recent first.
+    """
+    try:
+        namespace = _namespace(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse([job.to_dict() for job in get_job_queue().jobs(namespace)])
+
+async def query_stream(request: Request):
+    """
+    Answers a JSON {"question", "doc_ids"} request, streaming NDJSON
+    {"token"} events and then a "done" event with the answer's timings.
+    """
+    try:
+        question, doc_ids = await _question(request)
+        namespace = _namespace(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    limiter = request.app.state.limiter
+    try:
+        await limiter.acquire()
+    except Overloaded:
+        return _overloaded()
+
+    timings = AnswerTimings()
+
+    def work(emit):
+        try:
+            for token in get_query_engine(namespace).stream(question, doc_ids, timings):
+                emit({"token": token})
+            emit({"event": "done", "timings": asdict(timings), "summary": timings.summary()})
+        except Exception as e:
+            emit({"event": "error", "error": str(e)})
+
+    # Started here, so the slot is released even if the body is never sent
+    stream = limiter.start(work)
+
+    async def events():
+        async with contextlib.aclosing(stream):
+            async for event in stream:
+                yield _line(event)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def query(request: Request):
+    """
+    Answers a JSON {"question", "doc_ids"} request with the whole answer and
+    its timings.
+    """
+    try:
+        question, doc_ids = await _question(request)
+        namespace = _namespace(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    limiter = request.app.state.limiter
+    try:
+        await limiter.acquire()
+    except Overloaded:
+        return _overloaded()
+
+    timings = AnswerTimings()
+    try:
+        answer = await limiter.run(lambda: "".join(get_query_engine(namespace).stream(question, doc_ids, timings)))
+    except FileNotFoundError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    finally:
+        limiter.release()
+    return JSONResponse({"answer": answer, "timings": asdict(timings), "summary": timings.summary()})
+
+async def documents(request: Request):
+    """
+    Lists the searchable documents of a namespace, keyed by id.
+    """
+    try:
+        namespace = _namespace(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(await asyncio.to_thread(list_documents, namespace))
+
+async def delete_document(request: Request):
+    """
+    Deletes a document from the index.
+    """
+    try:
+        manager = get_index_manager(store_dir_of(_namespace(request)))
+        # Waits for the index lock, so it must not block the event loop
+        await asyncio.to_thread(manager.delete_document, request.path_params["doc_id"])
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except KeyError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    return JSONResponse({"deleted": request.path_params["doc_id"]})
+
+async def stats(request: Request):
+    """
+    Returns the statistics of a namespace's query engine, of the resident
+    indexes of every namespace and of the request queue.
+    """
+    try:
+        namespace = _namespace(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    # Never create an engine for a namespace nothing was ingested into
+    if namespace is not None and not os.path.isdir(store_dir_of(namespace)):
+        return JSONResponse({"error": f"Unknown namespace: {namespace}"}, status_code=404)
+    engine_stats = await asyncio.to_thread(get_query_engine(namespace).stats)
+    return JSONResponse({
+        "engine": engine_stats,
+        "resident_indexes": get_resident_indexes().stats(),
+        "service": request.app.state.limiter.stats(),
+    })
+
+async def metrics(request: Request):
+    """
+    Returns the per-stage latency histograms and counters of every traced
+    request and the resident index gauges, in the Prometheus text
+    exposition format.
+    """
+    resident = get_resident_indexes().stats()
+    lines = [
+        "# TYPE queryverse_resident_index_bytes gauge",
+        f"queryverse_resident_index_bytes {resident['resident_bytes']}",
+        "# TYPE queryverse_resident_index_budget_bytes gauge",
+        f"queryverse_resident_index_budget_bytes {resident['budget_bytes']}",
+        "# TYPE queryverse_resident_indexes gauge",
+        f"queryverse_resident_indexes {resident['resident_indexes']}",
+        "# TYPE queryverse_resident_index_evictions_total counter",
+        f"queryverse_resident_index_evictions_total {resident['evictions']}",
+    ]
+    text = get_metrics().prometheus() + "\n".join(lines) + "\n"
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+async def traces(request: Request):
+    """
+    Returns the most recent request traces as JSON lines, the oldest first.
+    The "limit" query parameter bounds how many are returned.
+    """
+    try:
+        limit = int(request.query_params.get("limit", "0")) or None
+    except ValueError:
+        return JSONResponse({"error": "The 'limit' query parameter must be an integer."}, status_code=400)
+    return PlainTextResponse(get_metrics().jsonl(limit), media_type="application/x-ndjson")
+
+async def _clean_up_sessions():
+    # App sessions served by this service keep their namespaces here
+    while True:
+        await asyncio.to_thread(remove_expired_sessions)
+        await asyncio.sleep(_SESSION_CLEANUP_SECONDS)
+
+@contextlib.asynccontextmanager
+async def _lifespan(app):
+    cleanup = asyncio.create_task(_clean_up_sessions())
+    try:
+        yield
+    finally:
+        cleanup.cancel()
+
+def create_app(max_concurrency: int = SERVICE_MAX_CONCURRENCY, max_queue: int = SERVICE_MAX_QUEUE) -> Starlette:
+    """
+    Creates the service. Requests to a namespace share its process-wide
+    query engine, so its index stays resident between requests until the
+    resident index budget evicts it. The "namespace" query parameter picks
+    the namespace of every endpoint but /jobs/{job_id}, /metrics and
+    /traces. The namespaces of abandoned app sessions are deleted hourly.
+    """
+    app = Starlette(routes=[
+        Route("/ingest", ingest, methods=["POST"]),
+        Route("/jobs", submit_job, methods=["POST"]),
+        Route("/jobs", jobs, methods=["GET"]),
+        Route("/jobs/{job_id}", job_status, methods=["GET"]),
+        Route("/query", query, methods=["POST"]),
+        Route("/query/stream", query_stream, methods=["POST"]),
+        Route("/documents", documents, methods=["GET"]),
+        Route("/documents/{doc_id}", delete_document, methods=["DELETE"]),
+        Route("/stats", stats, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/traces", traces, methods=["GET"]),
+    ], lifespan=_lifespan)
+    app.state.limiter = WorkLimiter(max_concurrency, max_queue)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the QueryVerse query and ingestion service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=SERVICE_MAX_CONCURRENCY)
+    parser.add_argument("--max-queue", type=int, default=SERVICE_MAX_QUEUE)
+    args = parser.parse_args()
+    # A single process, so every request is served from one resident index
+    uvicorn.run(create_app(args.max_concurrency, args.max_queue), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
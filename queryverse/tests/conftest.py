@@ -0,0 +1,66 @@
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+# The engine reads its configuration when it is first imported, so point it
+# at a scratch directory and the offline embeddings before any test does
+_WORK_DIR = tempfile.mkdtemp(prefix="queryverse-tests-")
+os.environ.update({
+    "VECTOR_STORE_PATH": os.path.join(_WORK_DIR, "vector_store"),
+    "UPLOADS_PATH": os.path.join(_WORK_DIR, "uploads"),
+    "NAMESPACES_PATH": os.path.join(_WORK_DIR, "namespaces"),
+    "EMBEDDING_CACHE_PATH": os.path.join(_WORK_DIR, "embeddings.sqlite"),
+    "EMBEDDING_BACKEND": "local",
+    "TRACE_LOG_PATH": "",
+    "QUERYVERSE_SERVICE_URL": "",
+    "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "test",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def write_document(tmp_path):
+    """
+    Returns a function writing a text document made of a repeated sentence
+    into the test's directory, and returning its path.
+    """
+    def write(name: str, sentence: str, repeat: int = 1) -> str:
+        path = tmp_path / name
+        path.write_text(sentence * repeat, encoding="utf-8")
+        return str(path)
+    return write
+
+@pytest.fixture
+def namespace(request):
+    """
+    An index namespace of the test's own, so tests never share an index.
+    """
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", request.node.name).strip("-")[:64]
+
+@pytest.fixture(scope="session")
+def service_url():
+    """
+    Runs the service on a free local port for the whole session.
+    """
+    import uvicorn
+    from service import create_app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("The service did not start.")
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=10)
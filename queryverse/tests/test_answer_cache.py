@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+
+from engine.answer_cache import AnswerCache
+
+def _vector(seed: int, noise: float = 0.0, other: int = 99):
+    base = np.random.default_rng(seed).standard_normal(64)
+    return base + noise * np.random.default_rng(other).standard_normal(64)
+
+def test_rephrasings_hit_but_other_identifiers_miss():
+    cache = AnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    cache.put(1, None, "What was the revenue in 2023?", _vector(0), "Ten million.", 2.0)
+
+    # Almost the same embedding, the way a rephrasing or another year embeds
+    assert cache.get(1, None, "How much revenue was there in 2023?", _vector(0, 0.01)) == "Ten million."
+    assert cache.get(1, None, "What was the revenue in 2024?", _vector(0, 0.01)) is None
+    assert cache.get(1, None, "What was the revenue in 2023?", _vector(0, 0.01, other=7)) == "Ten million."
+    assert cache.get(2, None, "What was the revenue in 2023?", _vector(0)) is None
+
+def test_the_most_similar_entry_wins_and_the_least_recently_used_is_evicted():
+    cache = AnswerCache(threshold=0.5, ttl_seconds=60, max_entries=2)
+    cache.put(1, None, "first question", _vector(1), "first", 1.0)
+    cache.put(1, None, "second question", _vector(2), "second", 1.0)
+    assert cache.get(1, None, "another question", _vector(2, 0.1)) == "second"
+
+    # Evicts the least recently used entry
+    cache.put(1, None, "third question", _vector(3), "third", 1.0)
+    assert cache.get(1, None, "another question", _vector(1, 0.1)) is None
+    assert cache.get(1, None, "another question", _vector(3, 0.1)) == "third"
+    assert cache.stats()["entries"] == 2
+
+def test_entries_expire_and_older_generations_are_invalidated(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = AnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    cache.put(1, None, "first question", _vector(1), "first", 1.0)
+    now[0] += 30
+    cache.put(1, None, "second question", _vector(2), "second", 1.0)
+    cache.put(2, None, "third question", _vector(3), "third", 1.0)
+
+    now[0] += 31
+    assert cache.get(1, None, "first question", _vector(1)) is None
+    assert cache.get(1, None, "another question", _vector(2, 0.01)) == "second"
+
+    cache.invalidate(2)
+    assert cache.get(1, None, "second question", _vector(2)) is None
+    assert cache.get(2, None, "another question", _vector(3, 0.01)) == "third"
+    assert cache.stats()["entries"] == 1
+
+def test_removing_an_entry_keeps_the_others_matched_to_their_answers():
+    cache = AnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    names = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron".split()
+    for n, name in enumerate(names[:10]):
+        cache.put(1, None, f"question {name}", _vector(n), f"answer {name}", 1.0)
+    for n in range(0, 10, 2):
+        assert cache.get(1, None, "question", _vector(n, 0.01)) == f"answer {names[n]}"
+    # Evicts every other entry, from the middle of the stacked vectors
+    for n, name in enumerate(names[10:], start=10):
+        cache.put(1, None, f"question {name}", _vector(n), f"answer {name}", 1.0)
+
+    for n, name in enumerate(names):
+        expected = None if n < 10 and n % 2 else f"answer {name}"
+        assert cache.get(1, None, "question", _vector(n, 0.01)) == expected
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from engine.context import CHARS_PER_TOKEN, estimate_tokens
+from engine.ingestion import TokenChunker
+
+def _page(seed: int, paragraphs: int = 12) -> str:
+    """
+    Returns a page of random prose: paragraphs of lines of sentences of
+    words of random lengths.
+    """
+    rng = random.Random(seed)
+
+    def sentence():
+        words = ("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(1, 12))) for _ in range(rng.randint(3, 25)))
+        return " ".join(words).capitalize() + "."
+
+    def line():
+        return " ".join(sentence() for _ in range(rng.randint(1, 4)))
+
+    return "\n\n".join("\n".join(line() for _ in range(rng.randint(1, 5))) for _ in range(paragraphs))
+
+PAGES = [_page(seed) for seed in range(5)] + [
+    # No break at all, so chunks have to be cut mid-word
+    "x" * 5000,
+    # Shorter than one chunk
+    "A single short sentence.",
+    "   \n\n  ",
+]
+
+@pytest.mark.parametrize("chunk_tokens, overlap_tokens", [(64, 8), (256, 16), (100, 0)])
+@pytest.mark.parametrize("text", PAGES, ids=range(len(PAGES)))
+def test_chunks_fit_the_budget_and_cover_the_page(text, chunk_tokens, overlap_tokens):
+    page = Document(page_content=text, metadata={"source": "notes.pdf", "page": 3})
+    chunks = list(TokenChunker(chunk_tokens, overlap_tokens).split_page(page))
+
+    covered = [False] * len(text)
+    previous_end = None
+    for chunk in chunks:
+        start = chunk.metadata["start_index"]
+        end = start + len(chunk.page_content)
+        assert chunk.metadata == {"source": "notes.pdf", "page": 3, "start_index": start}
+        assert text[start:end] == chunk.page_content
+        assert chunk.page_content.strip() == chunk.page_content != ""
+        assert estimate_tokens(chunk.page_content) <= chunk_tokens
+        if previous_end is not None:
+            # Chunks move forward and only repeat up to the overlap
+            assert previous_start < start
+            assert previous_end - start <= overlap_tokens * CHARS_PER_TOKEN
+        covered[start:end] = [True] * (end - start)
+        previous_start, previous_end = start, end
+
+    # Every character is in a chunk, except whitespace between chunks
+    assert all(covered[i] or text[i].isspace() for i in range(len(text)))
+
+def test_pages_are_split_separately_and_in_order():
+    pages = [Document(page_content=_page(seed), metadata={"page": seed}) for seed in range(3)]
+    chunks = TokenChunker(64, 8).split_documents(pages)
+
+    assert [chunk.metadata["page"] for chunk in chunks] == sorted(chunk.metadata["page"] for chunk in chunks)
+    for page in pages:
+        own = [chunk for chunk in chunks if chunk.metadata["page"] == page.metadata["page"]]
+        assert own == list(TokenChunker(64, 8).split_page(page))
+
+def test_the_overlap_must_be_smaller_than_the_chunk():
+    with pytest.raises(ValueError):
+        TokenChunker(16, 16)
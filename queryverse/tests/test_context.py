@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from engine.context import assemble_context, estimate_tokens, merge_adjacent, select_mmr, trim_to_budget
+
+def _words(count: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join("".join(rng.choice("abcdefghij") for _ in range(rng.randint(3, 9))) for _ in range(count))
+
+PAGE = _words(400)
+
+def _chunk(start: int, end: int, page: int = 1, source: str = "notes.pdf") -> Document:
+    return Document(page_content=PAGE[start:end], metadata={"source": source, "page": page, "start_index": start})
+
+def test_overlapping_and_touching_chunks_of_a_page_are_merged():
+    chunks = [
+        _chunk(300, 500),
+        _chunk(0, 120, page=2),
+        _chunk(100, 320),
+        # Touches the merged 100-500 chunk
+        _chunk(500, 640),
+        _chunk(900, 1000),
+    ]
+
+    merged = merge_adjacent(chunks)
+
+    # Merged chunks take the rank of their best-ranked part
+    assert [chunk.page_content for chunk in merged] == [PAGE[100:640], PAGE[0:120], PAGE[900:1000]]
+    assert merged[0].metadata["start_index"] == 100
+    assert merged[1].metadata["page"] == 2
+
+def test_chunks_of_other_pages_or_without_offsets_are_not_merged():
+    unlocated = Document(page_content=PAGE[0:100], metadata={"source": "notes.pdf", "page": 1})
+    chunks = [_chunk(0, 200), _chunk(100, 300, source="other.pdf"), unlocated, _chunk(150, 300, page=2)]
+
+    assert merge_adjacent(chunks) == chunks
+
+def test_near_duplicates_are_dropped_and_the_rest_kept_in_rank_order():
+    first, second, third = _words(80, seed=1), _words(80, seed=2), _words(80, seed=3)
+    near_duplicate = first.replace(first.split()[-1], "changed")
+    chunks = [Document(page_content=text) for text in (first, second, near_duplicate, first, third)]
+
+    selected = select_mmr(chunks, lambda_mult=1.0, duplicate_similarity=0.8)
+
+    assert [chunk.page_content for chunk in selected] == [first, second, third]
+
+def test_novel_chunks_move_ahead_of_redundant_ones():
+    first, other = _words(80, seed=1), _words(80, seed=4)
+    # Shares half of its trigrams with the first chunk
+    overlapping = " ".join(first.split()[:40] + other.split()[:40])
+    chunks = [Document(page_content=text) for text in (first, overlapping, other)]
+
+    selected = select_mmr(chunks, lambda_mult=0.5, duplicate_similarity=0.9)
+
+    assert [chunk.page_content for chunk in selected] == [first, other, overlapping]
+
+@pytest.mark.parametrize("budget", [60, 150, 400, 2000])
+def test_the_context_stays_within_the_token_budget(budget):
+    chunks = [Document(page_content=_words(60, seed=seed), metadata={"page": seed}) for seed in range(20)]
+
+    context, stats = assemble_context(chunks, token_budget=budget)
+
+    assert estimate_tokens(context) == stats.tokens_after <= budget
+    assert stats.tokens_before > budget
+    assert 0 < stats.chunks_out < stats.chunks_in
+
+def test_the_last_chunk_is_cut_at_a_word_or_dropped():
+    chunks = [Document(page_content=_words(60, seed=seed), metadata={"page": seed}) for seed in range(2)]
+    first_tokens = estimate_tokens(chunks[0].page_content)
+
+    # Enough budget left for part of the second chunk
+    trimmed = trim_to_budget(chunks, first_tokens + 100)
+    assert trimmed[0] == chunks[0]
+    assert chunks[1].page_content.startswith(trimmed[1].page_content + " ")
+    assert trimmed[1].metadata == chunks[1].metadata
+
+    # Too little left to be worth a cut-off chunk
+    assert trim_to_budget(chunks, first_tokens + 20) == chunks[:1]
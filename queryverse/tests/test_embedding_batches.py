@@ -0,0 +1,69 @@
+import functools
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+import engine.ingestion
+from engine.ingestion import AdaptiveRateLimiter, embed_batches
+from engine.stubs import StubEmbeddings, StubQuotaError
+
+class RecordingEmbeddings(StubEmbeddings):
+    """
+    Records every embedding request: its texts, when it was sent and
+    returned, and whether it hit the injected quota error.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = []
+
+    def embed_documents(self, texts):
+        start = time.monotonic()
+        try:
+            vectors = super().embed_documents(texts)
+        except StubQuotaError:
+            self.requests.append((tuple(texts), start, time.monotonic(), False))
+            raise
+        self.requests.append((tuple(texts), start, time.monotonic(), True))
+        return vectors
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    # Backs off for a tenth of the default second, to keep the tests fast
+    monkeypatch.setattr(engine.ingestion, "AdaptiveRateLimiter", functools.partial(AdaptiveRateLimiter, initial_delay=0.1))
+
+def _batches(count: int, size: int = 2):
+    return [[Document(page_content=f"Chunk {b}-{c}.") for c in range(size)] for b in range(count)]
+
+def test_a_quota_error_backs_off_and_retries_only_the_failed_batch():
+    embeddings = RecordingEmbeddings(size=8, quota_every=3)
+    batches = _batches(5)
+
+    results = list(embed_batches(batches, embeddings, max_workers=1, max_in_flight=2))
+
+    texts = [tuple(chunk.page_content for chunk in batch) for batch in batches]
+    sent = [(request[0], request[3]) for request in embeddings.requests]
+    # Every third request fails and only that batch is sent again
+    assert sent == [
+        (texts[0], True), (texts[1], True), (texts[2], False), (texts[2], True),
+        (texts[3], True), (texts[4], False), (texts[4], True),
+    ]
+    for failed, retried in ((2, 3), (5, 6)):
+        assert embeddings.requests[retried][1] - embeddings.requests[failed][2] >= 0.09
+    assert [batch for batch, _ in results] == batches
+
+def test_concurrent_batches_are_embedded_once_and_kept_in_order():
+    embeddings = RecordingEmbeddings(size=8, latency=0.01, quota_every=4)
+    batches = _batches(12)
+
+    results = list(embed_batches(batches, embeddings, max_workers=4, max_in_flight=6))
+
+    succeeded = [request[0] for request in embeddings.requests if request[3]]
+    failures = sum(1 for request in embeddings.requests if not request[3])
+    assert failures > 0
+    assert sorted(succeeded) == sorted(tuple(chunk.page_content for chunk in batch) for batch in batches)
+    assert len(embeddings.requests) == len(batches) + failures
+    assert [batch for batch, _ in results] == batches
+    for batch, vectors in results:
+        assert vectors == [embeddings._vector(chunk.page_content) for chunk in batch]
@@ -0,0 +1,126 @@
+import os
+import shutil
+import time
+
+import faiss
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+import engine.index_manager
+from engine.index_manager import IndexManager, choose_index_type, chunk_ids, index_type_of, load_manifest
+
+LEGACY_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vector_store")
+
+def test_pickled_stores_are_only_loaded_by_the_migration(tmp_path):
+    store_dir = str(tmp_path / "vector_store")
+    shutil.copytree(LEGACY_STORE, store_dir)
+    manager = IndexManager(store_dir)
+
+    with pytest.raises(ValueError, match="migrate_store.py"):
+        manager.load(read_only=True)
+    assert manager.is_pickled()
+
+    entry = manager.migrate_pickled_store("models/embedding-001")
+    assert entry["embedding_model"] == "models/embedding-001"
+    assert not manager.is_pickled()
+    manifest = load_manifest(store_dir)
+    assert manifest["index"]["embedding_model"] == "models/embedding-001"
+
+    chunk_index = manager.load(read_only=True)
+    assert chunk_index.ntotal == entry["chunks"]
+    chunks = chunk_index.store.get(list(range(chunk_index.ntotal)))
+    assert len(chunks) == entry["chunks"]
+    chunk_index.store.close()
+
+DIMENSION = 16
+
+@pytest.fixture
+def small_thresholds(monkeypatch):
+    """
+    Switches index types at a few hundred vectors instead of tens of thousands.
+    """
+    monkeypatch.setattr(engine.index_manager, "INDEX_TYPE", "auto")
+    monkeypatch.setattr(engine.index_manager, "INDEX_HNSW_MIN_VECTORS", 100)
+    monkeypatch.setattr(engine.index_manager, "INDEX_IVFPQ_MIN_VECTORS", 300)
+    monkeypatch.setattr(engine.index_manager, "_IVFPQ_MIN_TRAINING", 256)
+
+def _add_document(manager: IndexManager, doc_id: str, count: int, seed: int) -> np.ndarray:
+    """
+    Adds a document of count chunks with random vectors, and returns them.
+    """
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+    chunks = [Document(page_content=f"Chunk {n} of {doc_id}.", metadata={"doc_id": doc_id}) for n in range(count)]
+    chunk_index = manager.open_for_write()
+    chunk_index.add(chunk_ids(doc_id, 0, count), chunks, vectors)
+    manager.add_document(chunk_index, {"doc_id": doc_id, "chunks": count, "embedding_model": "stub-model"})
+    chunk_index.store.close()
+    return vectors
+
+def test_the_index_type_follows_the_corpus_size(monkeypatch, small_thresholds):
+    assert [choose_index_type(n) for n in (99, 100, 299, 300)] == ["flat", "hnsw", "hnsw", "ivfpq"]
+    # Too few vectors to train IVF-PQ on
+    monkeypatch.setattr(engine.index_manager, "_IVFPQ_MIN_TRAINING", 400)
+    assert choose_index_type(300) == "hnsw"
+
+def test_growing_stores_are_rebuilt_as_the_next_index_type(small_thresholds, tmp_path):
+    manager = IndexManager(str(tmp_path / "vector_store"))
+    types = []
+    for n, count in enumerate((50, 100, 200)):
+        _add_document(manager, f"doc{n}", count, seed=n)
+        types.append(manager.manifest()["index"]["type"])
+    assert types == ["flat", "hnsw", "ivfpq"]
+
+    chunk_index = manager.load(read_only=True)
+    assert index_type_of(chunk_index.index) == "ivfpq"
+    assert chunk_index.ntotal == 350
+    chunk_index.store.close()
+
+def test_large_indexes_are_memory_mapped(monkeypatch, tmp_path):
+    manager = IndexManager(str(tmp_path / "vector_store"))
+    vectors = _add_document(manager, "doc", 50, seed=0)
+    flags = []
+    read_index = faiss.read_index
+
+    def recording(path, io_flags=0):
+        flags.append(io_flags)
+        return read_index(path, io_flags)
+
+    monkeypatch.setattr(faiss, "read_index", recording)
+    monkeypatch.setattr(engine.index_manager, "INDEX_MMAP_MIN_BYTES", 0)
+    mapped = manager.load(mmap=True, read_only=True)
+    monkeypatch.setattr(engine.index_manager, "INDEX_MMAP_MIN_BYTES", 1 << 40)
+    loaded = manager.load(mmap=True, read_only=True)
+
+    assert flags == [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY, 0]
+    assert mapped.vector_search(vectors[7], 3) == loaded.vector_search(vectors[7], 3)
+    assert mapped.vector_search(vectors[7], 1)[0][0] == loaded.store.labels_of(["doc"])[7]
+    mapped.store.close()
+    loaded.store.close()
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_deleted_documents_are_compacted_away(monkeypatch, tmp_path, index_type):
+    monkeypatch.setattr(engine.index_manager, "INDEX_TYPE", index_type)
+    manager = IndexManager(str(tmp_path / "vector_store"))
+    _add_document(manager, "kept", 40, seed=0)
+    deleted = _add_document(manager, "deleted", 30, seed=1)
+
+    # Compactions run in the background; hold them off to see the tombstone
+    with manager.lock:
+        manager.delete_document("deleted")
+        manifest = manager.manifest()
+        assert set(manifest["documents"]) == {"kept"}
+        assert manifest["deleted"] == {"deleted": 30}
+
+    deadline = time.monotonic() + 10
+    while manager.manifest()["deleted"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+    chunk_index = manager.load(read_only=True)
+    assert chunk_index.ntotal == 40
+    assert index_type_of(chunk_index.index) == index_type
+    assert chunk_index.store.labels_of(["deleted"]) == []
+    nearest = chunk_index.vector_search(deleted[0], 1)[0][0]
+    assert nearest in chunk_index.store.labels_of(["kept"])
+    chunk_index.store.close()
@@ -0,0 +1,19 @@
+import engine.embeddings
+from engine.embeddings import CachedEmbeddings, EmbeddingCache
+from engine.index_manager import get_index_manager
+from engine.ingestion import load_and_process_documents
+from engine.namespaces import store_dir_of
+from engine.stubs import StubEmbeddings
+
+def test_an_injected_embeddings_client_can_add_to_its_own_index(monkeypatch, tmp_path, namespace, write_document):
+    # A client whose model name is not the configured backend's
+    embeddings = CachedEmbeddings(StubEmbeddings(size=64), "stub-model", EmbeddingCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(engine.embeddings, "_embeddings", embeddings)
+
+    first = load_and_process_documents(write_document("first.txt", "Kappa lambda mu. ", 100), namespace=namespace)
+    second = load_and_process_documents(write_document("second.txt", "Nu xi omicron. ", 100), namespace=namespace)
+
+    assert first["embedding_model"] == second["embedding_model"] == "stub-model"
+    manifest = get_index_manager(store_dir_of(namespace)).manifest()
+    assert manifest["index"]["embedding_model"] == "stub-model"
+    assert set(manifest["documents"]) == {first["doc_id"], second["doc_id"]}
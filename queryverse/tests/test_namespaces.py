@@ -0,0 +1,45 @@
+import gc
+import os
+import time
+
+import engine.index_manager
+from engine.config import NAMESPACES_DIR
+from engine.ingestion import load_and_process_documents
+from engine.namespaces import new_session_namespace, remove_expired_sessions, store_dir_of
+from engine.query import ResidentIndexes
+
+def test_sessions_do_not_leave_resident_engines_behind(write_document):
+    resident = ResidentIndexes(idle_seconds=0.05)
+    sessions = [new_session_namespace() for _ in range(5)]
+    for i, namespace in enumerate(sessions):
+        path = write_document(f"doc{i}.txt", f"Session {i} document sentence. ", 50)
+        load_and_process_documents(path, namespace=namespace, summarize=False)
+        resident.get(store_dir_of(namespace)).get_chain()
+        time.sleep(0.1)
+    # Sessions that never asked a question leave no loaded index either
+    for namespace in [new_session_namespace() for _ in range(5)]:
+        resident.get(store_dir_of(namespace))
+        time.sleep(0.1)
+
+    stats = resident.stats()
+    assert stats["namespaces"] == 1
+    assert stats["resident_indexes"] == 0
+    assert stats["expirations"] == 9
+
+    # Nothing holds the index managers of the dropped namespaces any more
+    gc.collect()
+    assert not {store_dir_of(namespace) for namespace in sessions} & set(engine.index_manager._managers)
+
+def test_expired_session_namespaces_are_deleted(write_document):
+    expired, active = new_session_namespace(), new_session_namespace()
+    for namespace in (expired, active, "team-workspace"):
+        load_and_process_documents(write_document(f"{namespace}.txt", "Rho sigma tau. ", 50), namespace=namespace, summarize=False)
+    long_ago = time.time() - 7200
+    for namespace in (expired, "team-workspace"):
+        os.utime(os.path.join(NAMESPACES_DIR, namespace), (long_ago, long_ago))
+
+    assert remove_expired_sessions(max_age_seconds=3600) == [expired]
+    assert not os.path.exists(os.path.join(NAMESPACES_DIR, expired))
+    # Recently used sessions and namespaces not made for sessions are kept
+    assert os.path.exists(os.path.join(NAMESPACES_DIR, active))
+    assert os.path.exists(os.path.join(NAMESPACES_DIR, "team-workspace"))
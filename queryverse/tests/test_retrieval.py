@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+
+import engine.embeddings
+from engine.embeddings import CachedEmbeddings, EmbeddingCache
+from engine.index_manager import ChunkIndex, get_index_manager
+from engine.ingestion import load_and_process_documents
+from engine.namespaces import store_dir_of
+from engine.query import AnswerTimings, QueryEngine
+from engine.stubs import StubChatModel, StubEmbeddings
+
+# Paragraphs of their own become chunks of their own with the "recursive" chunker
+PARAGRAPHS = [
+    "Error E1234 means that the disk holding the index is full.",
+    "Zebra migration patterns shift with the rainy season.",
+] + [f"Release v7 note {n}: the dashboard loads faster than before." for n in range(12)]
+
+@pytest.fixture
+def indexed(monkeypatch, tmp_path, namespace):
+    """
+    Indexes a document with the stub embeddings, one chunk per paragraph,
+    and returns the namespace's store directory.
+    """
+    embeddings = CachedEmbeddings(StubEmbeddings(size=32), "stub-model", EmbeddingCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(engine.embeddings, "_embeddings", embeddings)
+    path = tmp_path / "notes.txt"
+    path.write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+    load_and_process_documents(str(path), chunk_size=80, chunk_overlap=0, chunker="recursive", namespace=namespace)
+    return store_dir_of(namespace)
+
+def test_only_a_rare_identifier_makes_the_keyword_match_confident(indexed):
+    chunk_index = get_index_manager(indexed).load(read_only=True)
+    try:
+        hits = chunk_index.lexical_fast_path("What does error E1234 mean?", 4)
+        assert hits and "E1234" in hits[0][0].page_content
+        # Every word occurs in one chunk only, but none is an identifier
+        assert chunk_index.lexical_fast_path("Why do zebra migration patterns shift?", 4) is None
+        # An identifier found in more than k chunks does not pin any down
+        assert chunk_index.lexical_fast_path("What changed in v7?", 4) is None
+    finally:
+        chunk_index.store.close()
+
+@pytest.mark.parametrize(
+    "question, retrieval, embedded",
+    [("What does error E1234 mean?", "lexical", False), ("Why do zebra migration patterns shift?", "hybrid", True)],
+)
+def test_the_keyword_index_is_searched_once_per_question(monkeypatch, indexed, question, retrieval, embedded):
+    calls = []
+    fast_path = ChunkIndex.lexical_fast_path
+
+    def counted(self, *args, **kwargs):
+        calls.append(args[0])
+        return fast_path(self, *args, **kwargs)
+
+    monkeypatch.setattr(ChunkIndex, "lexical_fast_path", counted)
+    query_engine = QueryEngine(indexed)
+    query_engine._model = StubChatModel()
+    timings = AnswerTimings()
+    query_engine.invoke(question, timings=timings)
+
+    assert calls == [question]
+    stages = {stage["name"]: stage for stage in timings.trace["stages"]}
+    assert stages["retrieval"]["attributes"]["mode"] == retrieval
+    assert stages["answer_cache"]["attributes"]["embedded"] == embedded
+
+def _is_closed(chunk_index) -> bool:
+    try:
+        chunk_index.store._conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+def _publish_generation(tmp_path, namespace, name):
+    path = tmp_path / name
+    path.write_text(f"The {name} document adds one more generation.", encoding="utf-8")
+    load_and_process_documents(str(path), chunk_size=80, chunk_overlap=0, chunker="recursive", namespace=namespace)
+
+def test_a_replaced_store_is_closed_once_no_answer_uses_it(indexed, tmp_path, namespace):
+    query_engine = QueryEngine(indexed)
+    query_engine._model = StubChatModel()
+    query_engine.get_chain()
+    first = query_engine._vector_store
+
+    # Nothing holds the first store, so it is closed as soon as it is replaced
+    _publish_generation(tmp_path, namespace, "second.txt")
+    query_engine.get_chain()
+    second = query_engine._vector_store
+    assert second is not first
+    assert _is_closed(first) and not _is_closed(second)
+
+    # An answer still being streamed keeps its store open until it ends
+    stream = query_engine.stream("Why do zebra migration patterns shift?")
+    assert next(stream)
+    _publish_generation(tmp_path, namespace, "third.txt")
+    query_engine.get_chain()
+    assert query_engine._vector_store is not second
+    assert not _is_closed(second)
+    assert "".join(stream)
+    assert _is_closed(second) and not _is_closed(query_engine._vector_store)
@@ -0,0 +1,149 @@
+import asyncio
+import contextlib
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import engine.ingestion
+import service
+from engine.client import QueryverseClient
+from engine.index_manager import get_index_manager
+from engine.namespaces import store_dir_of
+from engine.query import get_resident_indexes
+from service import StreamClosed, WorkLimiter
+
+def _request(url: str, body: bytes = None):
+    """
+    Sends a request and returns its status and decoded JSON body.
+    """
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def _timed(call):
+    start = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - start
+
+@pytest.fixture
+def slow_embeddings(monkeypatch):
+    """
+    Makes every embedding request take a while, so ingestions stay running.
+    """
+    embed_batch = engine.ingestion._embed_batch
+
+    def slow(*args, **kwargs):
+        time.sleep(1.0)
+        return embed_batch(*args, **kwargs)
+
+    monkeypatch.setattr(engine.ingestion, "_embed_batch", slow)
+
+def test_metrics_stay_responsive_during_ingestion(service_url, namespace, write_document, slow_embeddings):
+    client = QueryverseClient(service_url, timeout=5.0, namespace=namespace)
+    small = write_document("small.txt", "Delta epsilon zeta. ", 200)
+    with open(small, "rb") as f:
+        doc_id = client.ingest("small.txt", f.read())["doc_id"]
+
+    # Several embedding batches, a few seconds with the slowed embeddings
+    large = write_document("large.txt", "Alpha beta gamma. ", 40000)
+    with open(large, "rb") as f:
+        job = client.submit_ingestion("large.txt", f.read())
+    deadline = time.monotonic() + 30
+    while client.job(job["job_id"])["status"] != "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+    metrics, seconds = _timed(client.metrics)
+    assert "queryverse_resident_indexes" in metrics
+    assert seconds < 1.0
+    deleted, seconds = _timed(lambda: client.delete_document(doc_id))
+    assert deleted == {"deleted": doc_id}
+    assert seconds < 1.0
+    assert client.job(job["job_id"])["status"] == "running"
+
+def test_delete_waiting_for_the_index_lock_does_not_block_other_requests(service_url, namespace, write_document):
+    client = QueryverseClient(service_url, timeout=5.0, namespace=namespace)
+    path = write_document("doc.txt", "Eta theta iota. ", 200)
+    with open(path, "rb") as f:
+        doc_id = client.ingest("doc.txt", f.read())["doc_id"]
+
+    manager = get_index_manager(store_dir_of(namespace))
+    results = []
+    with manager.lock:
+        delete = threading.Thread(target=lambda: results.append(client.delete_document(doc_id)))
+        delete.start()
+        time.sleep(0.2)
+        _, seconds = _timed(client.metrics)
+        assert seconds < 1.0
+        assert delete.is_alive()
+    delete.join(timeout=10)
+    assert results == [{"deleted": doc_id}]
+    assert doc_id not in client.list_documents()
+
+def test_a_stream_holds_its_slot_until_its_work_stops():
+    finish = threading.Event()
+    stopped = []
+
+    def work(emit):
+        emit("first")
+        finish.wait(5)
+        try:
+            emit("second")
+        except StreamClosed:
+            stopped.append(True)
+            raise
+
+    async def scenario():
+        limiter = WorkLimiter(max_concurrency=1, max_queue=1)
+        await limiter.acquire()
+        stream = limiter.start(work)
+        # The client reads one event and disconnects
+        async with contextlib.aclosing(stream):
+            assert await stream.__anext__() == "first"
+        await asyncio.sleep(0.1)
+        assert limiter.running == 1
+        finish.set()
+        await asyncio.wait_for(limiter.acquire(), timeout=5)
+        assert limiter.completed == 1
+
+    asyncio.run(scenario())
+    assert stopped == [True]
+
+@pytest.mark.parametrize("path", ["/query", "/query/stream"])
+@pytest.mark.parametrize(
+    "body",
+    [b"not json", b'["What is it?"]', b'"What is it?"', b'{"question": ""}',
+     b'{"question": "What is it?", "doc_ids": "abc"}', b'{"question": "What is it?", "doc_ids": [1]}'],
+)
+def test_malformed_questions_are_rejected(service_url, path, body):
+    status, response = _request(service_url + path, body)
+    assert status == 400
+    assert response["error"]
+
+def test_engine_failures_return_a_json_error(monkeypatch, service_url):
+    class Failing:
+        def stream(self, question, doc_ids, timings):
+            raise RuntimeError("The model is unavailable.")
+            yield
+
+    monkeypatch.setattr(service, "get_query_engine", lambda namespace: Failing())
+    status, response = _request(service_url + "/query", b'{"question": "What is it?"}')
+    assert (status, response) == (500, {"error": "The model is unavailable."})
+
+def test_stats_only_report_existing_namespaces(service_url, namespace, write_document):
+    namespaces = get_resident_indexes().stats()["namespaces"]
+    status, response = _request(f"{service_url}/stats?namespace=never-ingested")
+    assert status == 404
+    assert get_resident_indexes().stats()["namespaces"] == namespaces
+
+    client = QueryverseClient(service_url, timeout=5.0, namespace=namespace)
+    with open(write_document("doc.txt", "Rho sigma tau. ", 50), "rb") as f:
+        client.ingest("doc.txt", f.read())
+    assert client.stats()["engine"]["hits"] == 0
@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from engine.single_flight import SingleFlight
+
+TOKENS = ["The ", "answer ", "is ", "42."]
+
+class Generation:
+    """
+    A computation whose tokens are held back until release() is called.
+    """
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.runs = 0
+        self.closed = False
+        self._released = threading.Event()
+
+    def release(self):
+        self._released.set()
+
+    def produce(self):
+        self.runs += 1
+        try:
+            yield TOKENS[0]
+            assert self._released.wait(5)
+            yield from TOKENS[1:]
+            if self.error is not None:
+                raise self.error
+        except GeneratorExit:
+            self.closed = True
+            raise
+
+def test_identical_concurrent_questions_generate_once():
+    flights, generation = SingleFlight(), Generation()
+    leader, coalesced = flights.join("question", generation.produce)
+    assert not coalesced
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        followers = []
+        for _ in range(7):
+            tokens, coalesced = flights.join("question", generation.produce)
+            assert coalesced
+            followers.append(pool.submit(list, tokens))
+        lead = pool.submit(list, leader)
+        generation.release()
+        assert lead.result(timeout=5) == TOKENS
+        assert [follower.result(timeout=5) for follower in followers] == [TOKENS] * 7
+
+    assert generation.runs == 1
+    assert flights.stats() == {"started": 1, "coalesced": 7, "in_flight": 0}
+    # The flight has ended, so the same question is generated again
+    _, coalesced = flights.join("question", lambda: iter(TOKENS))
+    assert not coalesced
+
+def test_followers_get_the_error_of_a_failed_generation():
+    flights, generation = SingleFlight(), Generation(error=RuntimeError("quota"))
+    leader, _ = flights.join("question", generation.produce)
+    follower, _ = flights.join("question", generation.produce)
+    generation.release()
+
+    with pytest.raises(RuntimeError, match="quota"):
+        list(leader)
+    with pytest.raises(RuntimeError, match="quota"):
+        list(follower)
+
+def test_followers_complete_when_the_leader_stops_reading():
+    flights, generation = SingleFlight(), Generation()
+    leader, _ = flights.join("question", generation.produce)
+    follower, _ = flights.join("question", generation.produce)
+
+    assert next(leader) == TOKENS[0]
+    # The leader's client disconnects; the generation goes on in the background
+    leader.close()
+    generation.release()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(list, follower).result(timeout=5) == TOKENS
+    assert generation.runs == 1
+    assert not generation.closed
+    assert flights.stats()["in_flight"] == 0
+
+def test_an_abandoned_generation_without_followers_is_closed():
+    flights, generation = SingleFlight(), Generation()
+    leader, _ = flights.join("question", generation.produce)
+
+    assert next(leader) == TOKENS[0]
+    leader.close()
+
+    assert generation.closed
+    assert flights.stats()["in_flight"] == 0